@@ -0,0 +1,289 @@
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from typing import Callable, Any, Sequence
+
+import cv2 as cv
+
+from duplicateFinder import DuplicateFinder
+from include.fileByteCompare import validate_file_contents
+from include.imageCompare import ImageCompare
+from include.imageCache import imageCache
+from include.videoCompare import VideoCompare
+
+
+FIXTURE_IMAGES = ['fixtures/594_900x900.jpg', 'fixtures/sample_640x426.bmp',
+                  'fixtures/images_sizes/R.jpg', 'fixtures/images_sizes/sample-images-05.jpeg']
+FIXTURE_VIDEOS = ['fixtures/sample_640x360.mp4', 'fixtures/sample_960x540.mp4']
+
+
+def parser() -> ArgumentParser:
+  """
+  Parse command line arguments.
+
+  Returns
+  ----------
+      ArgumentParser: The argument parser object.
+  """
+  parser = ArgumentParser(
+      description='Benchmark the duplicate finder on a synthetic corpus.')
+  parser.add_argument(
+      '-n', '--files', help='Number of random files to generate', default=500, type=int)
+  parser.add_argument(
+      '--size', help='Size in bytes of each random file', default=64 * 1024, type=int)
+  parser.add_argument(
+      '--duplicates', help='Ratio of the random files that are copies of another one',
+      default=0.2, type=float)
+  parser.add_argument(
+      '--images', help='Resized and recompressed copies made of each fixture image',
+      default=3, type=int)
+  parser.add_argument(
+      '--videos', help='Re-encoded copies made of each fixture video', default=1, type=int)
+  parser.add_argument(
+      '--frames', help='Maximum frames written on each re-encoded video', default=150, type=int)
+  parser.add_argument(
+      '-j', '--jobs', help='Number of processes used by the duplicate finder', default=1, type=int)
+  parser.add_argument(
+      '--seed', help='Seed of the random corpus', default=0, type=int)
+  parser.add_argument(
+      '-o', '--output', help='JSON file to write the results',
+      default='benchmark-' + time.strftime("%Y%m%d-%H%M%S") + '.json', type=str)
+  parser.add_argument(
+      '--keep', help='Keep the generated corpus', action='store_true')
+
+  return parser
+
+
+def generate_random_files(directory: str, count: int, size: int, ratio: float,
+                          rng: random.Random) -> None:
+  """
+  Write random files, a ratio of them being byte copies of previous ones.
+
+  Some files share their size and first bytes with another one and only differ
+  at the end, so every stage of the hard search is exercised.
+
+  Args:
+    directory (str): Directory to write the files.
+    count (int): Number of files.
+    size (int): Size in bytes of each file.
+    ratio (float): Ratio of files that are copies.
+    rng (random.Random): Random generator.
+  """
+  os.makedirs(directory, exist_ok=True)
+  written = []
+  for i in range(count):
+    path = os.path.join(directory, f'random_{i:06d}.bin')
+    if written and rng.random() < ratio:
+      shutil.copyfile(rng.choice(written), path)
+    elif written and rng.random() < 0.1:
+      with open(rng.choice(written), 'rb') as f:
+        content = bytearray(f.read())
+      content[-1] = (content[-1] + 1) % 256
+      with open(path, 'wb') as f:
+        f.write(content)
+    else:
+      with open(path, 'wb') as f:
+        f.write(rng.randbytes(size))
+    written.append(path)
+
+
+def generate_images(directory: str, copies: int, rng: random.Random) -> None:
+  """
+  Write the fixture images and resized, recompressed copies of them.
+
+  Args:
+    directory (str): Directory to write the images.
+    copies (int): Number of copies of each fixture image.
+    rng (random.Random): Random generator.
+  """
+  os.makedirs(directory, exist_ok=True)
+  for n, fixture in enumerate(FIXTURE_IMAGES):
+    image = cv.imread(fixture)
+    cv.imwrite(os.path.join(directory, f'image_{n}.png'), image)
+    for i in range(copies):
+      scale = rng.uniform(0.4, 0.9)
+      resized = cv.resize(image, None, fx=scale, fy=scale, interpolation=cv.INTER_AREA)
+      cv.imwrite(os.path.join(directory, f'image_{n}_copy_{i}.jpg'), resized,
+                 [cv.IMWRITE_JPEG_QUALITY, rng.randint(60, 95)])
+
+
+def generate_videos(directory: str, copies: int, maxFrames: int) -> None:
+  """
+  Write re-encoded, downscaled copies of the fixture videos.
+
+  Args:
+    directory (str): Directory to write the videos.
+    copies (int): Number of copies of each fixture video.
+    maxFrames (int): Maximum number of frames written on each copy.
+  """
+  os.makedirs(directory, exist_ok=True)
+  for n, fixture in enumerate(FIXTURE_VIDEOS):
+    shutil.copyfile(fixture, os.path.join(directory, f'video_{n}.mp4'))
+    for i in range(copies):
+      capture = cv.VideoCapture(fixture)
+      fps = capture.get(cv.CAP_PROP_FPS)
+      width = int(capture.get(cv.CAP_PROP_FRAME_WIDTH) * 0.5)
+      height = int(capture.get(cv.CAP_PROP_FRAME_HEIGHT) * 0.5)
+      writer = cv.VideoWriter(os.path.join(directory, f'video_{n}_copy_{i}.mp4'),
+                              cv.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+      for _ in range(maxFrames):
+        ret, frame = capture.read()
+        if not ret:
+          break
+        writer.write(cv.resize(frame, (width, height)))
+      writer.release()
+      capture.release()
+
+
+def timed(func: Callable[[], Any], repeat: int = 1) -> dict[str, float]:
+  """
+  Time a function.
+
+  Args:
+    func (Callable[[], Any]): Function to time.
+    repeat (int, optional): Number of runs. Defaults to 1.
+
+  Returns:
+    dict[str, float]: Minimum, mean and total time of the runs, in seconds.
+  """
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    times.append(time.perf_counter() - start)
+  return {'min': min(times), 'mean': sum(times) / len(times), 'total': sum(times)}
+
+
+def benchmark_finder(directory: str, options: list[str]) -> dict[str, Any]:
+  """
+  Time the stages of a duplicate finder run.
+
+  Args:
+    directory (str): Directory to search.
+    options (list[str]): Command line options of the duplicate finder.
+
+  Returns:
+    dict[str, Any]: Timings of get_all_files, search and choose_duplicate,
+      and the number of files and duplicates found.
+  """
+  imageCache.clear()
+  finder = DuplicateFinder(['-d', directory, '-r', '--no-cache', *options])
+
+  result = {'options': options}
+  result['get_all_files'] = timed(finder.get_all_files, repeat=3)
+  result['search'] = timed(finder.search)
+  result['choose_duplicate'] = timed(finder.choose_duplicate)
+  result['files'] = len(finder.get_all_files())
+  result['duplicates'] = finder.countDuplicates
+
+  return result
+
+
+def benchmark_compare(corpus: str) -> dict[str, Any]:
+  """
+  Time each comparison method on a pair of files of the corpus.
+
+  Args:
+    corpus (str): Directory of the generated corpus.
+
+  Returns:
+    dict[str, Any]: Timings of each comparison method.
+  """
+  finder = DuplicateFinder(['-d', corpus, '--no-cache'])
+  randomFiles = sorted(os.listdir(os.path.join(corpus, 'random')))[:2]
+  random1, random2 = (os.path.join(corpus, 'random', f) for f in randomFiles)
+  image1 = os.path.join(corpus, 'images', 'image_1.png')
+  image2 = os.path.join(corpus, 'images', 'image_1_copy_0.jpg')
+  video1 = os.path.join(corpus, 'videos', 'video_0.mp4')
+  video2 = os.path.join(corpus, 'videos', 'video_1.mp4')
+
+  def cold(func: Callable[[], Any]) -> Callable[[], Any]:
+    return lambda: (imageCache.clear(), func())
+
+  def videos(method: str, file1: str, file2: str) -> Callable[[], Any]:
+    def run() -> Any:
+      with VideoCompare(file1, file2) as videoCompare:
+        return getattr(videoCompare, method)()
+    return run
+
+  return {
+    'validate_file_contents': timed(lambda: validate_file_contents(random1, random2), repeat=5),
+    'compare_files_hard': timed(lambda: finder.compare_files_hard(random1, random2), repeat=5),
+    'compare_files_soft_image': timed(cold(lambda: finder.compare_files_soft(image1, image2)), repeat=3),
+    'image_similarity': timed(cold(lambda: ImageCompare(image1, image2).image_similarity()), repeat=3),
+    'image_pixel_differences': timed(cold(lambda: ImageCompare(image1, image1).image_pixel_differences()), repeat=3),
+    'compare_videos_soft': timed(videos('compare_videos_soft', video1, video2), repeat=3),
+    'compare_videos_hard': timed(videos('compare_videos_hard', video1, video1)),
+  }
+
+
+def git_commit() -> str | None:
+  """
+  Commit of the benchmarked code, if it is a git checkout.
+
+  Returns:
+    str | None: The commit hash, or None if it cannot be found.
+  """
+  try:
+    return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                          text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def main(args: Sequence[str] | None = None) -> dict[str, Any]:
+  """
+  Generate the corpus, run the benchmarks and write the results.
+
+  Args:
+    args (Sequence[str] | None, optional): Command line arguments. Defaults to
+      the arguments of the process.
+
+  Returns:
+    dict[str, Any]: The benchmark results.
+  """
+  args = parser().parse_args(args)
+  rng = random.Random(args.seed)
+  corpus = tempfile.mkdtemp(prefix='duplicateFinder-benchmark-')
+
+  try:
+    generate_random_files(os.path.join(corpus, 'random'), args.files, args.size, args.duplicates, rng)
+    generate_images(os.path.join(corpus, 'images'), args.images, rng)
+    generate_videos(os.path.join(corpus, 'videos'), args.videos, args.frames)
+
+    jobs = ['-j', str(args.jobs)]
+    results = {
+      'commit': git_commit(),
+      'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+      'python': sys.version.split()[0],
+      'platform': platform.platform(),
+      'parameters': vars(args),
+      'hard': benchmark_finder(os.path.join(corpus, 'random'), ['-t', 'hard', *jobs]),
+      'soft_images': benchmark_finder(os.path.join(corpus, 'images'), ['-t', 'soft', *jobs]),
+      'soft_videos': benchmark_finder(os.path.join(corpus, 'videos'), ['-t', 'soft', *jobs]),
+      'best_images': benchmark_finder(os.path.join(corpus, 'images'), ['-t', 'soft', '-f', 'best', *jobs]),
+      'compare': benchmark_compare(corpus),
+    }
+  finally:
+    if args.keep:
+      print(f"Corpus kept on {corpus}")
+    else:
+      shutil.rmtree(corpus, ignore_errors=True)
+
+  with open(args.output, 'w') as f:
+    json.dump(results, f, indent=2)
+  print(f"Results written to {args.output}")
+
+  return results
+
+
+if __name__ == '__main__':
+  main()
@@ -1,14 +1,36 @@
 import os
+import cProfile
+import json
 import logging
+import math
 import time
 
 from argparse import ArgumentParser
-from typing import Callable, Any, Sequence
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from typing import Callable, Any, Iterable, Iterator, Sequence
 
-from include.videoCompare import FrameError, VideoCompare
+import numpy as np
+
+from include.videoCompare import (FrameError, VideoCompare, video_fingerprint, fingerprint_distance,
+                                  fingerprint_candidates)
 from include.imageCompare import ImageCompare
-from include.fileByteCompare import validate_file_contents
+from include.imageCache import imageCache
+from include.clusters import DisjointSet
+from include.capturePool import capturePool
+from include.pipeline import Pipeline
+from include.stats import stats, start_worker
+from include.progress import Progress
+from include.report import ClusterReport
+from include.batchSimilarity import thumbnail, thumbnail_key, batch_ssim, image_windows
+from include.fileByteCompare import validate_file_contents, hash_file_partial, hash_file
+from include.hashCache import HashCache
+from include.imageHash import dhash, hash_candidates
+from include.prefilter import compatible_items, within_tolerances
 import include.files as files
+import include.state as state
+import include.actions as actions
 
 
 def parser() -> ArgumentParser:
@@ -25,7 +47,18 @@ def parser() -> ArgumentParser:
                       version='%(prog)s 1.1.0')
 
   parser.add_argument(
-      '-d', '--directory', help='Find duplicates on this directory', default='.', type=str)
+      '-d', '--directory', help='Find duplicates on these directories', nargs='+',
+      default=['.'], type=str)
+  parser.add_argument(
+      '--walkers', help='Number of threads listing directories, useful on network '
+      'filesystems. With more than one, files are searched in path order',
+      default=1, type=int)
+  parser.add_argument(
+      '--readers', help='Number of threads reading and hashing files and reading '
+      'headers, overlapping with the directory walk', default=4, type=int)
+  parser.add_argument(
+      '--queue-size', help='Maximum number of files waiting between two stages of '
+      'the search', dest='queueSize', default=256, type=int)
   parser.add_argument(
       '-v', '--verbose', help='Print verbose output', action='count', default=0)
   parser.add_argument(
@@ -35,11 +68,19 @@ def parser() -> ArgumentParser:
       choices=['soft', 'hard'], default='hard', type=str)
   parser.add_argument(
       '--scale', help='Factor to compare frames in video comparison', default=1, type=int)
+  parser.add_argument(
+      '--compare-size', help='Length in pixels of the shorter side images are reduced to '
+      'before comparing them, 0 to compare them at full resolution', dest='compareSize',
+      default=128, type=int)
+  parser.add_argument(
+      '--decode', help='How sampled video frames are reached: seeking to each one, '
+      'decoding sequentially or choosing by the distance between them',
+      choices=['auto', 'seek', 'sequential'], default='auto', type=str)
   parser.add_argument(
       '-r', '--recursive', help='Recursively search the directory', action='store_true')
   parser.add_argument(
       '-a', '--action', help='Action to take on duplicate files',
-      choices=['delete', 'move', 'link'], default='delete', type=str)
+      choices=['delete', 'move', 'link', 'hardlink', 'reflink'], default='delete', type=str)
   parser.add_argument(
       '-b', '--bulk', help='Confirm delete on all duplicate files, otherwise confirm each file',
       action='store_true')
@@ -47,10 +88,87 @@ def parser() -> ArgumentParser:
       '-o', '--output', help='Output directory to write duplicate files',
       default='duplicated', type=str)
 
+  parser.add_argument(
+      '--dry-run', help='Print the actions planned instead of performing them',
+      dest='dryRun', action='store_true')
+  parser.add_argument(
+      '--plan', help='Write the actions planned to this file instead of performing them',
+      default=None, type=str)
+  parser.add_argument(
+      '--execute', help='Perform the actions of a plan written with --plan, without '
+      'searching, resuming an interrupted run from its journal', default=None, type=str)
+  parser.add_argument(
+      '--action-threads', help='Number of files acted on at once',
+      dest='actionThreads', default=8, type=int)
+  parser.add_argument(
+      '--retries', help='Number of retries of an action failing with a transient error',
+      default=3, type=int)
+
   parser.add_argument(
       '-f', '--fileChoice', help='Choose which file to keep', 
       choices=['first', 'last', 'bigger', 'smaller', 'best'], default='first', type=str)
 
+  parser.add_argument(
+      '-j', '--jobs', help='Number of processes comparing files, 0 uses all CPUs',
+      default=1, type=int)
+  parser.add_argument(
+      '--no-prefilter', help='Do not skip soft comparison of images with different '
+      'aspect ratios or videos with different durations', dest='noPrefilter',
+      action='store_true')
+  parser.add_argument(
+      '--hash-distance', help='Maximum perceptual hash distance, out of 64 bits, '
+      'for two images to be compared in soft comparison',
+      dest='hashDistance', default=10, type=int)
+  parser.add_argument(
+      '--video-distance', help='Maximum mean perceptual hash distance, out of 64 bits, '
+      'between the sampled frames of two videos for them to be compared in soft comparison',
+      dest='videoDistance', default=10, type=float)
+  parser.add_argument(
+      '--image-cache', help='Memory budget, in MiB, for decoded images kept between comparisons',
+      dest='imageCache', default=512, type=int)
+  parser.add_argument(
+      '--incremental', help='Only compare files added or changed since the previous '
+      'incremental run, keeping its duplicates', action='store_true')
+  parser.add_argument(
+      '--state', help='File where incremental runs keep the files and duplicates found',
+      default='cache/state.json', type=str)
+  parser.add_argument(
+      '--checkpoint', help='Save the progress of the search to this file periodically',
+      default=None, type=str)
+  parser.add_argument(
+      '--checkpoint-interval', help='Seconds between two checkpoints',
+      dest='checkpointInterval', default=300, type=float)
+  parser.add_argument(
+      '--resume', help='Continue the search saved in the checkpoint file, if the files '
+      'and options did not change', action='store_true')
+  parser.add_argument(
+      '--report', help='Write each cluster of duplicates to this file as soon as it is final',
+      default=None, type=str)
+  parser.add_argument(
+      '--format', help='Format of the report, a JSON object per cluster or a CSV row '
+      'per duplicate', choices=list(ClusterReport.formats), default='jsonl', type=str)
+  parser.add_argument(
+      '--progress', help='Show a status line with the files, bytes and pairs processed, '
+      'their rates and the time left', action='store_true')
+  parser.add_argument(
+      '--stats', help='Print counters and timings of each stage of the search and '
+      'the action', action='store_true')
+  parser.add_argument(
+      '--stats-file', help='Write the counters and timings to this JSON file',
+      dest='statsFile', default=None, type=str)
+  parser.add_argument(
+      '--profile', help='Write a cProfile dump of the main process to this file',
+      default=None, type=str)
+  parser.add_argument(
+      '--cache', help='File where content hashes are kept between runs',
+      default='cache/hashes.db', type=str)
+  parser.add_argument(
+      '--no-cache', help='Do not use the content hash cache', dest='noCache',
+      action='store_true')
+  parser.add_argument(
+      '--cache-max-age', help='Remove cached hashes not used for this many days',
+      dest='cacheMaxAge', default=30, type=float)
+
   group = parser.add_mutually_exclusive_group()
 
   group.add_argument(
@@ -72,15 +190,34 @@ class DuplicateFinder:
       main(): Search for all duplicated and perform the choosed action over them
       search(): Get all duplicated files in the given directory with the given option
       get_all_files(): Get all files in the directory with the given option.
-      compare_files(file1: str, file2: str) -> bool: Compare two files.
+      compare_files(file1: str, file2: str) -> tuple[bool, float | None]: \
+          Compare two files.
       compare_files_hard(file1: str, file2: str) -> bool: Compare two files \
           using hard comparison.
-      compare_files_soft(file1: str, file2: str) -> bool: Compare two files \
-          using soft comparison.
+      compare_files_soft(file1: str, file2: str) -> tuple[bool, float | None]: \
+          Compare two files using soft comparison.
+      search_hard(allFiles: list[str]): Search for identical files grouping them \
+          by size and content hashes.
+      search_soft(allFiles: list[str]): Search for similar files comparing \
+          only candidate pairs.
+      compare_pairs(pairs: Iterable[tuple[str, str]]): Compare pairs of files, \
+          in parallel when more than one job is set.
+      compare_image_pairs(allFiles: list[str], pairs: list[tuple[int, int]]): \
+          Compare pairs of images in batches of thumbnails.
+      plan_actions(dic: dict[str, set[str]]) -> list[dict[str, Any]]: Plan the \
+          action on each duplicate file.
+      execute_actions(steps: list[dict[str, Any]]): Perform the steps of an \
+          action plan, several at once.
       print_duplicates(): Print the duplicate files.
+      report_clusters(allFiles: Iterable[str]): Write the final clusters of \
+          the given files to the report.
       get_all_duplicates() -> list[str]: Get all duplicate files.
   """
 
+  chunkSize = 16
+  aspectTolerance = 0.05
+  timeThreshold = 1
+
   videoExtensions = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
   imageExtensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif'}
 
@@ -91,9 +228,16 @@ class DuplicateFinder:
     formatLog = '%(asctime)s - %(name)s - %(levelname)s: %(message)s'
     logging.basicConfig(filename=logFileName, format=formatLog, level=logLevel)
 
-    self.args = parser().parse_args(args)
+    argumentParser = parser()
+    self.args = argumentParser.parse_args(args)
+    if self.args.resume and self.args.checkpoint is None:
+      argumentParser.error('--resume requires --checkpoint')
 
-    self.directory = self.args.directory
+    self.directories = self.root_directories(self.args.directory, self.args.recursive)
+    self.directory = self.directories[0]
+    self.walkers = self.args.walkers
+    self.readers = self.args.readers
+    self.queueSize = self.args.queueSize
     self.verbose = self.args.verbose
     self.bulk = self.args.bulk
     self.similarity = self.args.similarity
@@ -103,32 +247,146 @@ class DuplicateFinder:
     self.include = self.args.include
     self.action = self.args.action
     self.output = self.args.output
+    self.dryRun = self.args.dryRun
+    self.planFile = self.args.plan
+    self.executeFile = self.args.execute
+    self.actionThreads = self.args.actionThreads
+    self.retries = self.args.retries
     self.fileChoice = self.args.fileChoice
     self.scale = self.args.scale
+    self.decode = self.args.decode
+    self.compareSize = self.args.compareSize
+    self.prefilter = not self.args.noPrefilter
+    self.hashDistance = self.args.hashDistance
+    self.videoDistance = self.args.videoDistance
+    imageCache.maxBytes = self.args.imageCache * 1024 * 1024
+    self.jobs = self.args.jobs if self.args.jobs > 0 else os.cpu_count() or 1
+    self.incremental = self.args.incremental
+    self.stateFile = self.args.state
+    self.checkpointFile = self.args.checkpoint
+    self.checkpointInterval = self.args.checkpointInterval
+    self.resume = self.args.resume
+    self.cacheFile = None if self.args.noCache else self.args.cache
+    self.cacheMaxAge = self.args.cacheMaxAge
+    self.showStats = self.args.stats
+    self.statsFile = self.args.statsFile
+    self.profileFile = self.args.profile
+    self.reportFile = self.args.report
+    self.reportFormat = self.args.format
+    self.progress = self.args.progress
+    self.collectStats = (self.showStats or self.progress or self.statsFile is not None
+                         or self.profileFile is not None)
+    stats.enabled = self.collectStats
+    self.cache = None
+    self.report = None
+
+    self.clusters = DisjointSet()
+    self.similarities = {}
+    self.reported = set()
+    self.inventory = {}
+    self.fingerprints = {'image': {}, 'video': {}}
+    self.done = {}
+    self.checkpointStarted = False
+    self.lastCheckpoint = time.monotonic()
+    self.hardLinks = {}
+    self.headers = {}
+
+  def iter_files(self) -> Iterator[os.DirEntry]:
+    """
+    ### Stream the files in the directory with the given options.
 
-    self.duplicates = {}
-    self.countDuplicates = 0
+    Returns
+    ----------
+        Iterator[os.DirEntry]: Entries of the files, as they are found.
+    """
+    return self.skip_hard_links(stats.timed('walk', files.scan_files(
+      self.directories, self.recursive, include=self.include,
+      exclude=self.exclude, threads=self.walkers)))
 
-  def get_all_files(self) -> list[str]:
+  def skip_hard_links(self, entries: Iterable[os.DirEntry]) -> Iterator[os.DirEntry]:
     """
-    ### Get all files in the directory.
+    ### Keep a single path of each file with several hard links.
+
+    Paths with the same device and inode are the same file, so only the first
+    one found is searched and the others are recorded on hardLinks instead of
+    being reported as its duplicates.
+
+    Parameters
+    ----------
+        entries (Iterable[os.DirEntry]): Entries of the files.
 
     Returns
     ----------
-        list[str]: List of file paths.
+        Iterator[os.DirEntry]: Entries of the files, without repeated inodes.
+    """
+    seen = {}
+    for entry in entries:
+      try:
+        stat = entry.stat()
+        inode = entry.inode()
+      except OSError as e:
+        logging.error(f"Error reading file {entry.path}.")
+        logging.error(getattr(e, 'message', repr(e)))
+        continue
+      stats.count('files enumerated')
+
+      # Some platforms do not report inodes or link counts on directory entries
+      if inode == 0 or stat.st_nlink == 1:
+        yield entry
+        continue
+
+      key = (stat.st_dev, inode)
+      if key in seen:
+        logging.info(f"{entry.path} is a hard link to {seen[key]}")
+        self.hardLinks.setdefault(seen[key], []).append(entry.path)
+        stats.count('hard links skipped')
+        continue
+
+      seen[key] = entry.path
+      yield entry
+
+  @staticmethod
+  def root_directories(directories: list[str], recursive: bool) -> list[str]:
     """
-    allFiles = []
+    ### Drop the directories that would be searched more than once.
 
-    allFiles = files.get_files(self.directory) if not self.recursive else files.get_recursive_files(self.directory)
+    A file listed twice would be found to duplicate itself, so repeated
+    directories and, on recursive searches, directories inside another one
+    are dropped.
+
+    Parameters
+    ----------
+        directories (list[str]): Directories given to search.
+        recursive (bool): Whether subdirectories are searched.
 
-    allFiles = filter(lambda x: os.path.splitext(x)[1] not in self.exclude, allFiles)
+    Returns
+    ----------
+        list[str]: The directories to search, in the given order.
+    """
+    reals = [os.path.realpath(directory) for directory in directories]
 
-    if self.include:
-      allFiles = filter(lambda x: os.path.splitext(x)[1] in self.include, allFiles)
+    roots = []
+    for i, (directory, real) in enumerate(zip(directories, reals)):
+      if any((other == real and j < i) or
+             (recursive and other != real and os.path.commonpath([real, other]) == other)
+             for j, other in enumerate(reals)):
+        logging.warning(f"Directory {directory} is already searched.")
+        continue
+      roots.append(directory)
 
-    return list(allFiles)
+    return roots
 
-  def compare_files(self, file1: str, file2: str) -> bool:
+  def get_all_files(self) -> list[str]:
+    """
+    ### Get all files in the directory.
+
+    Returns
+    ----------
+        list[str]: List of file paths.
+    """
+    return [entry.path for entry in self.iter_files()]
+
+  def compare_files(self, file1: str, file2: str) -> tuple[bool, float | None]:
     """
     ### Compare two files.
 
@@ -139,12 +397,16 @@ class DuplicateFinder:
 
     Returns
     ----------
-        bool: True if the files are considered duplicates, False otherwise.
+        tuple[bool, float | None]: True if the files are considered duplicates,
+          and their similarity, 1 for identical files, or None if unknown.
     """
     if self.type == 'soft':
-      return self.compare_files_soft(file1, file2)
+      with stats.timer('compare_files_soft'):
+        return self.compare_files_soft(file1, file2)
 
-    return self.compare_files_hard(file1, file2)
+    with stats.timer('compare_files_hard'):
+      equal = self.compare_files_hard(file1, file2)
+    return equal, 1.0 if equal else None
 
   def type_check(self, extension1: str, extension2: str) -> bool:
     """
@@ -187,7 +449,7 @@ class DuplicateFinder:
     if self.verbose > 0:
       print(f"Comparing {file1} and {file2} using hard comparison")
 
-    logging.info(f"Comparing {file1} and {file2} using hard comparison")
+    logging.info("Comparing %s and %s using hard comparison", file1, file2)
 
     file1Extension = os.path.splitext(file1)[1].replace('.', '')
     file2Extension = os.path.splitext(file2)[1].replace('.', '')
@@ -196,8 +458,9 @@ class DuplicateFinder:
       return validate_file_contents(file1, file2)
 
     if file1Extension in self.videoExtensions:
-      return VideoCompare(file1, file2, verbose=self.verbose, 
-                          similarity=self.similarity).compare_videos_hard()
+      with VideoCompare(file1, file2, verbose=self.verbose,
+                        similarity=self.similarity) as videoCompare:
+        return videoCompare.compare_videos_hard()
 
     if file1Extension in self.imageExtensions:
       return ImageCompare(file1, file2, verbose=self.verbose, 
@@ -205,7 +468,7 @@ class DuplicateFinder:
 
     return validate_file_contents(file1, file2)
 
-  def compare_files_soft(self, file1: str, file2: str) -> bool:
+  def compare_files_soft(self, file1: str, file2: str) -> tuple[bool, float | None]:
     """
     ### Compare two files using soft comparison.
 
@@ -216,90 +479,1116 @@ class DuplicateFinder:
 
     Returns
     ----------
-        bool: True if the files are considered duplicates, False otherwise.
+        tuple[bool, float | None]: True if the files are considered duplicates,
+          and their similarity, or None if they could not be compared.
     """
     if self.verbose > 0:
       print(f"Comparing {file1} and {file2} using soft comparison")
 
-    logging.info(f"Comparing {file1} and {file2} using soft comparison")
+    logging.info("Comparing %s and %s using soft comparison", file1, file2)
 
     file1Extension = os.path.splitext(file1)[1]
     file2Extension = os.path.splitext(file2)[1]
 
     if not self.type_check(file1Extension, file2Extension):
-      return False
+      return False, None
 
     if file1Extension in self.videoExtensions:
       try:
-        result = VideoCompare(file1, file2, verbose=self.verbose, 
-                            similarity=self.similarity).compare_videos_soft(self.scale)
+        with VideoCompare(file1, file2, verbose=self.verbose, similarity=self.similarity,
+                          decode=self.decode) as videoCompare:
+          result = videoCompare.compare_videos_soft(self.scale)
       except ValueError as e:
         print('ERROR: {} value is to small or to big'.format(self.scale))
         logging.error('The value ({}) is to small or to big'.format(self.scale))
         logging.error('Error comparing {} and {}'.format(file1, file2))
         logging.error(getattr(e, 'message', repr(e)))
-        return False
+        return False, None
       except FrameError as e:
         print('ERROR: error reading frames of the video {} or {}'.format(file1, file2))
         logging.error('Error comparing {} and {}'.format(file1, file2))
         logging.error(getattr(e, 'message', repr(e)))
-        return False
+        return False, None
       except Exception as e:
         print('ERROR: error comparing videos {} and {}'.format(file1, file2))
         logging.error('Error comparing {} and {}'.format(file1, file2))
         logging.error(getattr(e, 'message', repr(e)))
-        return False
+        return False, None
 
       if self.verbose > 0:
         print(f"Video similarity: {result[1]}")
-      return result[0]
+      return result[0], float(result[1])
 
     if file1Extension in self.imageExtensions:
       try:
-        result = ImageCompare(file1, file2, verbose=self.verbose, 
-                            similarity=self.similarity).image_similarity()
+        result = ImageCompare(file1, file2, verbose=self.verbose, similarity=self.similarity,
+                              compare_size=self.compareSize).image_similarity()
       except Exception as e:
         print('ERROR: error comparing images {} and {}'.format(file1, file2))
         logging.error('Error comparing {} and {}'.format(file1, file2))
         logging.error(getattr(e, 'message', repr(e)))
-        return False
+        return False, None
 
-      logging.info(f"Image similarity: {result[1]}")
+      logging.info("Image similarity: %s", result[1])
 
       if self.verbose > 0:
         print(f"Image similarity: {result[1]}")
-      return result[0]
+      return result[0], float(result[1])
 
     # TODO: Implement soft comparison for different file types
-    return False
+    return False, None
     
   def search(self) -> None:
     """
     ### Search the directory for duplicate files.
     """
-    allFiles = self.get_all_files()
-    for i in range(len(allFiles)):
-      for j in range(i+1, len(allFiles)):
-        if self.compare_files(
-            allFiles[i],
-            allFiles[j]
-          ):
-          if allFiles[i] not in self.get_all_duplicates():
-            self.duplicates[allFiles[i]] = set([allFiles[j]])
-            self.countDuplicates += 1
-            continue
-          if (allFiles[j] not in self.get_all_duplicates() and
-          allFiles[i] in self.duplicates):
-            self.duplicates[allFiles[i]].add(allFiles[j])
-            self.countDuplicates += 1
+    if self.cacheFile is not None:
+      self.cache = HashCache(self.cacheFile)
+
+    if self.reportFile is not None:
+      self.report = ClusterReport(self.reportFile, self.reportFormat)
+
+    progress = Progress(stats) if self.progress else None
+    if progress is not None:
+      progress.start()
+
+    try:
+      with stats.timer('search'):
+        if self.incremental:
+          self.search_incremental()
+        elif self.type == 'hard':
+          self.search_hard(self.record_inventory(self.iter_files()))
+        else:
+          self.search_soft(self.read_headers(self.record_inventory(self.iter_files())))
+      # Clusters not reported during the search are only final now
+      self.report_clusters(self.clusters)
+    finally:
+      # Also keep the progress made before an interruption
+      self.save_checkpoint(force=True)
+      if progress is not None:
+        progress.stop()
+      if self.report is not None:
+        self.report.close()
+        self.report = None
+      # Videos may be moved or deleted by the action, release the idle ones
+      capturePool.clear()
+      if self.cache is not None:
+        removed = self.cache.evict(self.cacheMaxAge * 24 * 60 * 60, self.directories)
+        logging.info(f"Hash cache: {self.cache.hits} hits, {self.cache.misses} misses, "
+                     f"{removed} stale entries removed")
+        stats.count('hash cache hits', self.cache.hits)
+        stats.count('hash cache misses', self.cache.misses)
+        self.cache.close()
+        self.cache = None
+
+  def search_incremental(self) -> None:
+    """
+    ### Search only the files added or changed since the previous run.
+
+    The files are compared by path, size and modification time with the
+    inventory saved by the previous incremental run. Its duplicates are kept
+    for the unchanged files, and only new or changed files are compared, both
+    with each other and with the unchanged files, of which only the first
+    file of each cluster is used. Without a previous state made with the same
+    options, every file is searched. The new inventory and duplicates are
+    saved at the end.
+    """
+    entries = list(self.iter_files())
+    inventory = state.file_inventory(entries)
+    self.inventory = inventory
+    previous = state.load_state(self.stateFile)
+
+    if previous is None or previous.get('options') != self.state_options():
+      logging.info("No previous state for these options, searching every file")
+      if self.type == 'hard':
+        self.search_hard(entries)
+      else:
+        self.search_soft([entry.path for entry in entries])
+    else:
+      unchanged = state.unchanged_files(previous['inventory'], inventory)
+
+      clustered = set()
+      for group in previous['clusters']:
+        members = [file for file in group if file in unchanged]
+        for other in members[1:]:
+          self.clusters.union(members[0], other)
+          clustered.add(other)
+
+      entries = [entry for entry in entries if entry.path not in clustered]
+      changed = {entry.path for entry in entries if entry.path not in unchanged}
+      logging.info(f"Incremental search: {len(changed)} new or changed files, "
+                   f"{len(previous['inventory']) - len(unchanged)} changed or removed")
+
+      if self.type == 'hard':
+        sizes = {files.return_file_size(entry) for entry in entries if entry.path in changed}
+        self.search_hard([entry for entry in entries
+                          if entry.path in changed or files.return_file_size(entry) in sizes],
+                         changed)
+      else:
+        self.search_soft([entry.path for entry in entries], changed)
+
+    state.save_state(self.stateFile, {
+      'options': self.state_options(),
+      'inventory': inventory,
+      'clusters': list(self.clusters.groups().values())
+    })
+
+  def state_options(self) -> dict[str, Any]:
+    """
+    ### Options that must match for a saved state to be reused.
+
+    Returns
+    ----------
+        dict[str, Any]: The options that change which files are duplicates.
+    """
+    return {
+      'directories': [os.path.abspath(directory) for directory in self.directories],
+      'recursive': self.recursive,
+      'include': self.include,
+      'exclude': self.exclude,
+      'type': self.type,
+      'similarity': self.similarity,
+      'scale': self.scale,
+      'prefilter': self.prefilter,
+      'hashDistance': self.hashDistance,
+      'videoDistance': self.videoDistance,
+      'compareSize': self.compareSize
+    }
+
+  def record_inventory(self, entries: Iterable[os.DirEntry]) -> Iterator[os.DirEntry]:
+    """
+    ### Keep the size and modification time of the files walked for the checkpoint.
+
+    Parameters
+    ----------
+        entries (Iterable[os.DirEntry]): Entries of the files.
+
+    Returns
+    ----------
+        Iterator[os.DirEntry]: The same entries.
+    """
+    for entry in entries:
+      if self.checkpointFile is not None:
+        stat = entry.stat()
+        self.inventory[entry.path] = [stat.st_size, stat.st_mtime_ns]
+      yield entry
+
+  def start_checkpoint(self) -> None:
+    """
+    ### Restore the progress of the checkpoint and start saving it.
+
+    Called once every file was walked. With --resume, the clusters, the
+    fingerprints and the number of groups or pairs done are restored if the
+    checkpoint was made with the same options on the same files, otherwise
+    the search starts over. Checkpoints are only saved from now on, so an
+    interrupted walk never replaces a checkpoint.
+    """
+    if self.checkpointFile is None or self.checkpointStarted:
+      return
+    self.checkpointStarted = True
+
+    if not self.resume:
+      return
+
+    saved = state.load_state(self.checkpointFile)
+    if saved is None or saved.get('options') != self.checkpoint_options() \
+        or saved.get('inventory') != self.inventory:
+      print('WARNING: the checkpoint does not match the files or options, starting over')
+      logging.warning(f"Checkpoint {self.checkpointFile} does not match, starting over")
+      return
+
+    for group in saved['clusters']:
+      for other in group[1:]:
+        self.clusters.union(group[0], other)
+    self.fingerprints = {kind: {file: np.array(fingerprint, dtype=np.uint64)
+                                for file, fingerprint in fingerprints.items()}
+                         for kind, fingerprints in saved['fingerprints'].items()}
+    self.done = saved['done']
+    logging.info(f"Resuming from {self.checkpointFile}: {self.done}")
+
+  def checkpoint_options(self) -> dict[str, Any]:
+    """
+    ### Options that must match for a checkpoint to be resumed.
+
+    Returns
+    ----------
+        dict[str, Any]: The options that change the groups or pairs compared.
+    """
+    return {**self.state_options(), 'incremental': self.incremental}
+
+  def save_checkpoint(self, force: bool = False) -> None:
+    """
+    ### Save the progress of the search if the checkpoint interval elapsed.
+
+    The pending hashes and fingerprints of the cache are saved too, without
+    the cache the fingerprints are kept in the checkpoint.
+
+    Parameters
+    ----------
+        force (bool, optional): Save even if the interval did not elapse.
+          Defaults to False.
+    """
+    if not self.checkpointStarted:
+      return
+    if not force and time.monotonic() - self.lastCheckpoint < self.checkpointInterval:
+      return
+
+    with stats.timer('checkpoint'):
+      if self.cache is not None:
+        self.cache.save()
+      state.save_state(self.checkpointFile, {
+        'options': self.checkpoint_options(),
+        'inventory': self.inventory,
+        'fingerprints': {kind: {file: [int(value) for value in fingerprint]
+                                for file, fingerprint in fingerprints.items()}
+                         for kind, fingerprints in self.fingerprints.items()},
+        'clusters': list(self.clusters.groups().values()),
+        'done': self.done
+      })
+    self.lastCheckpoint = time.monotonic()
+
+  def __getstate__(self) -> dict[str, Any]:
+    # The cache connection and the report are only used by the main process
+    # and cannot be sent to the worker processes. Neither are the results of
+    # the search, which grow with the number of files while the workers only
+    # need the options of the comparisons
+    state = self.__dict__.copy()
+    state['cache'] = None
+    state['report'] = None
+    state['headers'] = {}
+    state['inventory'] = {}
+    state['fingerprints'] = {}
+    state['clusters'] = DisjointSet()
+    state['similarities'] = {}
+    state['reported'] = set()
+    state['done'] = {}
+    state['hardLinks'] = {}
+    return state
+
+  def read_headers(self, allFiles: Iterable[str | os.DirEntry]) -> list[str]:
+    """
+    ### Read the headers used by the soft search while walking the directories.
+
+    Files are streamed to the reader threads as they are found, which read
+    the headers of images and videos for the metadata prefilter, so the
+    directory walk and the header reads overlap.
+
+    Parameters
+    ----------
+        allFiles (Iterable[str | os.DirEntry]): Files to read.
+
+    Returns
+    ----------
+        list[str]: Paths of the files, in the order they were found.
+    """
+    order = []
+
+    def walk() -> Iterator[str]:
+      for entry in allFiles:
+        order.append(os.fspath(entry))
+        yield order[-1]
+
+    def read(file: str) -> list[tuple[str, Any]]:
+      extension = os.path.splitext(file)[1]
+      if extension in self.imageExtensions:
+        return [(file, self.image_header(file))]
+      if extension in self.videoExtensions:
+        return [(file, self.video_header(file))]
+      return []
+
+    if not self.prefilter:
+      return list(walk())
+
+    for file, header in Pipeline(walk(), self.queueSize).stage(read, self.readers):
+      self.headers[file] = header
+
+    return order
+
+  def search_soft(self, allFiles: list[str], changed: set[str] | None = None) -> None:
+    """
+    ### Search for similar files comparing only candidate pairs.
+
+    Files are first paired by their header metadata, images with the same
+    aspect ratio and videos with the same duration. Then images are indexed by
+    their perceptual hash and videos are fingerprinted by the hashes of
+    sampled frames, only decoding files with a compatible pair. Only pairs
+    whose hashes are within the hash or video distance are compared, images
+    in batches of thumbnails unless compareSize is 0, and videos pair by
+    pair. Other files have no soft comparison and are skipped.
+
+    Parameters
+    ----------
+        allFiles (list[str]): Files to search.
+        changed (set[str] | None, optional): If given, only pairs with at
+          least one of these files are compared. Defaults to None.
+    """
+    self.start_checkpoint()
+
+    images = [i for i, file in enumerate(allFiles)
+              if os.path.splitext(file)[1] in self.imageExtensions]
+    videos = [i for i, file in enumerate(allFiles)
+              if os.path.splitext(file)[1] in self.videoExtensions]
+
+    imagePairs = self.image_candidates(allFiles, images)
+    videoPairs = self.video_candidates(allFiles, videos)
+    if changed is not None:
+      imagePairs = [(i, j) for i, j in imagePairs if allFiles[i] in changed or allFiles[j] in changed]
+      videoPairs = [(i, j) for i, j in videoPairs if allFiles[i] in changed or allFiles[j] in changed]
+    imagePairs.sort()
+    videoPairs.sort()
+    if self.compareSize <= 0:
+      imagePairs, videoPairs = [], sorted(imagePairs + videoPairs)
+
+    # The pairs are sorted, so the pairs done before resuming come first
+    self.done.setdefault('imagePairs', 0)
+    self.done.setdefault('videoPairs', 0)
+    imagePairs = imagePairs[self.done['imagePairs']:]
+    videoPairs = videoPairs[self.done['videoPairs']:]
+    stats.count('pairs to compare', len(imagePairs) + len(videoPairs))
+
+    for (file1, file2), result in self.compare_image_pairs(allFiles, imagePairs):
+      if result:
+        self.add_duplicate(file1, file2)
+      self.done['imagePairs'] += 1
+      self.save_checkpoint()
+
+    for (file1, file2), result in self.compare_pairs(
+        (allFiles[i], allFiles[j]) for i, j in videoPairs):
+      if result:
+        self.add_duplicate(file1, file2)
+      self.done['videoPairs'] += 1
+      self.save_checkpoint()
+
+  def compare_image_pairs(
+    self, allFiles: list[str], pairs: list[tuple[int, int]]) -> Iterator[tuple[tuple[str, str], bool]]:
+    """
+    ### Compare pairs of images in batches of grayscale thumbnails.
+
+    Images are reduced to square thumbnails of compareSize pixels, then each
+    image is compared with all of its candidates at once using a vectorized
+    SSIM, instead of computing it on the full images pair by pair. Pairs are
+    taken a window at a time, holding no more thumbnails than half the image
+    cache, and the thumbnails are kept in the image cache between windows.
+
+    Parameters
+    ----------
+        allFiles (list[str]): Files being searched.
+        pairs (list[tuple[int, int]]): Sorted pairs of indexes of images to compare.
+
+    Returns
+    ----------
+        Iterator[tuple[tuple[str, str], bool]]: Each pair with the result of
+          its comparison, in the order of the pairs.
+    """
+    limit = max(2, imageCache.maxBytes // 2 // max(1, self.compareSize) ** 2)
+    for window in image_windows(pairs, limit):
+      thumbnails = {}
+      for i in sorted({i for pair in window for i in pair}):
+        thumbnails[i] = imageCache.get(thumbnail_key(allFiles[i], self.compareSize))
+      missing = [i for i, image in thumbnails.items() if image is None]
+      for i, image in zip(missing, self.map_files(
+          self.image_thumbnail, [allFiles[i] for i in missing])):
+        thumbnails[i] = image
+        imageCache.put(thumbnail_key(allFiles[i], self.compareSize), image)
+
+      yield from self.compare_thumbnails(allFiles, window, thumbnails)
+
+  def compare_thumbnails(
+    self, allFiles: list[str], pairs: list[tuple[int, int]],
+    thumbnails: dict[int, np.ndarray | None]) -> Iterator[tuple[tuple[str, str], bool]]:
+    """
+    ### Compare pairs of images by their thumbnails, each image with all of
+    its candidates at once.
+
+    Parameters
+    ----------
+        allFiles (list[str]): Files being searched.
+        pairs (list[tuple[int, int]]): Sorted pairs of indexes of images to compare.
+        thumbnails (dict[int, np.ndarray | None]): Thumbnail of each image of
+          the pairs, None if it cannot be read.
+
+    Returns
+    ----------
+        Iterator[tuple[tuple[str, str], bool]]: Each pair with the result of
+          its comparison, in the order of the pairs.
+    """
+    start = 0
+    while start < len(pairs):
+      base = pairs[start][0]
+      end = start
+      while end < len(pairs) and pairs[end][0] == base:
+        end += 1
+      batch = pairs[start:end]
+      start = end
+
+      others = [j for _, j in batch if thumbnails[j] is not None]
+      scores = {}
+      if thumbnails[base] is not None and others:
+        scores = dict(zip(others, batch_ssim(
+          thumbnails[base], np.stack([thumbnails[j] for j in others]))))
+
+      for i, j in batch:
+        file1, file2 = allFiles[i], allFiles[j]
+        if j not in scores:
+          print('ERROR: error comparing images {} and {}'.format(file1, file2))
+          logging.error('Error reading {} or {}'.format(file1, file2))
+          stats.count('pairs compared')
+          yield (file1, file2), False
+          continue
+
+        stats.count('pairs compared')
+        logging.info("Image similarity of %s and %s: %s", file1, file2, scores[j])
+        if self.verbose > 0:
+          print(f"Image similarity of {file1} and {file2}: {scores[j]}")
+        if self.similarity <= scores[j]:
+          self.add_similarity(file1, file2, float(scores[j]))
+          yield (file1, file2), True
+        else:
+          yield (file1, file2), False
+
+  def image_thumbnail(self, image: str) -> np.ndarray | None:
+    """
+    ### Grayscale square thumbnail of an image, see batchSimilarity.thumbnail.
+
+    Parameters
+    ----------
+        image (str): Path to the image.
+
+    Returns
+    ----------
+        np.ndarray | None: The thumbnail, or None if the image cannot be read.
+    """
+    return thumbnail(image, self.compareSize)
+
+  def image_candidates(self, allFiles: list[str], images: list[int]) -> list[tuple[int, int]]:
+    """
+    ### Find the pairs of images with close perceptual hashes.
+
+    Parameters
+    ----------
+        allFiles (list[str]): Files being searched.
+        images (list[int]): Indexes of the images in allFiles.
+
+    Returns
+    ----------
+        list[tuple[int, int]]: Pairs of indexes (i, j), with i < j, of images
+          whose hashes are within the hash distance.
+    """
+    possible = len(images) * (len(images) - 1) // 2
+    stats.count('image pairs considered', possible)
+    tolerances = (math.log1p(self.aspectTolerance),)
+    values = self.compatible_files(
+      allFiles, images, self.image_header, lambda header: (math.log(header[1] / header[0]),),
+      tolerances)
+    if values is not None:
+      images = sorted(values)
+
+    hashes = {}
+    for i, fingerprint in zip(images, self.file_fingerprints(
+        'image', self.image_fingerprint, [allFiles[i] for i in images])):
+      if fingerprint is not None:
+        hashes[i] = int(fingerprint[0])
+
+    # The prefilter is only checked on the pairs found by the index, most
+    # images share an aspect ratio so the compatible pairs are not built
+    candidates, incompatible = [], 0
+    for i, j in hash_candidates(hashes, self.hashDistance):
+      if values is None or within_tolerances(values[i], values[j], tolerances):
+        candidates.append((i, j))
+      else:
+        incompatible += 1
+
+    remaining = len(images) * (len(images) - 1) // 2
+    stats.count('image pairs rejected by prefilter', possible - remaining + incompatible)
+    stats.count('image pairs rejected by hash distance',
+                remaining - len(candidates) - incompatible)
+
+    return candidates
+
+  def video_candidates(self, allFiles: list[str], videos: list[int]) -> list[tuple[int, int]]:
+    """
+    ### Find the pairs of videos with close fingerprints.
+
+    Parameters
+    ----------
+        allFiles (list[str]): Files being searched.
+        videos (list[int]): Indexes of the videos in allFiles.
+
+    Returns
+    ----------
+        list[tuple[int, int]]: Pairs of indexes (i, j), with i < j, of videos
+          whose fingerprints are within the video distance.
+    """
+    possible = len(videos) * (len(videos) - 1) // 2
+    stats.count('video pairs considered', possible)
+    tolerances = (self.timeThreshold,)
+    values = self.compatible_files(
+      allFiles, videos, self.video_header, lambda header: (header[3],), tolerances)
+    if values is not None:
+      videos = sorted(values)
+
+    fingerprints = {i: fingerprint for i, fingerprint in zip(videos, self.file_fingerprints(
+      'video', self.video_fingerprint, [allFiles[i] for i in videos])) if fingerprint is not None}
+
+    # Only the pairs found by the index of the frame hashes are checked
+    candidates, incompatible = [], 0
+    for i, j in fingerprint_candidates(fingerprints, self.videoDistance):
+      if values is not None and not within_tolerances(values[i], values[j], tolerances):
+        incompatible += 1
+      elif fingerprint_distance(fingerprints[i], fingerprints[j]) <= self.videoDistance:
+        candidates.append((i, j))
+
+    remaining = len(videos) * (len(videos) - 1) // 2
+    stats.count('video pairs rejected by prefilter', possible - remaining + incompatible)
+    stats.count('video pairs rejected by fingerprint distance',
+                remaining - len(candidates) - incompatible)
+
+    return candidates
+
+  def compatible_files(
+    self, allFiles: list[str], indexes: list[int], header: Callable[[str], Any],
+    values: Callable[[Any], tuple[float, ...]],
+    tolerances: tuple[float, ...]) -> dict[int, tuple[float, ...]] | None:
+    """
+    ### Metadata of the files whose header is within the tolerances of another file.
+
+    Parameters
+    ----------
+        allFiles (list[str]): Files being searched.
+        indexes (list[int]): Indexes in allFiles of the files to pair.
+        header (Callable[[str], Any]): Function reading the header of a file,
+          or returning None if it cannot be read.
+        values (Callable[[Any], tuple[float, ...]]): Function returning the
+          metadata values compared from a header.
+        tolerances (tuple[float, ...]): Maximum difference of each value.
+
+    Returns
+    ----------
+        dict[int, tuple[float, ...]] | None: The metadata values of the files
+          with at least one compatible file, keyed by their index, or None if
+          the prefilter is disabled. Whether two of them are compatible is
+          checked with within_tolerances.
+    """
+    if not self.prefilter:
+      return None
+
+    headers = self.file_headers(header, [allFiles[i] for i in indexes])
+    items = [(i, values(h)) for i, h in zip(indexes, headers) if h is not None]
+    compatible = compatible_items(items, tolerances)
+
+    return {i: value for i, value in items if i in compatible}
+
+  def file_headers(self, func: Callable[[str], Any], allFiles: list[str]) -> list[Any]:
+    """
+    ### Headers of the files, reading only the ones not read yet.
+
+    Headers are kept on the headers attribute, so the ones read by the
+    prefilter are reused when choosing the best quality file.
+
+    Parameters
+    ----------
+        func (Callable[[str], Any]): Function reading the header of a file.
+        allFiles (list[str]): Files to read.
+
+    Returns
+    ----------
+        list[Any]: Header of each file, None if it cannot be read.
+    """
+    missing = [file for file in allFiles if file not in self.headers]
+    for file, header in zip(missing, self.map_files(func, missing)):
+      self.headers[file] = header
+
+    return [self.headers[file] for file in allFiles]
+
+  def image_header(self, file: str) -> tuple[int, int] | None:
+    """
+    ### Resolution of an image, read from its header.
+
+    Parameters
+    ----------
+        file (str): Path to the image.
+
+    Returns
+    ----------
+        tuple[int, int] | None: The resolution as (height, width), or None if
+          its header cannot be read.
+    """
+    try:
+      return files.get_image_header_resolution(file)
+    except Exception as e:
+      logging.error('Error reading the header of {}'.format(file))
+      logging.error(getattr(e, 'message', repr(e)))
+      return None
+
+  def video_header(self, file: str) -> tuple[float, float, float, float] | None:
+    """
+    ### Resolution, fps and duration of a video, read from its container.
+
+    Parameters
+    ----------
+        file (str): Path to the video.
+
+    Returns
+    ----------
+        tuple[float, float, float, float] | None: The width, height, fps and
+          duration of the video, or None if its container cannot be read.
+    """
+    try:
+      return files.get_video_metadata(file)
+    except Exception as e:
+      logging.error('Error reading the container of {}'.format(file))
+      logging.error(getattr(e, 'message', repr(e)))
+      return None
+
+  def file_fingerprints(
+    self, kind: str, func: Callable[[str], Any], allFiles: list[str]) -> list[Any]:
+    """
+    ### Fingerprints of the files, read from the cache when they did not change.
+
+    Without the cache, the fingerprints are kept for the checkpoint when
+    there is one.
+
+    Parameters
+    ----------
+        kind (str): Kind of fingerprint kept in the cache.
+        func (Callable[[str], Any]): Function computing the fingerprint of a
+          file, or None if it cannot be read.
+        allFiles (list[str]): Files to fingerprint.
+
+    Returns
+    ----------
+        list[Any]: The fingerprint of each file, in the same order.
+    """
+    if self.cache is not None:
+      get, put = self.cache.get_fingerprint, self.cache.set_fingerprint
+    elif self.checkpointFile is not None:
+      # Without the cache, the fingerprints are kept in the checkpoint
+      get = lambda file, kind: self.fingerprints[kind].get(file)
+      put = lambda file, kind, fingerprint: self.fingerprints[kind].__setitem__(file, fingerprint)
+    else:
+      return self.map_files(func, allFiles)
+
+    fingerprints = [get(file, kind) for file in allFiles]
+    missing = [i for i, fingerprint in enumerate(fingerprints) if fingerprint is None]
+
+    # Fingerprint a slice at a time so checkpoints are saved in between
+    step = len(missing) if self.checkpointFile is None else 64 * self.chunkSize * self.jobs
+    for start in range(0, len(missing), max(1, step)):
+      batch = missing[start:start + step]
+      for i, fingerprint in zip(batch, self.map_files(func, [allFiles[i] for i in batch])):
+        fingerprints[i] = fingerprint
+        if fingerprint is not None:
+          put(allFiles[i], kind, fingerprint)
+      self.save_checkpoint()
+
+    return fingerprints
+
+  def image_fingerprint(self, file: str) -> np.ndarray | None:
+    """
+    ### Perceptual hash of an image, or None if it cannot be read.
+
+    The image is decoded at the resolution of its thumbnail, so the decode is
+    kept in the image cache for the comparisons.
+
+    Parameters
+    ----------
+        file (str): Path to the image.
+
+    Returns
+    ----------
+        np.ndarray | None: Array holding the hash of the image.
+    """
+    try:
+      with stats.timer('image fingerprint'):
+        fingerprint = np.array([dhash(file, decodeSize=self.compareSize or 128)], dtype=np.uint64)
+      stats.count('files fingerprinted')
+      return fingerprint
+    except Exception as e:
+      print('ERROR: error reading image {}'.format(file))
+      logging.error('Error hashing {}'.format(file))
+      logging.error(getattr(e, 'message', repr(e)))
+      return None
+
+  def video_fingerprint(self, file: str) -> np.ndarray | None:
+    """
+    ### Fingerprint of a video, or None if it cannot be read.
+
+    Parameters
+    ----------
+        file (str): Path to the video.
+
+    Returns
+    ----------
+        np.ndarray | None: The hashes of the sampled frames of the video.
+    """
+    try:
+      fingerprint = video_fingerprint(file, decode=self.decode)
+      stats.count('files fingerprinted')
+      return fingerprint
+    except Exception as e:
+      print('ERROR: error reading frames of the video {}'.format(file))
+      logging.error('Error fingerprinting {}'.format(file))
+      logging.error(getattr(e, 'message', repr(e)))
+      return None
+
+  def map_files(self, func: Callable[[str], Any], allFiles: list[str]) -> list[Any]:
+    """
+    ### Apply a function to every file, in parallel when more than one job is set.
+
+    Parameters
+    ----------
+        func (Callable[[str], Any]): Function to apply.
+        allFiles (list[str]): Files to process.
+
+    Returns
+    ----------
+        list[Any]: Result for each file, in the same order.
+    """
+    if self.jobs <= 1 or len(allFiles) <= 1:
+      return [func(file) for file in allFiles]
+
+    chunks = [allFiles[i:i + self.chunkSize] for i in range(0, len(allFiles), self.chunkSize)]
+    # Methods are sent by name, sending them would send the whole finder too
+    task = func.__name__ if getattr(func, '__self__', None) is self else func
+    results = []
+    with self.process_pool() as executor:
+      for chunk, workerStats in executor.map(map_chunk, repeat(task), chunks):
+        stats.merge(workerStats)
+        results.extend(chunk)
+    return results
+
+  def process_pool(self) -> ProcessPoolExecutor:
+    """
+    ### Start a pool of worker processes for the comparisons.
+
+    The configuration of the finder is sent once to each worker when it
+    starts, and the tasks only carry the files they work on.
+
+    Returns
+    ----------
+        ProcessPoolExecutor: The pool, to be used as a context manager.
+    """
+    return ProcessPoolExecutor(max_workers=self.jobs, initializer=start_finder,
+                               initargs=(self.__getstate__(), self.collectStats))
+
+  def compare_pairs(
+    self, pairs: Iterable[tuple[str, str]]) -> Iterator[tuple[tuple[str, str], bool]]:
+    """
+    ### Compare pairs of files, in parallel when more than one job is set.
+
+    Pairs are sent in chunks to a process pool, keeping only a few chunks
+    queued at a time, and the results are returned in the order of the pairs
+    so the duplicates found do not depend on the number of jobs.
+
+    Parameters
+    ----------
+        pairs (Iterable[tuple[str, str]]): Pairs of files to compare.
+
+    Returns
+    ----------
+        Iterator[tuple[tuple[str, str], bool]]: Each pair with the result of
+          its comparison. The similarity of the duplicates is kept for the
+          report.
+    """
+    if self.jobs <= 1:
+      for file1, file2 in pairs:
+        result = self.compare_files(file1, file2)
+        stats.count('pairs compared')
+        yield from self.keep_similarities([(file1, file2)], [result])
+      return
+
+    pairs = iter(pairs)
+    chunks = iter(lambda: list(islice(pairs, self.chunkSize)), [])
+
+    with self.process_pool() as executor:
+      pending = deque()
+      for chunk in chunks:
+        pending.append((chunk, executor.submit(compare_chunk, chunk)))
+        if len(pending) >= 2 * self.jobs:
+          chunk, future = pending.popleft()
+          results, workerStats = future.result()
+          stats.merge(workerStats)
+          stats.count('pairs compared', len(chunk))
+          yield from self.keep_similarities(chunk, results)
+
+      while pending:
+        chunk, future = pending.popleft()
+        results, workerStats = future.result()
+        stats.merge(workerStats)
+        stats.count('pairs compared', len(chunk))
+        yield from self.keep_similarities(chunk, results)
+
+  def keep_similarities(
+    self, pairs: list[tuple[str, str]],
+    results: list[tuple[bool, float | None]]) -> Iterator[tuple[tuple[str, str], bool]]:
+    """
+    ### Keep the similarity of the pairs found to be duplicates.
+
+    Parameters
+    ----------
+        pairs (list[tuple[str, str]]): Pairs of files compared.
+        results (list[tuple[bool, float | None]]): Result and similarity of
+          the comparison of each pair.
+
+    Returns
+    ----------
+        Iterator[tuple[tuple[str, str], bool]]: Each pair with the result of
+          its comparison.
+    """
+    for (file1, file2), (result, similarity) in zip(pairs, results):
+      if result and similarity is not None:
+        self.add_similarity(file1, file2, similarity)
+      yield (file1, file2), result
+
+  def add_duplicate(self, file1: str, file2: str) -> None:
+    """
+    ### Register that two files were considered duplicates.
+
+    Both files join the same cluster, along with every file already
+    clustered with either of them.
+
+    Parameters
+    ----------
+        file1 (str): Path to the file compared first.
+        file2 (str): Path to the file found to duplicate it.
+    """
+    self.clusters.union(file1, file2)
+
+  def add_similarity(self, file1: str, file2: str, similarity: float) -> None:
+    """
+    ### Keep the similarity of two duplicates for the report.
+
+    Only the pairs found to be duplicates are kept, so the memory used grows
+    with the duplicates found and not with the pairs compared.
+
+    Parameters
+    ----------
+        file1 (str): Path to the first file.
+        file2 (str): Path to the second file.
+        similarity (float): Similarity of the files, 1 for identical files.
+    """
+    if self.reportFile is None:
+      return
+    self.similarities[tuple(sorted((file1, file2)))] = similarity
+
+  def report_clusters(self, allFiles: Iterable[str]) -> None:
+    """
+    ### Write the clusters of the given files to the report.
+
+    Clusters already written are skipped, so the clusters final before the
+    end of the search can be written first and the rest afterwards. The
+    similarity of each duplicate is its similarity with the file kept, 1 for
+    identical files in hard comparison, and None when that pair was not
+    compared, the duplicate joining the cluster through another file.
+
+    Parameters
+    ----------
+        allFiles (Iterable[str]): Files whose clusters are final.
+    """
+    if self.report is None:
+      return
+
+    clusters = {}
+    for file in allFiles:
+      if file in self.clusters:
+        representative = self.clusters.representative(file)
+        if representative not in self.reported:
+          clusters.setdefault(representative, []).append(file)
+
+    for representative, group in clusters.items():
+      if len(group) < 2:
+        continue
+      self.reported.add(representative)
+      kept, *duplicates = self.order_cluster(group)
+      self.report.write((kept, self.file_size(kept)), [
+        (file, self.file_size(file),
+         1.0 if self.type == 'hard' else self.similarities.get(tuple(sorted((kept, file)))))
+        for file in duplicates])
+
+  def file_size(self, file: str) -> int | None:
+    """
+    ### Size of a file, or None if it cannot be read.
+
+    Parameters
+    ----------
+        file (str): Path to the file.
+
+    Returns
+    ----------
+        int | None: Size of the file in bytes.
+    """
+    try:
+      return files.return_file_size(file)
+    except OSError:
+      return None
+
+  @property
+  def duplicates(self) -> dict[str, set[str]]:
+    """
+    ### Duplicate files of each cluster.
+
+    Returns
+    ----------
+        dict[str, set[str]]: The files of each cluster, keyed by the file of
+          the cluster found first.
+    """
+    return {group[0]: set(group[1:]) for group in self.clusters.groups().values()}
+
+  @property
+  def countDuplicates(self) -> int:
+    """
+    ### Number of files that duplicate the first file of their cluster.
+    """
+    return len(self.clusters) - self.clusters.clusterCount
+
+  def group_stages(
+    self, allFiles: Iterable[str | os.DirEntry],
+    keys: list[Callable[[str | os.DirEntry], Any]]) -> list[list[str]]:
+    """
+    ### Split the files into groups sharing the same key on every stage.
+
+    Files are streamed through a pipeline: the walker feeds the first stage,
+    the keys of each stage are computed by the reader threads and a matcher
+    thread per stage groups them. A file only gets the key of the next stage
+    once another file shares its key on the current one, so the costly keys
+    of the last stages are only computed for collisions, and reading files,
+    hashing them and walking the directories overlap. Groups keep the order
+    in which their files were given and groups with a single file are
+    dropped, since they cannot hold duplicates. Files that cannot be read are
+    logged and left out.
+
+    Parameters
+    ----------
+        allFiles (Iterable[str | os.DirEntry]): Files to group.
+        keys (list[Callable[[str | os.DirEntry], Any]]): Function returning
+          the key of a file on each stage.
+
+    Returns
+    ----------
+        list[list[str]]: Groups with more than one file on the last stage.
+    """
+    stages = [{} for _ in keys]
+    order = {}
+
+    def walk() -> Iterator[tuple[tuple, str | os.DirEntry]]:
+      for entry in allFiles:
+        order[os.fspath(entry)] = len(order)
+        yield (), entry
+
+    def read(key: Callable[[str | os.DirEntry], Any]) -> Callable:
+      def read_key(item: tuple[tuple, str | os.DirEntry]) -> list[tuple[tuple, str | os.DirEntry]]:
+        previous, file = item
+        try:
+          return [(previous + (key(file),), file)]
+        except OSError as e:
+          logging.error(f"Error reading file {os.fspath(file)}.")
+          logging.error(getattr(e, 'message', repr(e)))
+          return []
+      return read_key
+
+    def match(groups: dict[tuple, list], last: bool) -> Callable:
+      def match_key(item: tuple[tuple, str | os.DirEntry]) -> list[tuple[tuple, str | os.DirEntry]]:
+        key, file = item
+        group = groups.setdefault(key, [])
+        group.append(file)
+        if last or len(group) == 1:
+          return []
+
+        # The first file of the group waited for a collision to move on
+        return [(key, member) for member in (group if len(group) == 2 else group[-1:])]
+      return match_key
+
+    pipeline = Pipeline(walk(), self.queueSize)
+    for stage, key in enumerate(keys):
+      pipeline.stage(read(key), threads=1 if stage == 0 else self.readers)
+      pipeline.stage(match(stages[stage], stage + 1 == len(keys)))
+    for _ in pipeline:
+      pass
+
+    groups = [sorted((os.fspath(file) for file in group), key=order.get)
+              for group in stages[-1].values() if len(group) > 1]
+    return sorted(groups, key=lambda group: order[group[0]])
+
+  def search_hard(
+    self, allFiles: Iterable[str | os.DirEntry], changed: set[str] | None = None) -> None:
+    """
+    ### Search for identical files with a staged candidate pipeline.
+
+    Files are grouped by size, then by a hash of their first and last blocks
+    and then by a hash of their whole content. Only files colliding on every
+    stage are compared byte by byte. When the hash cache is enabled, the
+    hashes of unchanged files are read from it and a full hash collision is
+    trusted, so unchanged files are not read again.
+
+    Parameters
+    ----------
+        allFiles (Iterable[str | os.DirEntry]): Files to search.
+        changed (set[str] | None, optional): If given, only groups with at
+          least one of these files are registered. Defaults to None.
+    """
+    if self.cache is None:
+      self.search_hard_groups(allFiles, hash_file_partial, hash_file, True, changed)
+      return
+
+    self.search_hard_groups(allFiles, self.cache.partial_hash, self.cache.full_hash, False, changed)
+
+  def search_hard_groups(
+    self, allFiles: Iterable[str | os.DirEntry], partialHash: Callable[[str], str],
+    fullHash: Callable[[str], str], validate: bool, changed: set[str] | None = None) -> None:
+    """
+    ### Group the files by size and hashes and register the collisions.
+
+    Parameters
+    ----------
+        allFiles (Iterable[str | os.DirEntry]): Files to search.
+        partialHash (Callable[[str], str]): Hash of the first and last blocks.
+        fullHash (Callable[[str], str]): Hash of the whole file.
+        validate (bool): If True, files with the same hashes are still compared
+          byte by byte.
+        changed (set[str] | None, optional): If given, only groups with at
+          least one of these files are registered. Defaults to None.
+    """
+    groups = self.group_stages(allFiles, [files.return_file_size, partialHash, fullHash])
+
+    if changed is not None:
+      groups = [group for group in groups if not changed.isdisjoint(group)]
+
+    # The groups are sorted, so the groups done before resuming come first
+    self.start_checkpoint()
+    self.done.setdefault('groups', 0)
+    for group in groups[self.done['groups']:]:
+      if not validate:
+        for other in group[1:]:
+          self.clusters.union(group[0], other)
+        if changed is None:
+          self.report_clusters(group)
+        self.done['groups'] += 1
+        self.save_checkpoint()
+        continue
+
+      remaining = group
+      while len(remaining) > 1:
+        base, different = remaining[0], []
+        stats.count('pairs to compare', len(remaining) - 1)
+        for other in remaining[1:]:
+          if self.verbose > 0:
+            print(f"Comparing {base} and {other} using hard comparison")
+          logging.info("Comparing %s and %s using hard comparison", base, other)
+
+          equal = validate_file_contents(base, other)
+          stats.count('pairs compared')
+          if equal:
+            self.clusters.union(base, other)
             continue
-          # other file is similar enough to be considered a duplicate
-          # of the allFiles[i] file but not similar enough to be considered
-          # a duplicate of the allFiles[j] file
-          if (allFiles[j] not in self.get_all_duplicates() and
-          allFiles[i] not in self.duplicates):
-            self.duplicates[allFiles[i]] = set([allFiles[j]])
-            self.countDuplicates += 1
+          different.append(other)
+        remaining = different
+
+      # Files of other groups differ from these, so their clusters are final,
+      # unless clusters of a previous incremental run may still be merged
+      if changed is None:
+        self.report_clusters(group)
+      self.done['groups'] += 1
+      self.save_checkpoint()
 
   def get_all_duplicates(self) -> set[str]:
     """
@@ -309,13 +1598,7 @@ class DuplicateFinder:
     ----------
         list[str]: List of duplicate files.
     """
-    if len(self.duplicates) == 0:
-      return set()
-    
-    nestedList = list(self.duplicates.keys()) + [
-      item for sublist in list(self.duplicates.values()) for item in sublist]
-    
-    return set(nestedList)
+    return set(self.clusters)
 
   def order_by_info(self, list: list[str], func: Callable[[str], Any], reverse: bool) -> list[str]:
     """
@@ -354,35 +1637,85 @@ class DuplicateFinder:
     """
     fileExtension = os.path.splitext(list[0])[1]
     if fileExtension in self.videoExtensions:
-      return self.order_by_info(list, files.get_video_pixels, reverse)
+      return self.order_by_info(list, self.video_pixels, reverse)
 
     if fileExtension in self.imageExtensions:
-      return self.order_by_info(list, files.get_pixels, reverse)
+      return self.order_by_info(list, self.image_pixels, reverse)
 
     raise NotImplementedError(f"ERROR: Ordering by best quality is not" \
       " implemented for {} files.".format(fileExtension))
 
-  def choose_duplicate(self) -> dict[str, set[str]]:
+  def image_pixels(self, file: str) -> int:
     """
-    ### Choose which duplicate file to keep.
+    ### Number of pixels of an image, from its header.
+
+    Parameters
+    ----------
+        file (str): Path to the image.
 
     Returns
-    ---------- 
-      dict[str, list[str]]: A dictionary containing the file to keep as the key
-        and the files to delete/move/link as the values.
+    ----------
+        int: Number of pixels, 0 if the header cannot be read.
+    """
+    header = self.file_headers(self.image_header, [file])[0]
+    return 0 if header is None else header[0] * header[1]
+
+  def video_pixels(self, file: str) -> float:
+    """
+    ### Number of pixels per second of a video, from its container.
+
+    Parameters
+    ----------
+        file (str): Path to the video.
+
+    Returns
+    ----------
+        float: Width times height times fps, 0 if the container cannot be read.
+    """
+    header = self.file_headers(self.video_header, [file])[0]
+    return 0 if header is None else header[0] * header[1] * header[2]
+
+  def order_cluster(self, group: list[str]) -> list[str]:
+    """
+    ### Order the files of a cluster by the file choice, the file to keep first.
+
+    Parameters
+    ----------
+        group (list[str]): Files of the cluster.
+
+    Returns
+    ----------
+        list[str]: The files of the cluster, starting with the file to keep.
     """
-    choice = {
+    return {
       'first': lambda x: self.order_by_info(x, files.return_file_create_time, False),
       'last': lambda x: self.order_by_info(x, files.return_file_create_time, True),
       'bigger': lambda x: self.order_by_info(x, files.return_file_size, True),
       'smaller': lambda x: self.order_by_info(x, files.return_file_size, False),
       'best': lambda x: self.order_by_best_quality(x, True)
-    }[self.fileChoice]
+    }[self.fileChoice](group)
+
+  def choose_duplicate(self) -> dict[str, set[str]]:
+    """
+    ### Choose which duplicate file to keep.
+
+    Returns
+    ---------- 
+      dict[str, list[str]]: A dictionary containing the file to keep as the key
+        and the files to delete/move/link as the values.
+    """
+
+    if self.fileChoice == 'best':
+      # Read the headers missing from the search at once, in parallel
+      self.file_headers(self.image_header, [file for file in self.clusters
+                        if os.path.splitext(file)[1] in self.imageExtensions])
+      self.file_headers(self.video_header, [file for file in self.clusters
+                        if os.path.splitext(file)[1] in self.videoExtensions])
 
     duplicates = {}
 
-    for file in self.duplicates:
-      list = choice([*self.duplicates[file], file])
+    for group in self.clusters.groups().values():
+      list = self.order_cluster(group)
       duplicates[list[0]] = set(list[1:])
 
     if self.verbose > 0:
@@ -390,64 +1723,101 @@ class DuplicateFinder:
 
     return duplicates
 
-  def delete_duplicates(self, dic: dict[str, set[str]]) -> None:
+  def plan_actions(self, dic: dict[str, set[str]], action: str | None = None) -> list[dict[str, Any]]:
     """
-    ### Delete duplicate files.
-    """
-    if self.bulk:
-      for file in dic:
-        for duplicate in dic[file]:
-          try:
-            os.remove(duplicate)
-          except FileNotFoundError as e:
-            logging.error(f"File {duplicate} not found to be deleted.")
-            logging.error(getattr(e, 'message', repr(e)))
-          except Exception as e:
-            logging.error(f"Error deleting file {duplicate}.")
-            logging.error(getattr(e, 'message', repr(e)))
-      return
-    
+    ### Plan the action on each duplicate file.
+
+    Duplicates moved or linked to the output directory with the same name
+    get a numbered name, so none is overwritten. Paths are absolute, so a
+    saved plan acts on the same files wherever it is executed from.
+
+    Parameters
+    ----------
+        dic (dict[str, set[str]]): Duplicates of each file kept.
+        action (str | None, optional): Action to plan. Defaults to None,
+          meaning the action chosen.
+
+    Returns
+    ----------
+        list[dict[str, Any]]: The action, the path of the duplicate, the path
+          of the file kept and, to move or link, the target path of each step.
+    """
+    action = action or self.action
+    output = os.path.abspath(self.output)
+    steps, targets = [], set()
     for file in dic:
-      for duplicate in dic[file]:
-        read = input(f"Are you sure you want to delete {duplicate}? (y/n): ")
-        if read.lower() == 'y':
-          try:
-            os.remove(duplicate)
-          except FileNotFoundError as e:
-            logging.error(f"File {duplicate} not found to be deleted.")
-            logging.error(getattr(e, 'message', repr(e)))
-          except Exception as e:
-            logging.error(f"Error deleting file {duplicate}.")
-            logging.error(getattr(e, 'message', repr(e)))
-            
+      for duplicate in sorted(dic[file]):
+        target = None
+        if action in ('move', 'link'):
+          name, extension = os.path.splitext(os.path.basename(duplicate))
+          target, number = os.path.join(output, name + extension), 1
+          while target in targets:
+            target = os.path.join(output, f"{name}-{number}{extension}")
+            number += 1
+          targets.add(target)
+        steps.append({'action': action, 'path': os.path.abspath(duplicate),
+                      'kept': os.path.abspath(file), 'target': target})
+
+    return steps
+
+  def execute_actions(
+    self, steps: list[dict[str, Any]], journal: str | None = None,
+    apply: Callable[[dict[str, Any]], None] = actions.apply_action) -> dict[str, int]:
+    """
+    ### Perform the steps of an action plan, several at once.
+
+    Parameters
+    ----------
+        steps (list[dict[str, Any]]): Steps of the plan.
+        journal (str | None, optional): Journal of the steps already applied,
+          to resume an interrupted run. Defaults to None.
+        apply (Callable[[dict[str, Any]], None], optional): Function applying
+          a step. Defaults to actions.apply_action.
+
+    Returns
+    ----------
+        dict[str, int]: Number of steps applied, skipped and failed.
+    """
+    executor = actions.ActionExecutor(self.actionThreads, self.retries, journal)
+    counts = executor.run(steps, apply)
+    if counts['failed']:
+      print(f"ERROR: {counts['failed']} of {len(steps)} actions failed, see the log")
+    return counts
+
+  def delete_duplicates(self, dic: dict[str, set[str]]) -> None:
+    """
+    ### Delete duplicate files, confirming each one unless in bulk mode.
+    """
+    steps = self.plan_actions(dic, 'delete')
+    if not self.bulk:
+      # Ask for every file first, so the deletions are not waiting on the user
+      steps = [step for step in steps if input(
+        f"Are you sure you want to delete {step['path']}? (y/n): ").lower() == 'y']
+    self.execute_actions(steps)
 
   def move_duplicates(self, dic: dict[str, set[str]]) -> None:
     """
     ### Move duplicate files.
     """
-    os.makedirs(self.output, exist_ok=True)
-    for file in dic:
-      for duplicate in dic[file]:
-        fileName = os.path.basename(duplicate)
-        try:
-          os.rename(duplicate, os.path.join(self.output, fileName))
-        except Exception as e:
-          logging.error(f"Error moving file {duplicate}.")
-          logging.error(getattr(e, 'message', repr(e)))
+    self.execute_actions(self.plan_actions(dic, 'move'))
 
   def link_duplicates(self, dic: dict[str, set[str]]) -> None:
     """
     ### Create soft links for duplicate files.
     """
-    os.makedirs(self.output, exist_ok=True)
-    for file in dic:
-      for duplicate in dic[file]:
-        fileName = os.path.basename(duplicate)
-        try:
-          os.symlink(os.path.abspath(duplicate), os.path.join(self.output, fileName))
-        except Exception as e:
-          logging.error(f"Error linking file {duplicate}.")
-          logging.error(getattr(e, 'message', repr(e)))
+    self.execute_actions(self.plan_actions(dic, 'link'))
+
+  def hardlink_duplicates(self, dic: dict[str, set[str]]) -> None:
+    """
+    ### Replace duplicate files with hard links to the file kept.
+    """
+    self.execute_actions(self.plan_actions(dic, 'hardlink'))
+
+  def reflink_duplicates(self, dic: dict[str, set[str]]) -> None:
+    """
+    ### Replace duplicate files with copy-on-write clones of the file kept.
+    """
+    self.execute_actions(self.plan_actions(dic, 'reflink'))
 
   def action_on_duplicates(self, dic: dict[str, set[str]]) -> None:
     """
@@ -456,35 +1826,186 @@ class DuplicateFinder:
     {
       'delete': self.delete_duplicates,
       'move': self.move_duplicates,
-      'link': self.link_duplicates
+      'link': self.link_duplicates,
+      'hardlink': self.hardlink_duplicates,
+      'reflink': self.reflink_duplicates
     }[self.action](dic)
   
   def print_duplicates(self) -> None:
     """
     ### Print the duplicate files.
     """
-    for file in self.duplicates:
+    for file, duplicates in self.duplicates.items():
       print(file)
-      for duplicate in self.duplicates[file]:
+      for duplicate in duplicates:
         print(f"\t{duplicate}")
 
+  def print_hard_links(self) -> None:
+    """
+    ### Print the files found through several hard links.
+    """
+    for file, links in self.hardLinks.items():
+      print(f"{file} (hard links, not duplicates)")
+      for link in links:
+        print(f"\t{link}")
+
   def main(self) -> None:
     """
     ### Main function.
+
+    With --profile the whole run is profiled, and the counters and timings
+    are printed or written at the end when asked, even if it fails.
     """
+    profiler = cProfile.Profile() if self.profileFile is not None else None
+    if profiler is not None:
+      profiler.enable()
+
+    try:
+      self.run()
+    finally:
+      if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(self.profileFile)
+      self.report_stats()
+
+  def run(self) -> None:
+    """
+    ### Search for duplicates and perform the chosen action over them.
+
+    With --execute, the actions of a saved plan are performed instead.
+    """
+    if self.executeFile is not None:
+      self.execute_plan()
+      return
+
     self.search()
+    if self.verbose > 0:
+      self.print_hard_links()
+    if self.dryRun or self.planFile is not None:
+      self.act()
+      return
     if self.bulk and self.action == 'delete':
       read = input("Are you sure you want to delete all {} duplicated files? (y/n): "
                    .format(self.countDuplicates))
       if read.lower() == 'y':
-        self.action_on_duplicates(self.choose_duplicate())
+        self.act()
         return
       
       self.print_duplicates()
       # which action to take if the user doesn't confirm?
       return
     
-    self.action_on_duplicates(self.choose_duplicate())
+    self.act()
+
+  def act(self) -> None:
+    """
+    ### Choose the file to keep of each group and perform the action.
+    """
+    with stats.timer('choose'):
+      duplicates = self.choose_duplicate()
+
+    if self.dryRun or self.planFile is not None:
+      steps = self.plan_actions(duplicates)
+      if self.planFile is not None:
+        actions.save_plan(self.planFile, steps)
+        print(f"{len(steps)} actions planned in {self.planFile}")
+      if self.dryRun:
+        self.print_plan(steps)
+      return
+
+    with stats.timer('action'):
+      self.action_on_duplicates(duplicates)
+
+  def execute_plan(self) -> None:
+    """
+    ### Perform the actions of the plan file, skipping those already done.
+    """
+    steps = actions.load_plan(self.executeFile)
+    with stats.timer('action'):
+      counts = self.execute_actions(steps, actions.journal_path(self.executeFile))
+    print(f"{counts['applied']} actions performed, {counts['skipped']} already done, "
+          f"{counts['failed']} failed")
+
+  def print_plan(self, steps: list[dict[str, Any]]) -> None:
+    """
+    ### Print the steps of an action plan.
+
+    Parameters
+    ----------
+        steps (list[dict[str, Any]]): Steps of the plan.
+    """
+    for step in steps:
+      target = f" -> {step['target']}" if step['target'] is not None else ''
+      print(f"{step['action']} {step['path']}{target} (keeping {step['kept']})")
+
+  def report_stats(self) -> None:
+    """
+    ### Print the counters and timings and write them to the stats file.
+    """
+    if self.showStats:
+      print(stats.summary())
+
+    if self.statsFile is not None:
+      directory = os.path.dirname(self.statsFile)
+      if directory:
+        os.makedirs(directory, exist_ok=True)
+      with open(self.statsFile, 'w') as f:
+        json.dump(stats.report(), f, indent=2)
+
+# Finder of a worker process, set up by start_finder when the worker starts
+workerFinder = None
+
+def start_finder(state: dict[str, Any], collectStats: bool) -> None:
+  """
+  ### Set up the finder of a worker process.
+
+  Parameters
+  ----------
+      state (dict[str, Any]): State of the finder of the main process, without
+        the results of the search.
+      collectStats (bool): Whether the worker collects stats.
+  """
+  global workerFinder
+  workerFinder = DuplicateFinder.__new__(DuplicateFinder)
+  workerFinder.__dict__.update(state)
+  start_worker(collectStats)
+
+def map_chunk(func: Callable[[str], Any] | str, chunk: list[str]) -> tuple[list[Any], dict[str, Any]]:
+  """
+  ### Apply a function to a chunk of files, in a worker process.
+
+  Parameters
+  ----------
+      func (Callable[[str], Any] | str): Function to apply, or name of the
+        method of the finder to apply.
+      chunk (list[str]): Files to process.
+
+  Returns
+  ----------
+      tuple[list[Any], dict[str, Any]]: Result for each file and the stats
+        collected by the worker while processing them.
+  """
+  if isinstance(func, str):
+    func = getattr(workerFinder, func)
+  return [func(file) for file in chunk], stats.collect()
+
+def compare_chunk(
+  chunk: list[tuple[str, str]]) -> tuple[list[tuple[bool, float | None]], dict[str, Any]]:
+  """
+  ### Compare a chunk of pairs of files, in a worker process.
+
+  Parameters
+  ----------
+      chunk (list[tuple[str, str]]): Pairs of files to compare.
+
+  Returns
+  ----------
+      tuple[list[tuple[bool, float | None]], dict[str, Any]]: Result and
+        similarity of each comparison and the stats collected by the worker
+        while comparing them.
+  """
+  return [workerFinder.compare_files(file1, file2) for file1, file2 in chunk], stats.collect()
+
 
 if __name__ == '__main__':
   duplicate = DuplicateFinder()
@@ -0,0 +1,249 @@
+import errno
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+import include.files as files
+from include.stats import stats
+
+# Errors worth retrying, raised by busy or briefly unreachable filesystems
+transientErrors = {getattr(errno, name) for name in (
+  'EAGAIN', 'EBUSY', 'EINTR', 'EIO', 'ETIMEDOUT', 'ECONNRESET', 'ECONNABORTED',
+  'EHOSTDOWN', 'EHOSTUNREACH', 'ENETDOWN', 'ENETUNREACH', 'ESTALE') if hasattr(errno, name)}
+
+
+def replace_with_link(file: str, duplicate: str, link: Callable[[str, str], None]) -> None:
+  """
+  Replace a duplicate with a link to the file kept.
+
+  The link is created next to the duplicate and then renamed over it, so a
+  duplicate is never lost if the link cannot be created.
+
+  Args:
+    file (str): Path to the file kept.
+    duplicate (str): Path to the duplicate.
+    link (Callable[[str, str], None]): Function creating a link to the file
+      kept, given as first argument, on the path given as second.
+  """
+  directory, fileName = os.path.split(duplicate)
+  temporary = os.path.join(directory, f".{fileName}.{os.getpid()}.{threading.get_ident()}.link")
+  try:
+    link(file, temporary)
+    os.replace(temporary, duplicate)
+  finally:
+    if os.path.lexists(temporary):
+      os.remove(temporary)
+
+def apply_action(step: dict[str, Any]) -> None:
+  """
+  Apply a step of an action plan.
+
+  Steps can be applied again after an interruption: a duplicate already
+  deleted, moved or linked is not an error.
+
+  Args:
+    step (dict[str, Any]): The action, the path of the duplicate, the path of
+      the file kept and, to move or link, the target path.
+  """
+  action, path = step['action'], step['path']
+  if action == 'delete':
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      logging.info(f"File {path} was already deleted.")
+  elif action == 'move':
+    if not os.path.lexists(path) and os.path.lexists(step['target']):
+      logging.info(f"File {path} was already moved.")
+      return
+    os.makedirs(os.path.dirname(step['target']) or '.', exist_ok=True)
+    os.rename(path, step['target'])
+  elif action == 'link':
+    target = step['target']
+    if os.path.islink(target) and os.readlink(target) == os.path.abspath(path):
+      logging.info(f"File {path} was already linked.")
+      return
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    os.symlink(os.path.abspath(path), target)
+  elif action == 'hardlink':
+    replace_with_link(step['kept'], path, os.link)
+  elif action == 'reflink':
+    replace_with_link(step['kept'], path, files.reflink)
+  else:
+    raise ValueError(f"Unknown action {action}")
+
+def save_plan(path: str, steps: list[dict[str, Any]]) -> None:
+  """
+  Save an action plan, one step per line, replacing the previous plan and
+  its journal.
+
+  Args:
+    path (str): Path to the plan. Its directory is created if needed.
+    steps (list[dict[str, Any]]): Steps of the plan.
+  """
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+
+  temporary = f"{path}.{os.getpid()}.tmp"
+  with open(temporary, 'w') as f:
+    for step in steps:
+      f.write(json.dumps(step) + '\n')
+  os.replace(temporary, path)
+
+  # The steps of the journal were those of the previous plan
+  if os.path.exists(journal_path(path)):
+    os.remove(journal_path(path))
+
+def load_plan(path: str) -> list[dict[str, Any]]:
+  """
+  Load an action plan saved by save_plan.
+
+  Args:
+    path (str): Path to the plan.
+
+  Returns:
+    list[dict[str, Any]]: Steps of the plan.
+  """
+  with open(path) as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+def journal_path(plan: str) -> str:
+  """
+  Path to the journal of the steps of a plan already applied.
+
+  Args:
+    plan (str): Path to the plan.
+
+  Returns:
+    str: Path to the journal.
+  """
+  return plan + '.journal'
+
+
+class ActionExecutor:
+  """
+  Apply the steps of an action plan with a bounded pool of threads.
+
+  Removing, renaming and linking files mostly waits on the filesystem, so
+  several steps in flight hide the latency of network filesystems. Steps
+  failing with a transient error are retried with exponential backoff, other
+  errors are logged and the step is left for a later run. With a journal,
+  the index of each applied step is appended to it, so an interrupted run
+  resumes by skipping them.
+
+  Args:
+    threads (int, optional): Number of steps applied at once. Defaults to 8.
+    retries (int, optional): Number of retries of a step failing with a
+      transient error. Defaults to 3.
+    journal (str | None, optional): Path to the journal. Defaults to None.
+    backoff (float, optional): Seconds waited before the first retry, doubled
+      for each next one. Defaults to 0.1.
+
+  Attributes:
+    threads (int): Number of steps applied at once.
+    retries (int): Number of retries of a failing step.
+    journal (str | None): Path to the journal.
+    backoff (float): Seconds waited before the first retry.
+
+  Methods:
+    run: Apply the steps not applied yet.
+  """
+
+  def __init__(
+    self, threads: int = 8, retries: int = 3, journal: str | None = None,
+    backoff: float = 0.1) -> None:
+    self.threads = max(1, threads)
+    self.retries = retries
+    self.journal = journal
+    self.backoff = backoff
+    self.lock = threading.Lock()
+
+  def applied(self) -> set[int]:
+    """
+    Indexes of the steps already applied according to the journal.
+
+    Returns:
+      set[int]: The indexes, empty without a journal.
+    """
+    if self.journal is None or not os.path.exists(self.journal):
+      return set()
+    with open(self.journal) as f:
+      # A line cut by an interruption is ignored, its step is applied again
+      return {int(line) for line in f if line.strip().isdigit()}
+
+  def attempt(self, step: dict[str, Any], apply: Callable[[dict[str, Any]], None]) -> None:
+    """
+    Apply a step, retrying it on transient errors.
+
+    Args:
+      step (dict[str, Any]): Step to apply.
+      apply (Callable[[dict[str, Any]], None]): Function applying the step.
+    """
+    for retry in range(self.retries + 1):
+      try:
+        apply(step)
+        return
+      except OSError as e:
+        if e.errno not in transientErrors or retry == self.retries:
+          raise
+        stats.count('action retries')
+        time.sleep(self.backoff * 2 ** retry)
+
+  def run(
+    self, steps: list[dict[str, Any]],
+    apply: Callable[[dict[str, Any]], None] = apply_action) -> dict[str, int]:
+    """
+    Apply the steps not applied yet.
+
+    Args:
+      steps (list[dict[str, Any]]): Steps of the plan.
+      apply (Callable[[dict[str, Any]], None], optional): Function applying a
+        step. Defaults to apply_action.
+
+    Returns:
+      dict[str, int]: Number of steps applied, skipped because the journal
+        has them and failed.
+    """
+    done = self.applied()
+    counts = {'applied': 0, 'skipped': 0, 'failed': 0}
+    journal = open(self.journal, 'a') if self.journal is not None else None
+
+    def apply_step(index: int) -> None:
+      step = steps[index]
+      try:
+        self.attempt(step, apply)
+      except Exception as e:
+        logging.error(f"Error applying {step['action']} to file {step['path']}.")
+        logging.error(getattr(e, 'message', repr(e)))
+        with self.lock:
+          counts['failed'] += 1
+        return
+
+      with self.lock:
+        counts['applied'] += 1
+        if journal is not None:
+          journal.write(f"{index}\n")
+          journal.flush()
+
+    try:
+      with ThreadPoolExecutor(max_workers=self.threads) as executor:
+        pending = set()
+        for index in range(len(steps)):
+          if index in done:
+            counts['skipped'] += 1
+            continue
+          pending.add(executor.submit(apply_step, index))
+          # Only a few steps wait at a time, however long the plan is
+          if len(pending) >= 4 * self.threads:
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+    finally:
+      if journal is not None:
+        journal.close()
+
+    stats.count('actions applied', counts['applied'])
+    stats.count('actions failed', counts['failed'])
+    return counts
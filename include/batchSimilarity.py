@@ -0,0 +1,136 @@
+from typing import Iterable, Iterator
+
+import cv2 as cv
+import numpy as np
+
+from include.imageCache import imageCache, read_image_reduced
+from include.stats import stats
+
+
+def thumbnail(image: str, size: int = 128) -> np.ndarray | None:
+  """
+  Grayscale square thumbnail of an image, so thumbnails of different images
+  can be stacked together.
+
+  The whole image is stretched to the square, so every part of it is
+  compared. Images of different aspect ratios are distorted alike, and the
+  metadata prefilter only pairs images of nearly the same aspect ratio. Large
+  JPEG images are decoded directly at a reduced resolution, and thumbnails
+  are kept in the shared image cache.
+
+  Args:
+    image (str): Path to the image.
+    size (int, optional): Width and height of the thumbnail. Defaults to 128.
+
+  Returns:
+    np.ndarray | None: The thumbnail as a (size, size) uint8 array, or None if
+      the image cannot be read.
+  """
+  key = thumbnail_key(image, size)
+  cached = imageCache.get(key)
+  if cached is not None:
+    return cached
+
+  with stats.timer('thumbnail'):
+    gray = read_image_reduced(image, size)
+    if gray is None:
+      return None
+
+    square = cv.resize(gray, (size, size), interpolation=cv.INTER_AREA)
+
+  imageCache.put(key, square)
+  return square
+
+def thumbnail_key(image: str, size: int) -> tuple:
+  """
+  Key of the thumbnail of an image in the shared image cache.
+
+  Args:
+    image (str): Path to the image.
+    size (int): Width and height of the thumbnail.
+
+  Returns:
+    tuple: The key.
+  """
+  return (image, 'thumbnail', size)
+
+def image_windows(
+  pairs: Iterable[tuple[int, int]], limit: int) -> Iterator[list[tuple[int, int]]]:
+  """
+  Split pairs of images into consecutive windows holding at most a number
+  of distinct images, so only their thumbnails are needed at a time.
+
+  Args:
+    pairs (Iterable[tuple[int, int]]): Pairs of indexes of images.
+    limit (int): Maximum number of distinct images in a window, at least 2.
+
+  Returns:
+    Iterator[list[tuple[int, int]]]: The pairs of each window, in order.
+  """
+  window, images = [], set()
+  for pair in pairs:
+    new = set(pair) - images
+    if window and len(images) + len(new) > limit:
+      yield window
+      window, images, new = [], set(), set(pair)
+    window.append(pair)
+    images.update(new)
+
+  if window:
+    yield window
+
+def box_mean(images: np.ndarray, windowSize: int) -> np.ndarray:
+  """
+  Mean of every window of each image, computed with integral images so the
+  cost does not depend on the window size.
+
+  Args:
+    images (np.ndarray): Stack of images with shape (N, H, W).
+    windowSize (int): Width and height of the windows.
+
+  Returns:
+    np.ndarray: Means with shape (N, H - windowSize + 1, W - windowSize + 1),
+      only for windows fully inside the images.
+  """
+  integral = np.pad(images.cumsum(axis=1).cumsum(axis=2), ((0, 0), (1, 0), (1, 0)))
+  w = windowSize
+  sums = (integral[:, w:, w:] - integral[:, :-w, w:]
+          - integral[:, w:, :-w] + integral[:, :-w, :-w])
+  return sums / (w * w)
+
+def batch_ssim(base: np.ndarray, others: np.ndarray, windowSize: int = 7) -> np.ndarray:
+  """
+  Structural similarity (SSIM) of one image against many at once.
+
+  Uses the same uniform window, sample covariance and constants as
+  skimage.metrics.structural_similarity with its defaults for 8 bit images,
+  so the scores match it, but every image of the stack is compared in the
+  same vectorized operations and no difference image is built.
+
+  Args:
+    base (np.ndarray): Grayscale image with shape (H, W).
+    others (np.ndarray): Grayscale images with shape (N, H, W).
+    windowSize (int, optional): Width and height of the window. Defaults to 7.
+
+  Returns:
+    np.ndarray: The mean SSIM of the base image against each other image.
+  """
+  stats.count('image pairs scored', len(others))
+  with stats.timer('batch ssim'):
+    x = base.astype(np.float64)[np.newaxis]
+    y = others.astype(np.float64)
+
+    ux, uy = box_mean(x, windowSize), box_mean(y, windowSize)
+    uxx, uyy = box_mean(x * x, windowSize), box_mean(y * y, windowSize)
+    uxy = box_mean(x * y, windowSize)
+
+    covariance = windowSize ** 2 / (windowSize ** 2 - 1)
+    vx = covariance * (uxx - ux * ux)
+    vy = covariance * (uyy - uy * uy)
+    vxy = covariance * (uxy - ux * uy)
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    ssim = ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux ** 2 + uy ** 2 + c1) * (vx + vy + c2))
+
+    return ssim.mean(axis=(1, 2))
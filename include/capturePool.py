@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+import cv2 as cv
+
+
+class CapturePool:
+  """
+  Pool of opened videos, reused instead of opening a video again for each
+  comparison it takes part in.
+
+  A capture is taken out of the pool while it is used, so it is never shared,
+  and given back afterwards. At most maxHandles idle captures are kept, one
+  per video, releasing the least recently used ones beyond that, so the
+  decoder threads and buffers held stay bounded however many videos are read.
+
+  Args:
+    maxHandles (int, optional): Maximum number of idle captures. Defaults to 8.
+
+  Attributes:
+    maxHandles (int): Maximum number of idle captures.
+    opened (int): Number of captures opened.
+    reused (int): Number of captures taken from the pool.
+
+  Methods:
+    acquire: Take the capture of a video, opening it if none is idle.
+    give_back: Give a capture back to the pool.
+    clear: Release every idle capture.
+  """
+
+  def __init__(self, maxHandles: int = 8) -> None:
+    self.maxHandles = maxHandles
+    self.captures = OrderedDict()
+    self.opened = 0
+    self.reused = 0
+    self.lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return len(self.captures)
+
+  def acquire(self, video: str) -> cv.VideoCapture:
+    """
+    Take the capture of a video, opening it if none is idle.
+
+    Args:
+      video (str): Path to the video.
+
+    Returns:
+      cv.VideoCapture: The capture, which must be given back or released.
+    """
+    with self.lock:
+      capture = self.captures.pop(video, None)
+      if capture is not None:
+        self.reused += 1
+        return capture
+      self.opened += 1
+
+    return cv.VideoCapture(video)
+
+  def give_back(self, video: str, capture: cv.VideoCapture) -> None:
+    """
+    Give a capture back to the pool, releasing it if it cannot be kept.
+
+    Args:
+      video (str): Path to the video.
+      capture (cv.VideoCapture): The capture acquired for the video.
+    """
+    released = []
+    with self.lock:
+      if not capture.isOpened() or video in self.captures or self.maxHandles <= 0:
+        released.append(capture)
+      else:
+        self.captures[video] = capture
+        while len(self.captures) > self.maxHandles:
+          released.append(self.captures.popitem(last=False)[1])
+
+    for capture in released:
+      capture.release()
+
+  def clear(self) -> None:
+    """
+    Release every idle capture.
+    """
+    with self.lock:
+      released = list(self.captures.values())
+      self.captures.clear()
+
+    for capture in released:
+      capture.release()
+
+
+capturePool = CapturePool()
+
+
+@contextmanager
+def open_video(video: str) -> Iterator[cv.VideoCapture]:
+  """
+  Use the capture of a video from the shared pool, giving it back afterwards.
+
+  Args:
+    video (str): Path to the video.
+
+  Returns:
+    Iterator[cv.VideoCapture]: The capture of the video.
+  """
+  capture = capturePool.acquire(video)
+  try:
+    yield capture
+  finally:
+    capturePool.give_back(video, capture)
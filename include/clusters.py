@@ -0,0 +1,134 @@
+from typing import Iterator
+
+
+class DisjointSet:
+  """
+  Disjoint-set (union-find) structure grouping files into clusters.
+
+  Clusters are merged as matches are found, so membership and cluster
+  lookups take near constant time and a file matching any member of a
+  cluster joins the whole cluster. Each cluster is represented by the file
+  that was added to the structure first.
+
+  Attributes:
+    parent (dict[str, str]): Parent of each file, roots are their own parent.
+    size (dict[str, int]): Number of files in the cluster of each root.
+    first (dict[str, str]): File added first to the cluster of each root.
+    order (dict[str, int]): Order in which each file was added.
+
+  Methods:
+    add: Add a file as a cluster of its own.
+    find: Root of the cluster of a file.
+    union: Merge the clusters of two files.
+    representative: File added first to the cluster of a file.
+    groups: Files of each cluster, keyed by its representative.
+  """
+
+  def __init__(self) -> None:
+    self.parent = {}
+    self.size = {}
+    self.first = {}
+    self.order = {}
+
+  def __len__(self) -> int:
+    return len(self.parent)
+
+  def __contains__(self, item: str) -> bool:
+    return item in self.parent
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self.parent)
+
+  @property
+  def clusterCount(self) -> int:
+    """
+    Number of clusters.
+    """
+    return len(self.size)
+
+  def add(self, item: str) -> None:
+    """
+    Add a file as a cluster of its own, if it is not in the structure yet.
+
+    Args:
+      item (str): Path to the file.
+    """
+    if item in self.parent:
+      return
+    self.parent[item] = item
+    self.size[item] = 1
+    self.first[item] = item
+    self.order[item] = len(self.order)
+
+  def find(self, item: str) -> str:
+    """
+    Root of the cluster of a file, compressing the path to it.
+
+    Args:
+      item (str): Path to the file.
+
+    Returns:
+      str: The root of the cluster.
+    """
+    root = item
+    while self.parent[root] != root:
+      root = self.parent[root]
+
+    while self.parent[item] != root:
+      self.parent[item], item = root, self.parent[item]
+
+    return root
+
+  def union(self, item1: str, item2: str) -> str:
+    """
+    Merge the clusters of two files, adding them if needed.
+
+    Args:
+      item1 (str): Path to the first file.
+      item2 (str): Path to the second file.
+
+    Returns:
+      str: The root of the merged cluster.
+    """
+    self.add(item1)
+    self.add(item2)
+    root1, root2 = self.find(item1), self.find(item2)
+    if root1 == root2:
+      return root1
+
+    if self.size[root1] < self.size[root2]:
+      root1, root2 = root2, root1
+
+    self.parent[root2] = root1
+    self.size[root1] += self.size.pop(root2)
+    first1, first2 = self.first[root1], self.first.pop(root2)
+    if self.order[first2] < self.order[first1]:
+      self.first[root1] = first2
+
+    return root1
+
+  def representative(self, item: str) -> str:
+    """
+    File added first to the cluster of a file.
+
+    Args:
+      item (str): Path to the file.
+
+    Returns:
+      str: The representative of the cluster.
+    """
+    return self.first[self.find(item)]
+
+  def groups(self) -> dict[str, list[str]]:
+    """
+    Files of each cluster, in the order they were added.
+
+    Returns:
+      dict[str, list[str]]: The files of each cluster, keyed by its
+        representative, which is also the first file of the list.
+    """
+    groups = {}
+    for item in self.parent:
+      groups.setdefault(self.representative(item), []).append(item)
+
+    return groups
@@ -1,19 +1,76 @@
-from sys import argv
-from filecmp import cmp
+import hashlib
+import os
 
+from include.stats import stats
 
-"""
+
+def validate_file_contents(file1: str, file2: str, blockSize: int = 1 << 20) -> bool:
+  """
   Compare the contents of two files byte by byte.
 
+  The sizes are checked first and the files are then read in blocks, stopping
+  at the first block that differs, so memory use does not depend on the size
+  of the files.
+
   Args:
     file1 (str): Path to the first file.
     file2 (str): Path to the second file.
+    blockSize (int, optional): Number of bytes read at a time. Defaults to 1 MiB.
 
   Returns:
     bool: True if the files are the same, False otherwise.
-"""
-def validate_file_contents(file1: str, file2: str) -> bool:
-  with open(file1, 'rb') as f1, open(file2, 'rb') as f2:
-    contents1 = f1.read()
-    contents2 = f2.read()
-  return contents1 == contents2
+  """
+  with stats.timer('validate'), open(file1, 'rb') as f1, open(file2, 'rb') as f2:
+    if os.fstat(f1.fileno()).st_size != os.fstat(f2.fileno()).st_size:
+      return False
+
+    while True:
+      block1 = f1.read(blockSize)
+      block2 = f2.read(blockSize)
+      stats.count('bytes read', len(block1) + len(block2))
+      if block1 != block2:
+        return False
+      if not block1:
+        return True
+
+def hash_file_partial(file: str, blockSize: int = 4096) -> str:
+  """
+  Hash the first and last blocks of the file.
+
+  Files smaller than two blocks are hashed entirely.
+
+  Args:
+    file (str): Path to the file.
+    blockSize (int, optional): Number of bytes read from each end of the file.
+      Defaults to 4096.
+
+  Returns:
+    str: Hexadecimal digest of the sampled bytes.
+  """
+  digest = hashlib.blake2b(digest_size=16)
+  with stats.timer('partial hash'), open(file, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    digest.update(f.read(blockSize))
+    if size > blockSize:
+      f.seek(max(blockSize, size - blockSize))
+      digest.update(f.read(blockSize))
+  stats.count('bytes read', min(size, 2 * blockSize))
+  return digest.hexdigest()
+
+def hash_file(file: str, blockSize: int = 1 << 20) -> str:
+  """
+  Hash the whole content of the file, reading it in blocks.
+
+  Args:
+    file (str): Path to the file.
+    blockSize (int, optional): Number of bytes read at a time. Defaults to 1 MiB.
+
+  Returns:
+    str: Hexadecimal digest of the file content.
+  """
+  digest = hashlib.blake2b(digest_size=16)
+  with stats.timer('full hash'), open(file, 'rb') as f:
+    for block in iter(lambda: f.read(blockSize), b''):
+      digest.update(block)
+      stats.count('bytes read', len(block))
+  return digest.hexdigest()
@@ -1,18 +1,141 @@
+import logging
 import os
 import platform
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator
 
 
-def get_recursive_files(directory: str) -> list[str]:
+def list_directory(directory: str, include: set[str], exclude: set[str],
+                   stat: bool = False) -> tuple[list[os.DirEntry], list[str]]:
+  """
+  List the files and subdirectories of a single directory using os.scandir.
+
+  Args:
+      directory (str): Path to the directory.
+      include (set[str]): If not empty, only files with these extensions
+        are returned.
+      exclude (set[str]): Files with these extensions are not returned.
+      stat (bool, optional): Whether to stat the files while listing them,
+        caching the result on their entries. Defaults to False.
+
+  Returns:
+      tuple[list[os.DirEntry], list[str]]: Entries of the files and paths of
+        the subdirectories, not following symbolic links to directories.
+  """
+  found, subdirectories = [], []
+  try:
+    with os.scandir(directory) as entries:
+      for entry in entries:
+        if entry.is_dir():
+          if not entry.is_symlink():
+            subdirectories.append(entry.path)
+          continue
+
+        if not entry.is_file():
+          continue
+
+        extension = os.path.splitext(entry.name)[1]
+        if extension in exclude or (include and extension not in include):
+          continue
+
+        if stat:
+          entry.stat()
+        found.append(entry)
+  except OSError as e:
+    logging.error(f"Error listing directory {directory}.")
+    logging.error(getattr(e, 'message', repr(e)))
+
+  return found, subdirectories
+
+def scan_files(directory: str | list[str], recursive: bool = True,
+               include: Iterable[str] = (), exclude: Iterable[str] = (),
+               threads: int = 1) -> Iterator[os.DirEntry]:
+  """
+  Stream the files in one or more directories using os.scandir.
+
+  The entries keep the file type and, depending on the platform, the stat
+  data read while listing the directory, so the caller does not need to
+  stat the files again. With a single thread, directories are walked
+  top-down, in the same order as os.walk, and files are returned as they are
+  found. With more threads, directories are listed and their files stated
+  concurrently, which hides the latency of network filesystems, and the
+  files are returned sorted by path once the walk finishes. Symbolic links
+  to directories are not followed.
+
+  Args:
+      directory (str | list[str]): Path to the directory, or to each root
+        directory.
+      recursive (bool, optional): Whether to walk the subdirectories.
+        Defaults to True.
+      include (Iterable[str], optional): If given, only files with these
+        extensions are returned. Defaults to ().
+      exclude (Iterable[str], optional): Files with these extensions are not
+        returned. Defaults to ().
+      threads (int, optional): Number of threads listing directories.
+        Defaults to 1.
+
+  Returns:
+      Iterator[os.DirEntry]: Entries of the files.
+  """
+  include, exclude = set(include), set(exclude)
+  roots = [directory] if isinstance(directory, str) else list(directory)
+
+  if threads > 1:
+    yield from scan_files_parallel(roots, recursive, include, exclude, threads)
+    return
+
+  pending = list(reversed(roots))
+  while pending:
+    found, subdirectories = list_directory(pending.pop(), include, exclude)
+    yield from found
+
+    if recursive:
+      pending.extend(reversed(subdirectories))
+
+def scan_files_parallel(roots: list[str], recursive: bool, include: set[str],
+                        exclude: set[str], threads: int) -> list[os.DirEntry]:
+  """
+  List the directories with a bounded pool of threads.
+
+  Args:
+      roots (list[str]): Paths to the root directories.
+      recursive (bool): Whether to walk the subdirectories.
+      include (set[str]): If not empty, only files with these extensions
+        are returned.
+      exclude (set[str]): Files with these extensions are not returned.
+      threads (int): Number of threads listing directories.
+
+  Returns:
+      list[os.DirEntry]: Entries of the files, sorted by path.
+  """
+  found = []
+  with ThreadPoolExecutor(max_workers=threads) as executor:
+    pending = {executor.submit(list_directory, root, include, exclude, True) for root in roots}
+    while pending:
+      done, pending = wait(pending, return_when=FIRST_COMPLETED)
+      for future in done:
+        entries, subdirectories = future.result()
+        found.extend(entries)
+        if recursive:
+          pending |= {executor.submit(list_directory, subdirectory, include, exclude, True)
+                      for subdirectory in subdirectories}
+
+  return sorted(found, key=lambda entry: entry.path)
+
+def get_recursive_files(directory: str | list[str], threads: int = 1) -> list[str]:
   """
   Get all files in the directory recursively.
 
+  Args:
+      directory (str | list[str]): Path to the directory, or to each root
+        directory.
+      threads (int, optional): Number of threads listing directories. With
+        more than one, the files are sorted by path. Defaults to 1.
+
   Returns:
       list[str]: List of file paths.
   """
-  return [os.path.join(dirpath, f) 
-          for (dirpath, dirnames, filenames) 
-          in os.walk(directory) 
-            for f in filenames]
+  return [entry.path for entry in scan_files(directory, threads=threads)]
 
 def get_files(directory: str) -> list[str]:
   """
@@ -21,8 +144,7 @@ def get_files(directory: str) -> list[str]:
   Returns:
       list[str]: List of file paths.
   """
-  return [os.path.join(directory, f) for f in os.listdir(directory)
-            if isFile(f, directory)]
+  return [entry.path for entry in scan_files(directory, recursive=False)]
   
 def isFile(file: str, dir: str) -> bool:
   """ Check if the file is a file.
@@ -36,6 +158,34 @@ def isFile(file: str, dir: str) -> bool:
   """
   return os.path.isfile(os.path.join(dir, file))
 
+def reflink(source: str, destination: str) -> None:
+  """
+  Create a copy-on-write clone of the file, sharing its data blocks.
+
+  Only filesystems supporting the Linux FICLONE ioctl, such as Btrfs, XFS or
+  bcachefs, can clone files.
+
+  Args:
+      source (str): Path to the file to clone.
+      destination (str): Path to the clone, which must not exist.
+
+  Raises:
+      OSError: If the platform or the filesystem cannot clone files.
+  """
+  try:
+    import fcntl
+  except ImportError:
+    raise OSError(f"Reflinks are not supported on {platform.system()}")
+
+  FICLONE = 0x40049409
+  with open(source, 'rb') as src, open(destination, 'xb') as dst:
+    try:
+      fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+      dst.close()
+      os.remove(destination)
+      raise
+
 def return_file_create_time(file: str) -> float:
   """
   Get the creation time of the file.
@@ -57,16 +207,19 @@ def return_file_create_time(file: str) -> float:
   except AttributeError:
     return os.stat(file).st_mtime
 
-def return_file_size(file: str) -> int:
+def return_file_size(file: str | os.DirEntry) -> int:
   """
   Get the size of the file.
 
   Args:
-      file (str): Path to the file.
+      file (str | os.DirEntry): Path to the file, or its entry from
+        scan_files, whose stat data is reused.
 
   Returns:
       int: Size of the file.
   """
+  if isinstance(file, os.DirEntry):
+    return file.stat().st_size
   return os.path.getsize(file)
 
 def get_image_resolution(image: str) -> tuple[int, int]:
@@ -79,8 +232,8 @@ def get_image_resolution(image: str) -> tuple[int, int]:
   Returns:
       tuple[int, int]: Resolution of the image.
   """
-  import cv2 as cv
-  return cv.imread(image).shape[:2]
+  from include.imageCache import read_image
+  return read_image(image).shape[:2]
 
 def get_video_info(video: str) -> tuple[int, int, float]:
   """
@@ -94,14 +247,18 @@ def get_video_info(video: str) -> tuple[int, int, float]:
   """
   import cv2 as cv
   cap = cv.VideoCapture(video)
-  width = cap.get(cv.CAP_PROP_FRAME_WIDTH)
-  height = cap.get(cv.CAP_PROP_FRAME_HEIGHT)
-  fps = cap.get(cv.CAP_PROP_FPS)
+  try:
+    width = cap.get(cv.CAP_PROP_FRAME_WIDTH)
+    height = cap.get(cv.CAP_PROP_FRAME_HEIGHT)
+    fps = cap.get(cv.CAP_PROP_FPS)
+  finally:
+    cap.release()
   return (width, height, fps)
 
 def get_pixels(image: str) -> int:
   """
-  Get the number of pixels in the resolution.
+  Get the number of pixels in the resolution, reading only the header of the
+  image when its format is known by PIL.
 
   Args:
       image (str): Path to the image.
@@ -109,7 +266,10 @@ def get_pixels(image: str) -> int:
   Returns:
       int: Number of pixels in the resolution.
   """
-  resolution = get_image_resolution(image)
+  try:
+    resolution = get_image_header_resolution(image)
+  except OSError:
+    resolution = get_image_resolution(image)
   return resolution[0] * resolution[1]
 
 def get_video_pixels(video: str) -> float:
@@ -123,4 +283,54 @@ def get_video_pixels(video: str) -> float:
       float: Number of pixels in the video.
   """
   width, height, fps = get_video_info(video)
-  return width * height * fps
\ No newline at end of file
+  return width * height * fps
+
+def get_image_header_resolution(image: str) -> tuple[int, int]:
+  """
+  Get the resolution of the image reading only its header.
+
+  The EXIF orientation is applied, so the resolution is the same one
+  get_image_resolution returns after decoding the image.
+
+  Args:
+      image (str): Path to the image.
+
+  Returns:
+      tuple[int, int]: Resolution of the image, as (height, width).
+  """
+  from PIL import Image
+  with Image.open(image) as img:
+    width, height = img.size
+    # Orientations 5 to 8 rotate the image by 90 or 270 degrees
+    if img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+      width, height = height, width
+  return (height, width)
+
+def get_video_metadata(video: str) -> tuple[float, float, float, float]:
+  """
+  Get the resolution, fps and duration of the video from its container,
+  without decoding any frame.
+
+  Args:
+      video (str): Path to the video.
+
+  Returns:
+      tuple[float, float, float, float]: Width, height, fps and duration in
+        seconds of the video.
+  """
+  import cv2 as cv
+  cap = cv.VideoCapture(video)
+  try:
+    if not cap.isOpened():
+      raise ValueError(f"Could not open the video {video}")
+    width = cap.get(cv.CAP_PROP_FRAME_WIDTH)
+    height = cap.get(cv.CAP_PROP_FRAME_HEIGHT)
+    fps = cap.get(cv.CAP_PROP_FPS)
+    frames = cap.get(cv.CAP_PROP_FRAME_COUNT)
+  finally:
+    cap.release()
+
+  if fps <= 0:
+    raise ValueError(f"Could not read the frame rate of the video {video}")
+
+  return (width, height, fps, frames / fps)
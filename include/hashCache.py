@@ -0,0 +1,257 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable
+
+import numpy as np
+
+from include.fileByteCompare import hash_file_partial, hash_file
+
+
+class HashCache:
+  """
+  Persistent cache of file content hashes and perceptual fingerprints stored
+  in a SQLite database.
+
+  Each entry is keyed by the absolute path of the file and remembers the
+  size, modification time and inode the file had when it was hashed. A
+  cached value is only returned while those values are unchanged, otherwise
+  the file is read again and the entry replaced. The cache can be shared by
+  threads, files are hashed outside of its lock.
+
+  Args:
+    path (str): Path to the database file. Its directory is created if needed.
+
+  Attributes:
+    path (str): Path to the database file.
+    connection (sqlite3.Connection): Connection to the database.
+    hits (int): Number of hashes and fingerprints served from the cache.
+    misses (int): Number of hashes and fingerprints not found in the cache.
+
+  Methods:
+    partial_hash: Hash of the first and last blocks of a file.
+    full_hash: Hash of the whole content of a file.
+    get_fingerprint: Cached fingerprint of a file, if still valid.
+    set_fingerprint: Store the fingerprint of a file.
+    evict: Remove entries of missing files or not used for a while.
+    save: Write pending changes to the database.
+    close: Save and close the database.
+  """
+
+  commitInterval = 1000
+
+  def __init__(self, path: str) -> None:
+    self.path = path
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+
+    self.connection = sqlite3.connect(path, check_same_thread=False)
+    self.lock = threading.RLock()
+    self.connection.execute(
+      "CREATE TABLE IF NOT EXISTS hashes ("
+      "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, inode INTEGER, "
+      "partial TEXT, full TEXT, seen REAL)")
+    self.connection.execute(
+      "CREATE TABLE IF NOT EXISTS fingerprints ("
+      "path TEXT, kind TEXT, size INTEGER, mtime INTEGER, inode INTEGER, "
+      "data BLOB, seen REAL, PRIMARY KEY (path, kind))")
+
+    self.hits = 0
+    self.misses = 0
+    self.pending = 0
+
+  def __enter__(self) -> 'HashCache':
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.close()
+
+  def file_key(self, file: str) -> tuple[str, tuple[int, int, int]]:
+    """
+    Absolute path of the file and the values that must be unchanged for its
+    cached entries to be valid.
+
+    Args:
+      file (str): Path to the file.
+
+    Returns:
+      tuple[str, tuple[int, int, int]]: The absolute path and the size,
+        modification time in nanoseconds and inode of the file.
+    """
+    path = os.path.abspath(file)
+    stat = os.stat(path)
+    return path, (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+  def get_hash(self, file: str, column: str, func: Callable[[str], str]) -> str:
+    """
+    Get a hash of the file, computing it only if the cached one is stale.
+
+    Args:
+      file (str): Path to the file.
+      column (str): Cached column, either 'partial' or 'full'.
+      func (Callable[[str], str]): Function computing the hash on a miss.
+
+    Returns:
+      str: Hash of the file.
+    """
+    path, key = self.file_key(file)
+
+    with self.lock:
+      row = self.connection.execute(
+        f"SELECT size, mtime, inode, {column} FROM hashes WHERE path = ?",
+        (path,)).fetchone()
+
+      if row is not None and tuple(row[:3]) == key and row[3] is not None:
+        self.hits += 1
+        self.connection.execute(
+          "UPDATE hashes SET seen = ? WHERE path = ?", (time.time(), path))
+        self.commit_pending()
+        return row[3]
+
+      self.misses += 1
+
+    value = func(path)
+
+    with self.lock:
+      if row is not None and tuple(row[:3]) == key:
+        self.connection.execute(
+          f"UPDATE hashes SET {column} = ?, seen = ? WHERE path = ?",
+          (value, time.time(), path))
+      else:
+        self.connection.execute(
+          f"INSERT OR REPLACE INTO hashes (path, size, mtime, inode, {column}, seen) "
+          "VALUES (?, ?, ?, ?, ?, ?)", (path, *key, value, time.time()))
+      self.commit_pending()
+
+    return value
+
+  def partial_hash(self, file: str) -> str:
+    """
+    Hash of the first and last blocks of the file.
+
+    Args:
+      file (str): Path to the file.
+
+    Returns:
+      str: Hash of the file, see fileByteCompare.hash_file_partial.
+    """
+    return self.get_hash(file, 'partial', hash_file_partial)
+
+  def full_hash(self, file: str) -> str:
+    """
+    Hash of the whole content of the file.
+
+    Args:
+      file (str): Path to the file.
+
+    Returns:
+      str: Hash of the file, see fileByteCompare.hash_file.
+    """
+    return self.get_hash(file, 'full', hash_file)
+
+  def get_fingerprint(self, file: str, kind: str) -> np.ndarray | None:
+    """
+    Cached fingerprint of the file, if the file did not change since.
+
+    Args:
+      file (str): Path to the file.
+      kind (str): Kind of fingerprint, such as 'image' or 'video'.
+
+    Returns:
+      np.ndarray | None: The fingerprint as an array of 64 bit hashes, or None
+        if it is not cached or the file changed.
+    """
+    path, key = self.file_key(file)
+
+    with self.lock:
+      row = self.connection.execute(
+        "SELECT size, mtime, inode, data FROM fingerprints WHERE path = ? AND kind = ?",
+        (path, kind)).fetchone()
+
+      if row is None or tuple(row[:3]) != key:
+        self.misses += 1
+        return None
+
+      self.hits += 1
+      self.connection.execute(
+        "UPDATE fingerprints SET seen = ? WHERE path = ? AND kind = ?",
+        (time.time(), path, kind))
+      self.commit_pending()
+
+    return np.frombuffer(row[3], dtype=np.uint64)
+
+  def set_fingerprint(self, file: str, kind: str, fingerprint: np.ndarray) -> None:
+    """
+    Store the fingerprint of the file.
+
+    Args:
+      file (str): Path to the file.
+      kind (str): Kind of fingerprint, such as 'image' or 'video'.
+      fingerprint (np.ndarray): Array of 64 bit hashes.
+    """
+    path, key = self.file_key(file)
+
+    with self.lock:
+      self.connection.execute(
+        "INSERT OR REPLACE INTO fingerprints (path, kind, size, mtime, inode, data, seen) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (path, kind, *key, fingerprint.astype(np.uint64).tobytes(), time.time()))
+      self.commit_pending()
+
+  def evict(self, maxAge: float, roots: Iterable[str] = ()) -> int:
+    """
+    Remove entries of files under the scanned roots that no longer exist, and
+    entries not used in the last maxAge seconds.
+
+    Only the files under the roots are checked, and only under the roots that
+    can be reached, so the entries of a disconnected drive or an unmounted
+    network share are kept until they expire.
+
+    Args:
+      maxAge (float): Maximum time, in seconds, since an entry was last used.
+      roots (Iterable[str], optional): Directories that were scanned. Defaults
+        to none.
+
+    Returns:
+      int: Number of removed entries.
+    """
+    prefixes = tuple(os.path.join(os.path.abspath(root), '') for root in roots if os.path.isdir(root))
+    removed = 0
+    for table in ('hashes', 'fingerprints'):
+      stale = []
+      if prefixes:
+        stale = [(path,) for (path,) in self.connection.execute(f"SELECT DISTINCT path FROM {table}")
+                 if path.startswith(prefixes) and not os.path.exists(path)]
+      removed += self.connection.executemany(
+        f"DELETE FROM {table} WHERE path = ?", stale).rowcount
+      removed += self.connection.execute(
+        f"DELETE FROM {table} WHERE seen < ?", (time.time() - maxAge,)).rowcount
+    self.save()
+
+    return removed
+
+  def commit_pending(self) -> None:
+    """
+    Count a pending change and save them every commitInterval changes.
+    """
+    self.pending += 1
+    if self.pending >= self.commitInterval:
+      self.save()
+
+  def save(self) -> None:
+    """
+    Write pending changes to the database.
+    """
+    with self.lock:
+      self.connection.commit()
+      self.pending = 0
+
+  def close(self) -> None:
+    """
+    Save pending changes and close the database.
+    """
+    with self.lock:
+      self.save()
+      self.connection.close()
@@ -0,0 +1,170 @@
+import threading
+from collections import OrderedDict
+
+import cv2 as cv
+import numpy as np
+
+from include.stats import stats
+
+
+class ImageCache:
+  """
+  Least recently used cache of decoded images with a memory budget.
+
+  Images are keyed by their path and the cv.imread flags used to decode them,
+  so a grayscale or reduced decode of an image is cached apart from its color
+  decode. Arrays derived from an image, such as its thumbnail, can share the
+  budget under keys of their own. Cached arrays are read-only, copy them
+  before drawing on them.
+
+  Args:
+    maxBytes (int, optional): Memory budget for the cached arrays. Defaults to
+      512 MiB.
+
+  Attributes:
+    maxBytes (int): Memory budget for the cached arrays.
+    size (int): Bytes currently used by the cached arrays.
+    hits (int): Number of reads served from the cache.
+    misses (int): Number of reads that decoded the image.
+
+  Methods:
+    read: Read an image, decoding it only if it is not cached.
+    get: Get a cached array.
+    put: Cache an array derived from an image.
+    clear: Remove every cached image.
+  """
+
+  def __init__(self, maxBytes: int = 512 * 1024 * 1024) -> None:
+    self.maxBytes = maxBytes
+    self.images = OrderedDict()
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+
+  def read(self, image: str, flags: int = cv.IMREAD_COLOR) -> np.ndarray | None:
+    """
+    Read an image, decoding it only if it is not cached.
+
+    Args:
+      image (str): Path to the image.
+      flags (int, optional): Flags given to cv.imread. Defaults to cv.IMREAD_COLOR.
+
+    Returns:
+      np.ndarray | None: The decoded image, or None if it cannot be read.
+    """
+    key = (image, flags)
+    cached = self.get(key)
+    if cached is not None:
+      return cached
+
+    with stats.timer('image decode'):
+      decoded = cv.imread(image, flags)
+
+    with self.lock:
+      self.misses += 1
+    self.put(key, decoded)
+    return decoded
+
+  def get(self, key: tuple) -> np.ndarray | None:
+    """
+    Get a cached array.
+
+    Args:
+      key (tuple): Key of the array, starting with the path to the image.
+
+    Returns:
+      np.ndarray | None: The cached array, or None if it is not cached.
+    """
+    with self.lock:
+      if key in self.images:
+        self.hits += 1
+        self.images.move_to_end(key)
+        return self.images[key]
+    return None
+
+  def put(self, key: tuple, image: np.ndarray | None) -> None:
+    """
+    Cache an array derived from an image, such as its thumbnail, evicting the
+    least recently used arrays to stay within the memory budget.
+
+    Args:
+      key (tuple): Key of the array, starting with the path to the image.
+      image (np.ndarray | None): The array. Nothing is cached if it is None
+        or larger than the memory budget.
+    """
+    with self.lock:
+      if image is None or image.nbytes > self.maxBytes or key in self.images:
+        return
+
+      image.flags.writeable = False
+      self.images[key] = image
+      self.size += image.nbytes
+      while self.size > self.maxBytes:
+        _, evicted = self.images.popitem(last=False)
+        self.size -= evicted.nbytes
+
+  def clear(self) -> None:
+    """
+    Remove every cached image.
+    """
+    with self.lock:
+      self.images.clear()
+      self.size = 0
+
+
+imageCache = ImageCache()
+
+
+def read_image(image: str, flags: int = cv.IMREAD_COLOR) -> np.ndarray | None:
+  """
+  Read an image through the shared image cache.
+
+  Args:
+    image (str): Path to the image.
+    flags (int, optional): Flags given to cv.imread. Defaults to cv.IMREAD_COLOR.
+
+  Returns:
+    np.ndarray | None: The decoded image, or None if it cannot be read.
+  """
+  return imageCache.read(image, flags)
+
+reducedFlags = {
+  True: {1: cv.IMREAD_GRAYSCALE, 2: cv.IMREAD_REDUCED_GRAYSCALE_2,
+         4: cv.IMREAD_REDUCED_GRAYSCALE_4, 8: cv.IMREAD_REDUCED_GRAYSCALE_8},
+  False: {1: cv.IMREAD_COLOR, 2: cv.IMREAD_REDUCED_COLOR_2,
+          4: cv.IMREAD_REDUCED_COLOR_4, 8: cv.IMREAD_REDUCED_COLOR_8},
+}
+
+
+def read_image_reduced(image: str, size: int, grayscale: bool = True) -> np.ndarray | None:
+  """
+  Read an image through the shared image cache, decoding it at a reduced
+  resolution when it is much larger than needed.
+
+  The largest reduction of 1/2, 1/4 or 1/8 that keeps the shorter side of
+  the image at least size pixels is used. JPEG images are then decoded
+  directly at that resolution, skipping most of the decoding work, while
+  other formats are decoded and then downscaled.
+
+  Args:
+    image (str): Path to the image.
+    size (int): Minimum length of the shorter side of the decoded image.
+    grayscale (bool, optional): Whether to decode the image as grayscale.
+      Defaults to True.
+
+  Returns:
+    np.ndarray | None: The decoded image, or None if it cannot be read.
+  """
+  from PIL import Image
+  try:
+    with Image.open(image) as header:
+      shorter = min(header.size)
+  except (OSError, ValueError):
+    shorter = 0
+
+  factor = 1
+  while factor < 8 and shorter // (factor * 2) >= size:
+    factor *= 2
+
+  return imageCache.read(image, reducedFlags[grayscale][factor])
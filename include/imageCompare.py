@@ -1,31 +1,62 @@
 from sys import argv
 
-from PIL import Image
-from PIL import ImageChops
 import cv2 as cv
 import numpy as np
 from skimage.metrics import structural_similarity
 
+from include.imageCache import read_image, read_image_reduced
+from include.stats import stats
+
+
+def downscale(image: np.ndarray, size: int) -> np.ndarray:
+  """
+  Downscale an image so its shorter side is size pixels, keeping its aspect
+  ratio. Images already that small are returned unchanged.
+
+  Args:
+    image (np.ndarray): Image to downscale.
+    size (int): Length of the shorter side of the downscaled image.
+
+  Returns:
+    np.ndarray: The downscaled image.
+  """
+  h, w = image.shape[:2]
+  if min(h, w) <= size:
+    return image
+
+  scale = size / min(h, w)
+  return cv.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                   interpolation=cv.INTER_AREA)
+
 class ImageCompare:
   """
   Class to compare images
+
+  With a compare_size, both images are compared with their shorter side
+  reduced to that many pixels, decoding JPEG images at a reduced resolution
+  and in grayscale unless the images are shown.
   """
   def __init__(
-    self, base_image, compare_image, verbose=0, show_images=False, similarity=0.85):
+    self, base_image, compare_image, verbose=0, show_images=False, similarity=0.85,
+    compare_size=0):
     
     if type(base_image) != np.ndarray:
       self.base_image = base_image
-      self.cv_base_image = cv.imread(base_image)
+      self.cv_base_image = self.read(base_image, compare_size, show_images)
   
     if type(compare_image) != np.ndarray:
       self.compare_image = compare_image
-      self.cv_compare_image = cv.imread(compare_image)
+      self.cv_compare_image = self.read(compare_image, compare_size, show_images)
     
     if type(base_image) == np.ndarray:
       self.cv_base_image = base_image
     
     if type(compare_image) == np.ndarray:
       self.cv_compare_image = compare_image
+
+    if compare_size > 0:
+      self.cv_base_image = downscale(self.cv_base_image, compare_size)
+      self.cv_compare_image = downscale(self.cv_compare_image, compare_size)
     
     self.verbose = verbose
     self.show_images = show_images
@@ -43,26 +74,38 @@ class ImageCompare:
       return
   
   
+  @staticmethod
+  def read(image: str, compare_size: int, show_images: bool) -> np.ndarray | None:
+    """
+    Reads an image, at a reduced resolution if a compare size is given.
+
+    Args:
+      image (str): Path to the image.
+      compare_size (int): Length of the shorter side the image is compared
+        with, 0 to compare it at full resolution.
+      show_images (bool): Whether the image is shown, so it is read in color.
+
+    Returns:
+      np.ndarray | None: The decoded image, or None if it cannot be read.
+    """
+    if compare_size <= 0:
+      return read_image(image)
+    return read_image_reduced(image, compare_size, grayscale=not show_images)
+
   def image_pixel_differences(self) -> bool:
     """
-    Calculates the bounding box of the non-zero regions in the image.
+    Checks if the two images have exactly the same pixels.
     
     Returns: 
       bool: If the images have the same pixels, return True, otherwise False.
     """
-    # Open the images to compare as PIL images
-    
-    base_image_pil = Image.open(self.base_image)
-    compare_image_pil = Image.open(self.compare_image)
-    
-    # Returns the absolute value of the pixel-by-pixel
-    # difference between two images.
-
-    diff = ImageChops.difference(base_image_pil, compare_image_pil)
-    if diff.getbbox():
-      return False
-    else:
-      return True
+    # The decoded images are cached, so this does not read the files again.
+    # Only the originals are compared, not the copies resized on __init__
+    base_image = read_image(self.base_image)
+    compare_image = read_image(self.compare_image)
+
+    return (base_image.shape == compare_image.shape and
+            np.array_equal(base_image, compare_image))
     
   def image_similarity(
     self) -> tuple[bool, float] | tuple[bool,
@@ -79,12 +122,20 @@ class ImageCompare:
         are similar and the average similarity score.
     """
 
-    # Convert images to grayscale
-    first_gray = cv.cvtColor(self.cv_base_image, cv.COLOR_BGR2GRAY)
-    secon_gray = cv.cvtColor(self.cv_compare_image, cv.COLOR_BGR2GRAY)
+    # Convert images to grayscale, unless they were already read in grayscale
+    first_gray = self.cv_base_image
+    secon_gray = self.cv_compare_image
+    if first_gray.ndim == 3:
+      first_gray = cv.cvtColor(first_gray, cv.COLOR_BGR2GRAY)
+    if secon_gray.ndim == 3:
+      secon_gray = cv.cvtColor(secon_gray, cv.COLOR_BGR2GRAY)
 
-    # Compute SSIM between two images
-    (score, diff) = structural_similarity(first_gray, secon_gray, full=True)
+    # Compute SSIM between two images, the diff image is only needed to show them
+    with stats.timer('ssim'):
+      if not self.show_images:
+        score = structural_similarity(first_gray, secon_gray)
+      else:
+        (score, diff) = structural_similarity(first_gray, secon_gray, full=True)
     
     if self.verbose > 0:
       print("Image similarity (SSIM): {:.4f}".format(score))
@@ -107,6 +158,10 @@ class ImageCompare:
       cv.CHAIN_APPROX_SIMPLE)
     contours = contours[0] if len(contours) == 2 else contours[1]
 
+    # Cached images are read-only, draw on copies of them
+    self.cv_base_image = self.cv_base_image.copy()
+    self.cv_compare_image = self.cv_compare_image.copy()
+
     mask = np.zeros(self.cv_base_image.shape, dtype='uint8')
     filled_after = self.cv_compare_image.copy()
 
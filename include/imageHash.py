@@ -0,0 +1,119 @@
+from collections import defaultdict
+from itertools import combinations
+from typing import Iterator
+
+import cv2 as cv
+import numpy as np
+
+from include.imageCache import read_image_reduced
+
+
+def dhash(image: str | np.ndarray, hashSize: int = 8, decodeSize: int = 128) -> int:
+  """
+  Compute the difference hash (dHash) of an image.
+
+  The image is reduced to a (hashSize + 1) x hashSize grayscale thumbnail and
+  each bit tells whether a pixel is brighter than its right neighbour, so
+  resized or recompressed copies of an image get the same or a close hash.
+  Images given by path are read through the shared image cache at a reduced
+  resolution, the same decode used for their thumbnails.
+
+  Args:
+    image (str | np.ndarray): Path to the image or a BGR/grayscale image.
+    hashSize (int, optional): Side of the hash, which has hashSize² bits.
+      Defaults to 8.
+    decodeSize (int, optional): Minimum length of the shorter side of an
+      image read from its path, see read_image_reduced. Defaults to 128.
+
+  Returns:
+    int: The hash of the image.
+  """
+  if type(image) != np.ndarray:
+    gray = read_image_reduced(image, decodeSize)
+    if gray is None:
+      raise ValueError(f"Could not read the image {image}")
+  elif image.ndim == 3:
+    gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+  else:
+    gray = image
+
+  resized = cv.resize(gray, (hashSize + 1, hashSize), interpolation=cv.INTER_AREA)
+  bits = resized[:, 1:] > resized[:, :-1]
+
+  return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming(hash1: int, hash2: int) -> int:
+  """
+  Number of bits that differ between two hashes.
+
+  Args:
+    hash1 (int): First hash.
+    hash2 (int): Second hash.
+
+  Returns:
+    int: The Hamming distance between the hashes.
+  """
+  return (hash1 ^ hash2).bit_count()
+
+def hash_chunks(distance: int) -> list[tuple[int, int, list[int]]]:
+  """
+  Split 64 bit hashes into chunks so that two hashes within a distance have
+  at least one chunk within the radius of its masks.
+
+  With m chunks and a radius of floor(distance / m) per chunk, two hashes
+  whose chunks all differ by more than the radius differ by more than the
+  distance. The number of chunks grows with the distance so the radius stays
+  at 2 bits at most.
+
+  Args:
+    distance (int): Maximum Hamming distance.
+
+  Returns:
+    list[tuple[int, int, list[int]]]: First bit, number of bits and masks of
+      the values within the radius of each chunk.
+  """
+  count = min(64, max(0, distance) // 3 + 1)
+  radius = max(0, distance) // count
+  chunks = []
+  for chunk in range(count):
+    start, end = 64 * chunk // count, 64 * (chunk + 1) // count
+    masks = [sum(1 << bit for bit in bits) for flipped in range(radius + 1)
+             for bits in combinations(range(end - start), flipped)]
+    chunks.append((start, end - start, masks))
+  return chunks
+
+def hash_candidates(hashes: dict[int, int], distance: int) -> Iterator[tuple[int, int]]:
+  """
+  Find the pairs of hashes within a distance, using multi-index hashing.
+
+  Each hash is indexed by the value of each of its chunks, see hash_chunks.
+  Looking up the values within the radius of each chunk of a hash finds every
+  hash within the distance, while unrelated hashes rarely share a chunk, so
+  only a small fraction of the pairs is checked.
+
+  Args:
+    hashes (dict[int, int]): Hash of each item, keyed by its index.
+    distance (int): Maximum Hamming distance.
+
+  Returns:
+    Iterator[tuple[int, int]]: Pairs of indexes (i, j), with i < j, of the
+      hashes within the distance, each returned once.
+  """
+  chunks = hash_chunks(distance)
+  tables = [defaultdict(list) for _ in chunks]
+  for index, hash in hashes.items():
+    for (start, bits, _), table in zip(chunks, tables):
+      table[(hash >> start) & ((1 << bits) - 1)].append(index)
+
+  for index, hash in hashes.items():
+    found = set()
+    for (start, bits, masks), table in zip(chunks, tables):
+      value = (hash >> start) & ((1 << bits) - 1)
+      for mask in masks:
+        others = table.get(value ^ mask)
+        if others:
+          found.update(others)
+
+    for other in sorted(found):
+      if other > index and hamming(hash, hashes[other]) <= distance:
+        yield index, other
@@ -0,0 +1,187 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+
+class Pipeline:
+  """
+  Chain of stages connected by bounded queues, each stage run by its own
+  threads.
+
+  Items flow from the source through every stage as soon as they are ready,
+  so reading files, hashing them and matching the results overlap instead of
+  running one after another. Each stage function returns the items it passes
+  on, none to drop its input or several to fan it out. Queues hold at most
+  queueSize items, so a fast stage waits for a slow one instead of piling up
+  items in memory. Stages with several threads do not keep the order of the
+  items, stages with a single thread can keep state without locks.
+
+  Args:
+    source (Iterable[Any]): Items fed to the first stage, iterated on a thread
+      of its own.
+    queueSize (int, optional): Maximum number of items waiting between two
+      stages. Defaults to 256.
+
+  Attributes:
+    source (Iterable[Any]): Items fed to the first stage.
+    queueSize (int): Maximum number of items waiting between two stages.
+    stages (list[tuple[Callable, int, Callable | None]]): Function, number of
+      threads and flush function of each stage.
+    error (BaseException | None): First error raised by a stage.
+
+  Methods:
+    stage: Add a stage at the end of the pipeline.
+  """
+
+  done = object()
+
+  def __init__(self, source: Iterable[Any], queueSize: int = 256) -> None:
+    self.source = source
+    self.queueSize = queueSize
+    self.stages = []
+    self.error = None
+    self.stopped = threading.Event()
+
+  def stage(
+    self, func: Callable[[Any], Iterable[Any]], threads: int = 1,
+    flush: Callable[[], Iterable[Any]] | None = None) -> 'Pipeline':
+    """
+    Add a stage at the end of the pipeline.
+
+    Args:
+      func (Callable[[Any], Iterable[Any]]): Function returning the items to
+        pass on for each item received.
+      threads (int, optional): Number of threads running the stage. Defaults
+        to 1.
+      flush (Callable[[], Iterable[Any]] | None, optional): Function returning
+        the items to pass on once every item was received. Defaults to None.
+
+    Returns:
+      Pipeline: The pipeline itself, to chain the stages.
+    """
+    self.stages.append((func, max(1, threads), flush))
+    return self
+
+  def put(self, output: queue.Queue, item: Any) -> bool:
+    """
+    Put an item on a queue, waiting for room unless the pipeline stopped.
+
+    Args:
+      output (queue.Queue): Queue to put the item on.
+      item (Any): Item to put.
+
+    Returns:
+      bool: False if the pipeline stopped before the item was put.
+    """
+    while not self.stopped.is_set():
+      try:
+        output.put(item, timeout=0.1)
+        return True
+      except queue.Full:
+        continue
+    return False
+
+  def get(self, input: queue.Queue) -> Any:
+    """
+    Get an item from a queue, waiting for one unless the pipeline stopped.
+
+    Args:
+      input (queue.Queue): Queue to get the item from.
+
+    Returns:
+      Any: The item, or done if the pipeline stopped.
+    """
+    while not self.stopped.is_set():
+      try:
+        return input.get(timeout=0.1)
+      except queue.Empty:
+        continue
+    return self.done
+
+  def fail(self, error: BaseException) -> None:
+    """
+    Keep the first error raised and stop every stage.
+
+    Args:
+      error (BaseException): Error raised by a stage.
+    """
+    if self.error is None:
+      self.error = error
+    self.stopped.set()
+
+  def feed(self, output: queue.Queue) -> None:
+    """
+    Put every item of the source on the queue of the first stage.
+
+    Args:
+      output (queue.Queue): Queue of the first stage.
+    """
+    try:
+      for item in self.source:
+        if not self.put(output, item):
+          return
+      self.put(output, self.done)
+    except BaseException as e:
+      self.fail(e)
+
+  def work(self, func: Callable[[Any], Iterable[Any]], flush: Callable[[], Iterable[Any]] | None,
+           input: queue.Queue, output: queue.Queue, running: list[int], lock: threading.Lock) -> None:
+    """
+    Run a thread of a stage until its input ends. The last thread of the
+    stage to finish flushes it and ends the input of the next stage.
+
+    Args:
+      func (Callable[[Any], Iterable[Any]]): Function of the stage.
+      flush (Callable[[], Iterable[Any]] | None): Flush function of the stage.
+      input (queue.Queue): Queue of the stage.
+      output (queue.Queue): Queue of the next stage.
+      running (list[int]): Number of threads of the stage still running.
+      lock (threading.Lock): Lock guarding running.
+    """
+    try:
+      while True:
+        item = self.get(input)
+        if item is self.done:
+          # Let the other threads of the stage see the end too
+          self.put(input, self.done)
+          break
+        for result in func(item):
+          if not self.put(output, result):
+            return
+
+      with lock:
+        running[0] -= 1
+        last = running[0] == 0
+      if last:
+        for result in flush() if flush is not None else ():
+          if not self.put(output, result):
+            return
+        self.put(output, self.done)
+    except BaseException as e:
+      self.fail(e)
+
+  def __iter__(self) -> Iterator[Any]:
+    queues = [queue.Queue(self.queueSize) for _ in range(len(self.stages) + 1)]
+    threads = [threading.Thread(target=self.feed, args=(queues[0],), daemon=True)]
+    for (func, count, flush), input, output in zip(self.stages, queues, queues[1:]):
+      running, lock = [count], threading.Lock()
+      threads.extend(threading.Thread(
+        target=self.work, args=(func, flush, input, output, running, lock), daemon=True)
+        for _ in range(count))
+
+    for thread in threads:
+      thread.start()
+
+    try:
+      while True:
+        item = self.get(queues[-1])
+        if item is self.done:
+          break
+        yield item
+    finally:
+      self.stopped.set()
+      for thread in threads:
+        thread.join()
+
+    if self.error is not None:
+      raise self.error
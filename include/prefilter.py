@@ -0,0 +1,58 @@
+from collections import defaultdict
+from itertools import product
+from math import floor
+
+
+def within_tolerances(
+  values1: tuple[float, ...], values2: tuple[float, ...], tolerances: tuple[float, ...]) -> bool:
+  """
+  Check whether the values of two items are all within a tolerance.
+
+  Args:
+    values1 (tuple[float, ...]): Values of the first item.
+    values2 (tuple[float, ...]): Values of the second item.
+    tolerances (tuple[float, ...]): Maximum difference allowed on each value.
+
+  Returns:
+    bool: True if every difference is within its tolerance.
+  """
+  return all(abs(v1 - v2) <= t for v1, v2, t in zip(values1, values2, tolerances))
+
+def compatible_items(
+  items: list[tuple[int, tuple[float, ...]]], tolerances: tuple[float, ...]) -> set[int]:
+  """
+  Find the items whose values are within a tolerance of another item.
+
+  Items are put in buckets as wide as the tolerance on each dimension. Items
+  sharing a bucket are always within the tolerance of each other, so only
+  the items alone in their bucket are checked against the neighbouring
+  buckets, stopping at the first match. The pairs themselves are never built,
+  since most items can share a bucket: they are checked on the candidates
+  found by the hash indexes instead, see within_tolerances.
+
+  Args:
+    items (list[tuple[int, tuple[float, ...]]]): Index and values of each item.
+    tolerances (tuple[float, ...]): Maximum difference allowed on each value.
+
+  Returns:
+    set[int]: Indexes of the items with at least one compatible item.
+  """
+  buckets = defaultdict(list)
+  for index, values in items:
+    buckets[tuple(floor(v / t) for v, t in zip(values, tolerances))].append((index, values))
+
+  offsets = [offset for offset in product((-1, 0, 1), repeat=len(tolerances)) if any(offset)]
+  compatible = set()
+  for key, members in buckets.items():
+    if len(members) > 1:
+      compatible.update(index for index, _ in members)
+      continue
+
+    index, values = members[0]
+    for offset in offsets:
+      neighbour = buckets.get(tuple(k + o for k, o in zip(key, offset)), ())
+      if any(within_tolerances(values, other, tolerances) for _, other in neighbour):
+        compatible.add(index)
+        break
+
+  return compatible
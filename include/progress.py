@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+from datetime import timedelta
+from typing import TextIO
+
+from include.stats import Stats
+
+
+class Progress:
+  """
+  Status line of a running search, rewritten in place at a fixed interval.
+
+  The line is built from the counters of the stats by a thread of its own,
+  so the search only pays for counting: files enumerated, bytes read,
+  fingerprints computed and pairs compared, with their rates over the last
+  interval. Once the number of pairs to compare is known, the completed
+  fraction and the estimated time left are shown too.
+
+  Args:
+    stats (Stats): Stats whose counters are shown. They must be enabled.
+    interval (float, optional): Seconds between two updates. Defaults to 0.5.
+    stream (TextIO | None, optional): Where the line is written. Defaults to
+      None, meaning sys.stderr.
+
+  Attributes:
+    stats (Stats): Stats whose counters are shown.
+    interval (float): Seconds between two updates.
+    stream (TextIO): Where the line is written.
+
+  Methods:
+    start: Start updating the line.
+    stop: Stop updating the line and end it.
+    line: Text of the status line.
+  """
+
+  def __init__(self, stats: Stats, interval: float = 0.5, stream: TextIO | None = None) -> None:
+    self.stats = stats
+    self.interval = interval
+    self.stream = stream if stream is not None else sys.stderr
+    self.stopping = threading.Event()
+    self.thread = None
+    self.previous = ({}, time.perf_counter())
+    self.pairsStart = None
+    self.width = 0
+
+  def __enter__(self) -> 'Progress':
+    self.start()
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.stop()
+
+  def start(self) -> None:
+    """
+    Start updating the line.
+    """
+    self.stopping.clear()
+    self.previous = (self.stats.snapshot(), time.perf_counter())
+    self.thread = threading.Thread(target=self.update, daemon=True)
+    self.thread.start()
+
+  def stop(self) -> None:
+    """
+    Stop updating the line, writing it a last time and ending it.
+    """
+    if self.thread is None:
+      return
+    self.stopping.set()
+    self.thread.join()
+    self.thread = None
+    self.write(self.line())
+    self.stream.write('\n')
+    self.stream.flush()
+
+  def update(self) -> None:
+    """
+    Rewrite the line every interval until stopped.
+    """
+    while not self.stopping.wait(self.interval):
+      self.write(self.line())
+
+  def write(self, text: str) -> None:
+    """
+    Rewrite the line, clearing what is left of the previous one.
+
+    Args:
+      text (str): Text of the line.
+    """
+    self.stream.write('\r' + text.ljust(self.width))
+    self.stream.flush()
+    self.width = len(text)
+
+  def line(self) -> str:
+    """
+    Text of the status line, with the rates since the previous line.
+
+    Returns:
+      str: The counters, their rates and, when known, the completed fraction
+        of the pairs and the estimated time left.
+    """
+    counters, now = self.stats.snapshot(), time.perf_counter()
+    previous, then = self.previous
+    self.previous = (counters, now)
+    elapsed = max(now - then, 1e-9)
+
+    def rate(name: str) -> float:
+      return (counters.get(name, 0) - previous.get(name, 0)) / elapsed
+
+    parts = [f"files {counters.get('files enumerated', 0):,.0f} ({rate('files enumerated'):,.0f}/s)"]
+    if counters.get('bytes read'):
+      parts.append(f"read {counters['bytes read'] / 1e6:,.1f} MB ({rate('bytes read') / 1e6:,.1f} MB/s)")
+    if counters.get('files fingerprinted'):
+      parts.append(f"fingerprints {counters['files fingerprinted']:,.0f} "
+                   f"({rate('files fingerprinted'):,.1f}/s)")
+
+    total = counters.get('pairs to compare', 0)
+    if total:
+      done = counters.get('pairs compared', 0)
+      if self.pairsStart is None:
+        self.pairsStart = (done, now)
+      text = f"pairs {done:,.0f}/{total:,.0f} ({rate('pairs compared'):,.1f}/s) {done / total:.1%}"
+
+      started, startTime = self.pairsStart
+      if done > started and done < total:
+        left = (total - done) * (now - startTime) / (done - started)
+        text += f" ETA {timedelta(seconds=round(left))}"
+      parts.append(text)
+
+    return ' | '.join(parts)
@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+
+
+class ClusterReport:
+  """
+  Machine readable report of the clusters of duplicates, written one
+  cluster at a time.
+
+  Each cluster is written and flushed as soon as it is given, so other tools
+  can act on the first clusters while the search goes on, and nothing but
+  the open file is kept in memory. In JSON Lines format each line holds a
+  cluster, in CSV format each row holds a duplicate along with the file kept
+  of its cluster.
+
+  Args:
+    path (str): Path to the report. Its directory is created if needed.
+    format (str, optional): 'jsonl' or 'csv'. Defaults to 'jsonl'.
+
+  Attributes:
+    path (str): Path to the report.
+    format (str): 'jsonl' or 'csv'.
+    count (int): Number of clusters written.
+
+  Methods:
+    write: Write a cluster.
+    close: Close the report.
+  """
+
+  formats = ('jsonl', 'csv')
+  columns = ['cluster', 'kept', 'kept_size', 'duplicate', 'size', 'similarity']
+
+  def __init__(self, path: str, format: str = 'jsonl') -> None:
+    if format not in self.formats:
+      raise ValueError(f"Unknown report format {format}, expected one of {', '.join(self.formats)}")
+
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+
+    self.path = path
+    self.format = format
+    self.count = 0
+    self.file = open(path, 'w', newline='')
+    self.writer = None
+    if format == 'csv':
+      self.writer = csv.writer(self.file)
+      self.writer.writerow(self.columns)
+
+  def __enter__(self) -> 'ClusterReport':
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.close()
+
+  def write(
+    self, kept: tuple[str, int | None],
+    duplicates: list[tuple[str, int | None, float | None]]) -> None:
+    """
+    Write a cluster and flush it.
+
+    Args:
+      kept (tuple[str, int | None]): Path and size of the file kept, the size
+        being None if the file cannot be read.
+      duplicates (list[tuple[str, int | None, float | None]]): Path, size and
+        similarity of each duplicate, the similarity being None when the
+        comparison does not give one.
+    """
+    self.count += 1
+    if self.writer is not None:
+      for path, size, similarity in duplicates:
+        self.writer.writerow([self.count, kept[0], kept[1], path, size, similarity])
+    else:
+      self.file.write(json.dumps({
+        'cluster': self.count,
+        'kept': {'path': kept[0], 'size': kept[1]},
+        'duplicates': [{'path': path, 'size': size, 'similarity': similarity}
+                       for path, size, similarity in duplicates],
+        'reclaimable': sum(size or 0 for _, size, _ in duplicates)
+      }) + '\n')
+    self.file.flush()
+
+  def close(self) -> None:
+    """
+    Close the report.
+    """
+    if not self.file.closed:
+      self.file.close()
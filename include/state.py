@@ -0,0 +1,69 @@
+import json
+import os
+from typing import Any, Iterable
+
+
+def load_state(path: str) -> dict[str, Any] | None:
+  """
+  Load the state saved by a previous run.
+
+  Args:
+    path (str): Path to the state file.
+
+  Returns:
+    dict[str, Any] | None: The saved state, or None if there is no readable
+      state file.
+  """
+  try:
+    with open(path) as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+def save_state(path: str, state: dict[str, Any]) -> None:
+  """
+  Save the state of a run, replacing the previous one atomically so an
+  interrupted write never leaves a broken state file.
+
+  Args:
+    path (str): Path to the state file. Its directory is created if needed.
+    state (dict[str, Any]): State to save, which must be JSON serializable.
+  """
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+
+  temporary = f"{path}.{os.getpid()}.tmp"
+  with open(temporary, 'w') as f:
+    json.dump(state, f)
+  os.replace(temporary, path)
+
+def file_inventory(entries: Iterable[os.DirEntry]) -> dict[str, list[int]]:
+  """
+  Size and modification time of each file.
+
+  Args:
+    entries (Iterable[os.DirEntry]): Entries of the files.
+
+  Returns:
+    dict[str, list[int]]: The size and modification time in nanoseconds of
+      each file, keyed by its path.
+  """
+  inventory = {}
+  for entry in entries:
+    stat = entry.stat()
+    inventory[entry.path] = [stat.st_size, stat.st_mtime_ns]
+  return inventory
+
+def unchanged_files(previous: dict[str, list[int]], current: dict[str, list[int]]) -> set[str]:
+  """
+  Files with the same size and modification time on both inventories.
+
+  Args:
+    previous (dict[str, list[int]]): Inventory of the previous run.
+    current (dict[str, list[int]]): Inventory of the current run.
+
+  Returns:
+    set[str]: Paths of the files that did not change.
+  """
+  return {path for path, key in current.items() if previous.get(path) == key}
@@ -0,0 +1,225 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
+
+
+class Stats:
+  """
+  Counters and timing histograms of the stages of a search.
+
+  Nothing is recorded while it is disabled, so the instrumented hot paths
+  only pay for a flag check. Timings are kept as a count, a total, a maximum
+  and a histogram of power of two buckets in microseconds, so their memory
+  does not grow with the number of files. It can be shared by threads, and
+  the stats of worker processes are merged into the main process ones.
+
+  Attributes:
+    enabled (bool): Whether anything is recorded.
+    counters (dict[str, float]): Value of each counter.
+    timings (dict[str, dict[str, Any]]): Count, total, maximum and histogram
+      of each timing.
+
+  Methods:
+    count: Add to a counter.
+    snapshot: Copy of the counters.
+    timer: Time a block of code.
+    timed: Time each step of an iterator.
+    merge: Add the stats of another process.
+    reset: Remove every counter and timing.
+    collect: Report the stats and reset them.
+    report: Stats as a JSON serializable dictionary.
+    summary: Stats as a printable table.
+  """
+
+  def __init__(self) -> None:
+    self.enabled = False
+    self.counters = {}
+    self.timings = {}
+    self.lock = threading.Lock()
+
+  def count(self, name: str, value: float = 1) -> None:
+    """
+    Add to a counter.
+
+    Args:
+      name (str): Name of the counter.
+      value (float, optional): Value added. Defaults to 1.
+    """
+    if not self.enabled:
+      return
+    with self.lock:
+      self.counters[name] = self.counters.get(name, 0) + value
+
+  def record(self, name: str, seconds: float) -> None:
+    """
+    Add a duration to a timing.
+
+    Args:
+      name (str): Name of the timing.
+      seconds (float): Duration in seconds.
+    """
+    bucket = max(0, math.ceil(math.log2(max(seconds * 1e6, 1))))
+    with self.lock:
+      timing = self.timings.setdefault(
+        name, {'count': 0, 'total': 0.0, 'max': 0.0, 'histogram': {}})
+      timing['count'] += 1
+      timing['total'] += seconds
+      timing['max'] = max(timing['max'], seconds)
+      timing['histogram'][bucket] = timing['histogram'].get(bucket, 0) + 1
+
+  @contextmanager
+  def timer(self, name: str) -> Iterator[None]:
+    """
+    Time a block of code.
+
+    Args:
+      name (str): Name of the timing.
+    """
+    if not self.enabled:
+      yield
+      return
+
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record(name, time.perf_counter() - start)
+
+  def timed(self, name: str, items: Iterable[Any]) -> Iterator[Any]:
+    """
+    Time each step of an iterator, such as the directory walk.
+
+    Args:
+      name (str): Name of the timing.
+      items (Iterable[Any]): Iterator to time.
+
+    Returns:
+      Iterator[Any]: The items of the iterator.
+    """
+    if not self.enabled:
+      yield from items
+      return
+
+    iterator = iter(items)
+    while True:
+      start = time.perf_counter()
+      try:
+        item = next(iterator)
+      except StopIteration:
+        return
+      self.record(name, time.perf_counter() - start)
+      yield item
+
+  def merge(self, other: dict[str, Any]) -> None:
+    """
+    Add the stats collected by another process.
+
+    Args:
+      other (dict[str, Any]): Stats returned by collect.
+    """
+    with self.lock:
+      for name, value in other['counters'].items():
+        self.counters[name] = self.counters.get(name, 0) + value
+
+      for name, timing in other['timings'].items():
+        mine = self.timings.setdefault(
+          name, {'count': 0, 'total': 0.0, 'max': 0.0, 'histogram': {}})
+        mine['count'] += timing['count']
+        mine['total'] += timing['total']
+        mine['max'] = max(mine['max'], timing['max'])
+        for bucket, count in timing['histogram'].items():
+          mine['histogram'][bucket] = mine['histogram'].get(bucket, 0) + count
+
+  def snapshot(self) -> dict[str, float]:
+    """
+    Copy of the counters.
+
+    Returns:
+      dict[str, float]: Value of each counter.
+    """
+    with self.lock:
+      return dict(self.counters)
+
+  def reset(self, enabled: bool) -> None:
+    """
+    Remove every counter and timing.
+
+    Args:
+      enabled (bool): Whether to record from now on.
+    """
+    with self.lock:
+      self.enabled = enabled
+      self.counters, self.timings = {}, {}
+
+  def collect(self) -> dict[str, Any]:
+    """
+    Report the stats and reset them, used by the worker processes so each
+    chunk of work is only merged once.
+
+    Returns:
+      dict[str, Any]: The counters and the timings, whose histograms map the
+        power of two of each bucket to its count.
+    """
+    with self.lock:
+      report = {'counters': self.counters, 'timings': self.timings}
+      self.counters, self.timings = {}, {}
+    return report
+
+  def report(self) -> dict[str, Any]:
+    """
+    Stats as a JSON serializable dictionary.
+
+    Returns:
+      dict[str, Any]: The counters and the timings, whose histograms map the
+        upper bound of each bucket, in microseconds, to its count.
+    """
+    with self.lock:
+      return {
+        'counters': dict(self.counters),
+        'timings': {name: {**timing, 'histogram': {
+          str(2 ** bucket): count for bucket, count in sorted(timing['histogram'].items())}}
+          for name, timing in self.timings.items()}
+      }
+
+  def summary(self) -> str:
+    """
+    Stats as a printable table.
+
+    Returns:
+      str: The counters, then the count, total, mean and maximum of each
+        timing.
+    """
+    lines = []
+    with self.lock:
+      if self.counters:
+        width = max(map(len, self.counters))
+        lines.append('Counters')
+        for name, value in sorted(self.counters.items()):
+          lines.append(f"  {name:<{width}}  {value:>14,.0f}")
+
+      if self.timings:
+        width = max(map(len, self.timings))
+        lines.append(f"{'Timings':<{width + 2}}  {'count':>10}  {'total s':>10}  "
+                     f"{'mean ms':>10}  {'max ms':>10}")
+        for name, timing in sorted(self.timings.items(), key=lambda t: -t[1]['total']):
+          lines.append(f"  {name:<{width}}  {timing['count']:>10}  {timing['total']:>10.3f}  "
+                       f"{timing['total'] / timing['count'] * 1000:>10.3f}  "
+                       f"{timing['max'] * 1000:>10.3f}")
+
+    return '\n'.join(lines)
+
+
+stats = Stats()
+
+
+def start_worker(enabled: bool) -> None:
+  """
+  Start the stats of a worker process, which may have inherited the stats
+  of the main process.
+
+  Args:
+    enabled (bool): Whether the worker records stats.
+  """
+  stats.reset(enabled)
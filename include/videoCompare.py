@@ -1,8 +1,15 @@
 import cv2 as cv
 import numpy as np
 import logging
+import math
+from collections import Counter, defaultdict
+from itertools import takewhile
+from typing import Iterator
 
+from include.capturePool import capturePool, open_video
 from include.imageCompare import ImageCompare
+from include.imageHash import dhash
+from include.stats import stats
 
 
 class FrameError(Exception):
@@ -12,10 +19,200 @@ class FrameError(Exception):
   pass
 
 
+# Sampled frames further apart than this are reached by seeking, closer ones
+# by decoding forward. Seeking usually goes back to the previous keyframe,
+# which common encoders place at most 250 frames apart
+seekThreshold = 250
+
+
+def read_frames(
+  capture: cv.VideoCapture, positions: list[int], decode: str = 'auto') -> Iterator[np.ndarray | None]:
+  """
+  Read the frames at the given positions of a video.
+
+  Args:
+    capture (cv.VideoCapture): The opened video.
+    positions (list[int]): Increasing frame positions to read.
+    decode (str, optional): 'seek' sets the position of each frame before
+      reading it, 'sequential' decodes forward through the video and only
+      retrieves the wanted frames, 'auto' seeks only when the frames are on
+      average more than seekThreshold frames apart. Defaults to 'auto'.
+
+  Returns:
+    Iterator[np.ndarray | None]: The frame at each position, or None when it
+      could not be read, after which no more frames are returned.
+  """
+  if not positions:
+    return
+
+  if decode == 'auto':
+    gap = (positions[-1] - positions[0]) / max(len(positions) - 1, 1)
+    decode = 'seek' if gap > seekThreshold else 'sequential'
+
+  if decode == 'seek':
+    for position in positions:
+      capture.set(cv.CAP_PROP_POS_FRAMES, position)
+      ret, frame = capture.read()
+      yield frame if ret else None
+      if not ret:
+        return
+    return
+
+  current = int(capture.get(cv.CAP_PROP_POS_FRAMES))
+  if current > positions[0]:
+    capture.set(cv.CAP_PROP_POS_FRAMES, 0)
+    current = 0
+
+  for position in positions:
+    while current < position:
+      if not capture.grab():
+        yield None
+        return
+      current += 1
+
+    ret = capture.grab()
+    current += 1
+    ret, frame = capture.retrieve() if ret else (False, None)
+    yield frame if ret else None
+    if not ret:
+      return
+
+
+def video_fingerprint(video: str, samples: int = 16, decode: str = 'auto') -> np.ndarray:
+  """
+  Compute a compact fingerprint of the video.
+
+  The video is sampled on samples frames evenly spread over its duration and
+  each frame is reduced to its perceptual hash, so videos are decoded once
+  and their fingerprints compared without decoding them again.
+
+  Args:
+    video (str): Path to the video file.
+    samples (int, optional): Number of frames sampled. Defaults to 16.
+    decode (str, optional): How frames are reached, see read_frames.
+      Defaults to 'auto'.
+
+  Returns:
+    np.ndarray: The perceptual hash of each sampled frame, as 64 bit integers.
+      It is shorter than samples if the video could not be read to its end.
+  """
+  with stats.timer('video fingerprint'), open_video(video) as capture:
+    frames = int(capture.get(cv.CAP_PROP_FRAME_COUNT))
+    if frames <= 0:
+      raise FrameError("Error reading frames of the video {}".format(video))
+
+    positions = sorted(set(int((i + 0.5) * frames / samples) for i in range(samples)))
+
+    hashes = []
+    for i, frame in enumerate(stats.timed('video decode', read_frames(capture, positions, decode))):
+      if frame is None:
+        logging.warning(f"Error reading frame {i} of {samples} of the video {video}")
+        break
+      hashes.append(dhash(frame))
+
+  if not hashes:
+    raise FrameError("Error reading frames of the video {}".format(video))
+
+  return np.array(hashes, dtype=np.uint64)
+
+def fingerprint_distance(fingerprint1: np.ndarray, fingerprint2: np.ndarray) -> float:
+  """
+  Average number of differing bits between the aligned frames of two
+  video fingerprints.
+
+  Args:
+    fingerprint1 (np.ndarray): Fingerprint of the first video.
+    fingerprint2 (np.ndarray): Fingerprint of the second video.
+
+  Returns:
+    float: The mean Hamming distance, from 0 (same frames) to 64.
+  """
+  length = min(len(fingerprint1), len(fingerprint2))
+  differences = np.bitwise_xor(fingerprint1[:length], fingerprint2[:length])
+
+  return np.unpackbits(differences.view(np.uint8)).sum() / length
+
+# Fingerprint hashes are indexed by chunks of this many bits, and chunks
+# within this many bits of each other are counted as matching
+chunkBits = 16
+chunkRadius = 2
+chunkMasks = [0] + [1 << a for a in range(chunkBits)] + [
+  (1 << a) | (1 << b) for a in range(chunkBits) for b in range(a + 1, chunkBits)]
+
+
+def fingerprint_chunks(fingerprint: np.ndarray) -> list[tuple[int, int]]:
+  """
+  Split the hashes of a fingerprint into chunks.
+
+  Args:
+    fingerprint (np.ndarray): Fingerprint of a video.
+
+  Returns:
+    list[tuple[int, int]]: Position and value of each chunk, positions of
+      the same frame position of two fingerprints being aligned.
+  """
+  chunks = 64 // chunkBits
+  mask = (1 << chunkBits) - 1
+  return [(frame * chunks + chunk, (int(hash) >> (chunk * chunkBits)) & mask)
+          for frame, hash in enumerate(fingerprint) for chunk in range(chunks)]
+
+def fingerprint_candidates(fingerprints: dict[int, np.ndarray], distance: float) -> Iterator[tuple[int, int]]:
+  """
+  Find the pairs of videos whose fingerprints may be within a distance.
+
+  The hashes are split into aligned chunks of 16 bits, indexed by their
+  position and value. When the mean distance of L aligned frames is within
+  the distance, at most distance * L / 3 of their 4 * L chunks differ by 3
+  bits or more, so at least the rest of them are within 2 bits. Looking up
+  the values within 2 bits of each chunk of a video finds how many chunks it
+  shares with every other video, and only the videos sharing enough chunks
+  are returned. No close pair is missed, while two unrelated videos almost
+  never share a chunk. The mean distance of each candidate must still be
+  checked with fingerprint_distance.
+
+  Args:
+    fingerprints (dict[int, np.ndarray]): Fingerprint of each video, keyed by
+      its index.
+    distance (float): Maximum mean Hamming distance.
+
+  Returns:
+    Iterator[tuple[int, int]]: Pairs of indexes (i, j), with i < j, each
+      returned once.
+  """
+  chunks = 64 // chunkBits
+  if distance >= chunks * (chunkRadius + 1):
+    # Close videos may share no chunk at all, every pair is a candidate
+    indexes = sorted(fingerprints)
+    for a, index in enumerate(indexes):
+      for other in indexes[a + 1:]:
+        yield index, other
+    return
+
+  tables = defaultdict(lambda: defaultdict(list))
+  for index, fingerprint in fingerprints.items():
+    for position, value in fingerprint_chunks(fingerprint):
+      tables[position][value].append(index)
+
+  for index, fingerprint in fingerprints.items():
+    shared = Counter()
+    for position, value in fingerprint_chunks(fingerprint):
+      table = tables[position]
+      shared.update({other for mask in chunkMasks for other in table.get(value ^ mask, ())
+                     if other > index})
+
+    for other in sorted(shared):
+      frames = min(len(fingerprint), len(fingerprints[other]))
+      if shared[other] >= chunks * frames - math.floor(distance * frames / (chunkRadius + 1)):
+        yield index, other
+
 class VideoCompare:
   """
   Class for comparing two videos based on their frames.
 
+  The videos are taken from the shared capture pool and given back by close,
+  or when leaving a with block, so a video compared with several others is
+  only opened once.
+
   Args:
     base_video (str): Path to the base video file.
     compare_video (str): Path to the video file to compare with the base video.
@@ -24,33 +221,55 @@ class VideoCompare:
       as equal. Defaults to 0.85.
     timeThreshold (float, optional): Time threshold for considering videos as
       equal in length. Defaults to 1. Length is in seconds.
+    decode (str, optional): How sampled frames are reached on soft comparison,
+      'seek', 'sequential' or 'auto'. See read_frames. Defaults to 'auto'.
 
   Attributes:
     base_video (str): Path to the base video file.
     compare_video (str): Path to the video file to compare with the base video.
     verbose (int): Verbosity level.
     similarity (float): Similarity threshold for considering frames as equal.
+    decode (str): How sampled frames are reached on soft comparison.
     video1 (cv2.VideoCapture): VideoCapture object for the base video.
     video2 (cv2.VideoCapture): VideoCapture object for the compare video.
 
   Methods:
     compare_videos_hard: Compares the two videos strictly, frame by frame.
     compare_videos_soft: Compares the two videos with a similarity threshold.
+    close: Gives the videos back to the capture pool.
 
   """
 
   def __init__(
-    self, base_video: str, compare_video: str, verbose: int=0, similarity: float=0.85, timeThreshold: float=1) -> None:
+    self, base_video: str, compare_video: str, verbose: int=0, similarity: float=0.85, timeThreshold: float=1,
+    decode: str='auto') -> None:
 
     self.base_video = base_video
     self.compare_video = compare_video
     self.verbose = verbose
     self.similarity = similarity
     self.timeThreshold = timeThreshold
+    self.decode = decode
 
     # Read in the videos
-    self.video1 = cv.VideoCapture(self.base_video)
-    self.video2 = cv.VideoCapture(self.compare_video)
+    self.video1 = capturePool.acquire(self.base_video)
+    self.video2 = capturePool.acquire(self.compare_video)
+
+  def __enter__(self) -> 'VideoCompare':
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self.close()
+
+  def close(self) -> None:
+    """
+    Gives the videos back to the capture pool, after which they cannot be
+    compared anymore.
+    """
+    if self.video1 is not None:
+      capturePool.give_back(self.base_video, self.video1)
+      capturePool.give_back(self.compare_video, self.video2)
+      self.video1 = self.video2 = None
 
   def compare_videos_hard(self) -> bool:
     """
@@ -67,6 +286,11 @@ class VideoCompare:
     if video1_frames != video2_frames:
       return False
 
+    # Pooled videos may have been read before
+    for video in (self.video1, self.video2):
+      if video.get(cv.CAP_PROP_POS_FRAMES) != 0:
+        video.set(cv.CAP_PROP_POS_FRAMES, 0)
+
     # Loop through each frame and compare them
     for i in range(video1_frames):
       # Read in the frames
@@ -128,35 +352,26 @@ class VideoCompare:
 
     scores = []
 
-    # Loop through each first frame of scale of fps and compare them
-    for i in range(0, min(video1_frames, video2_frames), int(scale)):
-      f1 = i * fps1
-      f2 = i * fps2
-      
-      if f1 >= video1_frames or f2 >= video2_frames:
-        break
-      
-      # Set the frame position of each video
-      self.video1.set(cv.CAP_PROP_POS_FRAMES, int(f1))
-      self.video2.set(cv.CAP_PROP_POS_FRAMES, int(f2))
+    # Positions of each first frame of scale of fps
+    positions = list(takewhile(
+      lambda f: f[0] < video1_frames and f[1] < video2_frames,
+      ((i * fps1, i * fps2) for i in range(0, min(video1_frames, video2_frames), int(scale)))))
 
-      # Read in the frames
-      ret1, frame1 = self.video1.read()
-      ret2, frame2 = self.video2.read()
+    frames1 = stats.timed('video decode', read_frames(
+      self.video1, [int(f1) for f1, _ in positions], self.decode))
+    frames2 = stats.timed('video decode', read_frames(
+      self.video2, [int(f2) for _, f2 in positions], self.decode))
 
+    for (f1, f2), frame1, frame2 in zip(positions, frames1, frames2):
       # If either frame is not read correctly, return False
-      if not ret1 or not ret2:
+      if frame1 is None or frame2 is None:
         logging.warning(f"Error reading frames. Frame count: {f1} and {f2}")
         logging.warning(f"File 1: {self.base_video} File 2: {self.compare_video}")
         # If previous frames were read correctly, return the average score
         # > 1 because it assumes that the first frame is not enough to comparison
         if len(scores) > 1:
           break
-          # result = np.mean(scores)
-          # if self.verbose > 0:
-          #   print("Video similarity (SSIM): {:.4f}".format(result))
-          # return result >= self.similarity, result
-        raise FrameError("Error reading frames. Frame count: {f1} and {f2}".format(f1, f2))
+        raise FrameError(f"Error reading frames. Frame count: {f1} and {f2}")
 
       # Compare the frames
       cmp = ImageCompare(frame1, frame2, self.verbose - 1, False)
@@ -168,7 +383,7 @@ class VideoCompare:
 
     if self.verbose > 0:
       print("Video similarity (SSIM): {:.4f}".format(result))
-    logging.info(f"Video similarity (SSIM): {result}")
+    logging.info("Video similarity (SSIM): %s", result)
 
     # If all frames are similar, return True
     return result >= self.similarity, result 
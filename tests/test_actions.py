@@ -0,0 +1,99 @@
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+from include.actions import ActionExecutor, apply_action, journal_path, load_plan, save_plan
+
+
+class TestActions(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+    self.kept = os.path.join(self.directory, 'a.txt')
+    self.duplicate = os.path.join(self.directory, 'b.txt')
+    shutil.copy('fixtures/test1.txt', self.kept)
+    shutil.copy('fixtures/test2.txt', self.duplicate)
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def step(self, action: str, target: str | None = None) -> dict:
+    return {'action': action, 'path': self.duplicate, 'kept': self.kept, 'target': target}
+
+  def test_apply_again(self):
+    target = os.path.join(self.directory, 'out', 'b.txt')
+    apply_action(self.step('move', target))
+    apply_action(self.step('move', target))
+    self.assertTrue(os.path.exists(target))
+    self.assertFalse(os.path.exists(self.duplicate))
+
+    shutil.copy(target, self.duplicate)
+    apply_action(self.step('delete'))
+    apply_action(self.step('delete'))
+    self.assertFalse(os.path.exists(self.duplicate))
+
+  def test_link_again(self):
+    target = os.path.join(self.directory, 'out', 'b.txt')
+    apply_action(self.step('link', target))
+    apply_action(self.step('link', target))
+    self.assertEqual(os.readlink(target), os.path.abspath(self.duplicate))
+
+    other = os.path.join(self.directory, 'c.txt')
+    os.symlink(self.kept, other)
+    self.assertRaises(FileExistsError, apply_action, self.step('link', other))
+
+  def test_hardlink(self):
+    apply_action(self.step('hardlink'))
+    self.assertEqual(os.stat(self.duplicate).st_ino, os.stat(self.kept).st_ino)
+    self.assertEqual(sorted(os.listdir(self.directory)), ['a.txt', 'b.txt'])
+
+  def test_save_and_load_plan(self):
+    plan = os.path.join(self.directory, 'plan', 'plan.jsonl')
+    with open(os.path.join(self.directory, 'stale.journal'), 'w') as f:
+      f.write('0\n')
+    os.makedirs(os.path.dirname(plan))
+    shutil.move(os.path.join(self.directory, 'stale.journal'), journal_path(plan))
+
+    save_plan(plan, [self.step('delete')])
+    self.assertEqual(load_plan(plan), [self.step('delete')])
+    self.assertFalse(os.path.exists(journal_path(plan)))
+
+  def test_retries_transient_errors(self):
+    calls = []
+    def flaky(step):
+      calls.append(step)
+      if len(calls) < 3:
+        raise OSError(errno.EAGAIN, 'busy')
+
+    counts = ActionExecutor(retries=3, backoff=0).run([self.step('delete')], flaky)
+    self.assertEqual(counts, {'applied': 1, 'skipped': 0, 'failed': 0})
+    self.assertEqual(len(calls), 3)
+
+  def test_does_not_retry_other_errors(self):
+    calls = []
+    def denied(step):
+      calls.append(step)
+      raise PermissionError(errno.EACCES, 'denied')
+
+    counts = ActionExecutor(retries=3, backoff=0).run([self.step('delete')], denied)
+    self.assertEqual(counts, {'applied': 0, 'skipped': 0, 'failed': 1})
+    self.assertEqual(len(calls), 1)
+
+  def test_journal_resumes(self):
+    journal = os.path.join(self.directory, 'plan.journal')
+    steps = [{'action': 'delete', 'path': str(i)} for i in range(50)]
+    applied = []
+    def interrupted(step):
+      if int(step['path']) % 2:
+        raise OSError(errno.EPERM, 'interrupted')
+      applied.append(step['path'])
+
+    executor = ActionExecutor(threads=4, retries=0, journal=journal)
+    self.assertEqual(executor.run(steps, interrupted), {'applied': 25, 'skipped': 0, 'failed': 25})
+
+    resumed = []
+    counts = executor.run(steps, lambda step: resumed.append(step['path']))
+    self.assertEqual(counts, {'applied': 25, 'skipped': 25, 'failed': 0})
+    self.assertEqual(sorted(resumed + applied, key=int), [str(i) for i in range(50)])
+    self.assertEqual(executor.run(steps, interrupted)['skipped'], 50)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2 as cv
+import numpy as np
+from skimage.metrics import structural_similarity
+
+from include.batchSimilarity import thumbnail, batch_ssim, image_windows
+
+
+class TestBatchSimilarity(unittest.TestCase):
+  def test_matches_structural_similarity(self):
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (40, 50), dtype=np.uint8)
+    others = rng.integers(0, 256, (3, 40, 50), dtype=np.uint8)
+    others[0] = base
+    others[1] = np.clip(base.astype(int) + 10, 0, 255)
+
+    scores = batch_ssim(base, others)
+
+    self.assertEqual(scores.shape, (3,))
+    for score, other in zip(scores, others):
+      self.assertAlmostEqual(score, structural_similarity(base, other))
+
+  def test_thumbnail(self):
+    image = thumbnail('fixtures/sample_640x426.bmp', 64)
+
+    self.assertEqual(image.shape, (64, 64))
+    self.assertEqual(image.dtype, np.uint8)
+    self.assertIsNone(thumbnail('fixtures/test1.txt'))
+
+  def test_thumbnail_keeps_edges(self):
+    # Images differing only near their edges must not get the same thumbnail
+    image = cv.imread('fixtures/sample_1280x853.bmp')
+    edited = image.copy()
+    cv.rectangle(edited, (0, 200), (150, 650), (0, 0, 255), -1)
+    cv.line(edited, (1130, 200), (1279, 650), (255, 255, 255), 40)
+    cv.line(edited, (1279, 200), (1130, 650), (255, 255, 255), 40)
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, 'edited.png')
+      cv.imwrite(path, edited)
+
+      score = batch_ssim(thumbnail('fixtures/sample_1280x853.bmp'), thumbnail(path)[np.newaxis])[0]
+
+      self.assertEqual(thumbnail(path).shape, (128, 128))
+      self.assertLess(score, 0.95)
+    finally:
+      shutil.rmtree(directory)
+
+  def test_image_windows(self):
+    pairs = [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (3, 4)]
+
+    windows = list(image_windows(pairs, 3))
+
+    self.assertEqual(sum(windows, []), pairs)
+    self.assertEqual(windows, [[(0, 1), (0, 2), (1, 2)], [(1, 3), (2, 3)], [(3, 4)]])
+    self.assertEqual(list(image_windows(pairs, 100)), [pairs])
+
+  def test_resized_copy_is_similar(self):
+    base = thumbnail('fixtures/sample_1280x853.bmp')
+    others = np.stack([thumbnail('fixtures/sample_640x426.bmp'), thumbnail('fixtures/594_900x900.jpg')])
+
+    scores = batch_ssim(base, others)
+
+    self.assertGreater(scores[0], 0.95)
+    self.assertLess(scores[1], 0.5)
@@ -0,0 +1,49 @@
+import unittest
+
+from include.capturePool import CapturePool
+
+
+class TestCapturePool(unittest.TestCase):
+  def test_reuse(self):
+    pool = CapturePool()
+    capture = pool.acquire('fixtures/sample_640x360.mp4')
+    pool.give_back('fixtures/sample_640x360.mp4', capture)
+
+    self.assertIs(pool.acquire('fixtures/sample_640x360.mp4'), capture)
+    self.assertEqual(pool.opened, 1)
+    self.assertEqual(pool.reused, 1)
+    capture.release()
+
+  def test_acquired_capture_is_not_shared(self):
+    pool = CapturePool()
+    capture1 = pool.acquire('fixtures/sample_640x360.mp4')
+    capture2 = pool.acquire('fixtures/sample_640x360.mp4')
+
+    self.assertIsNot(capture1, capture2)
+    pool.give_back('fixtures/sample_640x360.mp4', capture1)
+    pool.give_back('fixtures/sample_640x360.mp4', capture2)
+    self.assertEqual(len(pool), 1)
+    self.assertFalse(capture2.isOpened())
+    pool.clear()
+
+  def test_bounded(self):
+    pool = CapturePool(maxHandles=1)
+    capture1 = pool.acquire('fixtures/sample_640x360.mp4')
+    capture2 = pool.acquire('fixtures/sample_960x540.mp4')
+    pool.give_back('fixtures/sample_640x360.mp4', capture1)
+    pool.give_back('fixtures/sample_960x540.mp4', capture2)
+
+    self.assertEqual(len(pool), 1)
+    self.assertFalse(capture1.isOpened())
+    self.assertTrue(capture2.isOpened())
+
+    pool.clear()
+    self.assertEqual(len(pool), 0)
+    self.assertFalse(capture2.isOpened())
+
+  def test_unreadable_is_not_kept(self):
+    pool = CapturePool()
+    capture = pool.acquire('fixtures/test1.txt')
+    pool.give_back('fixtures/test1.txt', capture)
+
+    self.assertEqual(len(pool), 0)
@@ -0,0 +1,46 @@
+import unittest
+
+from include.clusters import DisjointSet
+
+
+class TestClusters(unittest.TestCase):
+  def test_union_is_transitive(self):
+    clusters = DisjointSet()
+    clusters.union('a', 'b')
+    clusters.union('c', 'd')
+    clusters.union('b', 'c')
+
+    self.assertEqual(clusters.find('a'), clusters.find('d'))
+    self.assertEqual(clusters.groups(), {'a': ['a', 'b', 'c', 'd']})
+    self.assertEqual(clusters.clusterCount, 1)
+
+  def test_representative_is_first_added(self):
+    clusters = DisjointSet()
+    clusters.union('x', 'y')
+    clusters.union('z', 'w')
+    clusters.union('z', 'v')
+    clusters.union('w', 'x')
+
+    self.assertEqual(clusters.representative('v'), 'x')
+    self.assertEqual(list(clusters.groups()), ['x'])
+
+  def test_separate_clusters(self):
+    clusters = DisjointSet()
+    clusters.union('a', 'b')
+    clusters.union('c', 'd')
+    clusters.union('a', 'b')
+
+    self.assertEqual(clusters.groups(), {'a': ['a', 'b'], 'c': ['c', 'd']})
+    self.assertEqual((len(clusters), clusters.clusterCount), (4, 2))
+    self.assertIn('d', clusters)
+    self.assertNotIn('e', clusters)
+
+  def test_path_compression(self):
+    clusters = DisjointSet()
+    for i in range(1, 5):
+      clusters.parent[str(i)] = str(i - 1)
+      clusters.size[str(i)] = 1
+    clusters.parent['0'] = '0'
+
+    self.assertEqual(clusters.find('4'), '0')
+    self.assertTrue(all(clusters.parent[str(i)] == '0' for i in range(5)))
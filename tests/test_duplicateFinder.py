@@ -1,9 +1,26 @@
+import io
 from unittest.mock import patch
 import unittest
+import json
 import os
 import shutil
+import tempfile
+
+import cv2 as cv
 
 from duplicateFinder import DuplicateFinder
+from include.stats import stats
+import include.actions as actions
+
+
+def search_pairwise(duplicateFinder: DuplicateFinder) -> None:
+  # Reference search comparing every pair of files, to check the searches
+  # that only compare some of them
+  allFiles = duplicateFinder.get_all_files()
+  for i, file1 in enumerate(allFiles):
+    for file2 in allFiles[i + 1:]:
+      if duplicateFinder.compare_files(file1, file2)[0]:
+        duplicateFinder.add_duplicate(file1, file2)
 
 
 class TestDuplicate(unittest.TestCase):
@@ -62,6 +79,21 @@ class TestDuplicate(unittest.TestCase):
       'fixtures/images_sizes/R.jpg',
       'fixtures/images_sizes/sample-images-05.jpeg']))
 
+  def test_get_all_files_multiple_roots(self) -> None:
+    duplicateFinder = DuplicateFinder(['-d', 'fixtures/images_sizes', 'fixtures', '-r', '--walkers', '4'])
+    allFiles = duplicateFinder.get_all_files()
+
+    self.assertEqual(duplicateFinder.directories, ['fixtures'])
+    self.assertEqual(allFiles, sorted(DuplicateFinder(['-d', 'fixtures', '-r']).get_all_files()))
+
+  def test_root_directories(self) -> None:
+    self.assertEqual(DuplicateFinder.root_directories(['fixtures', './fixtures/', 'tests'], False),
+                     ['fixtures', 'tests'])
+    self.assertEqual(DuplicateFinder.root_directories(['fixtures', 'fixtures/images_sizes'], False),
+                     ['fixtures', 'fixtures/images_sizes'])
+    self.assertEqual(DuplicateFinder.root_directories(['fixtures/images_sizes', 'fixtures'], True),
+                     ['fixtures'])
+
   def test_search_duplicates_hard(self) -> None:
     duplicateFinder = DuplicateFinder(['-d', 'fixtures'])
     duplicateFinder.search()
@@ -73,6 +105,30 @@ class TestDuplicate(unittest.TestCase):
                                       'fixtures/test1.txt',
                                       'fixtures/test2.txt']))
 
+  def test_search_hard_matches_pairwise(self) -> None:
+    pipeline = DuplicateFinder(['-d', 'fixtures', '-r'])
+    pipeline.search()
+
+    pairwise = DuplicateFinder(['-d', 'fixtures', '-r'])
+    search_pairwise(pairwise)
+
+    self.assertEqual(pipeline.duplicates, pairwise.duplicates)
+    self.assertEqual(pipeline.countDuplicates, pairwise.countDuplicates)
+
+  def test_group_stages_only_keys_collisions(self) -> None:
+    duplicateFinder = DuplicateFinder(['-d', 'fixtures', '--no-cache'])
+    keyed = []
+
+    def key(file: str) -> str:
+      keyed.append(file)
+      return file[-5]
+
+    groups = duplicateFinder.group_stages(
+      iter(['a1.txt', 'b22.txt', 'c1.txt', 'd333.txt', 'e2.txt']), [len, key])
+
+    self.assertEqual(groups, [['a1.txt', 'c1.txt']])
+    self.assertCountEqual(keyed, ['a1.txt', 'c1.txt', 'e2.txt'])
+
   def test_search_duplicates_soft_best(self) -> None:
     duplicateFinder = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '-f', 'best'])
     duplicateFinder.search()
@@ -83,6 +139,139 @@ class TestDuplicate(unittest.TestCase):
       'fixtures/sample_960x540.mp4': set(['fixtures/sample_640x360.mp4'])
     })
 
+  def test_best_reads_only_headers(self) -> None:
+    duplicateFinder = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '-f', 'best', '-i', '.bmp'])
+    duplicateFinder.search()
+
+    with patch('include.files.get_image_resolution', side_effect=AssertionError), \
+         patch('include.files.get_image_header_resolution') as header:
+      duplicated = duplicateFinder.choose_duplicate()
+
+    header.assert_not_called()
+    self.assertEqual(duplicated, {
+      'fixtures/sample_1280x853.bmp': set(['fixtures/copy_sample.bmp', 'fixtures/sample_640x426.bmp'])
+    })
+
+  def test_stats_file(self) -> None:
+    directory = tempfile.mkdtemp()
+    statsFile = os.path.join(directory, 'stats.json')
+    duplicateFinder = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '-j', '2',
+                                       '--stats-file', statsFile, '--profile',
+                                       os.path.join(directory, 'search.prof')])
+    try:
+      with patch.object(DuplicateFinder, 'action_on_duplicates'):
+        duplicateFinder.main()
+
+      with open(statsFile) as f:
+        report = json.load(f)
+      self.assertEqual(report['counters']['files enumerated'], len(duplicateFinder.get_all_files()))
+      self.assertEqual(report['counters']['image pairs considered'], 6)
+      self.assertEqual(report['counters']['pairs compared'], report['counters']['pairs to compare'])
+      self.assertIn('search', report['timings'])
+      self.assertIn('action', report['timings'])
+      self.assertTrue(os.path.exists(os.path.join(directory, 'search.prof')))
+    finally:
+      stats.reset(False)
+      shutil.rmtree(directory, ignore_errors=True)
+
+  def test_progress(self) -> None:
+    duplicateFinder = DuplicateFinder(['-d', 'fixtures', '-t', 'hard', '--no-cache', '--progress'])
+    stream = io.StringIO()
+    try:
+      with patch('sys.stderr', stream), patch.object(DuplicateFinder, 'action_on_duplicates'):
+        duplicateFinder.main()
+
+      line = stream.getvalue().splitlines()[-1]
+      self.assertIn(f"files {len(duplicateFinder.get_all_files())}", line)
+      self.assertIn('100.0%', line)
+    finally:
+      stats.reset(False)
+
+  def test_report(self) -> None:
+    directory = tempfile.mkdtemp()
+    report = os.path.join(directory, 'report.jsonl')
+    try:
+      for type in ('hard', 'soft'):
+        duplicateFinder = DuplicateFinder(['-d', 'fixtures', '-t', type, '--no-cache',
+                                           '--report', report])
+        duplicateFinder.search()
+
+        with open(report) as f:
+          clusters = [json.loads(line) for line in f]
+        expected = duplicateFinder.choose_duplicate()
+        self.assertEqual({cluster['kept']['path']: {duplicate['path'] for duplicate
+                          in cluster['duplicates']} for cluster in clusters}, expected)
+        for cluster in clusters:
+          self.assertEqual(cluster['reclaimable'],
+                           sum(os.path.getsize(duplicate['path'])
+                               for duplicate in cluster['duplicates']))
+          if type == 'hard':
+            self.assertTrue(all(duplicate['similarity'] == 1.0
+                                for duplicate in cluster['duplicates']))
+          else:
+            # Similarities are those with the file kept, videos included
+            for duplicate in cluster['duplicates']:
+              pair = tuple(sorted((cluster['kept']['path'], duplicate['path'])))
+              self.assertEqual(duplicate['similarity'], duplicateFinder.similarities[pair])
+              self.assertLess(duplicate['similarity'], 1.0)
+    finally:
+      shutil.rmtree(directory, ignore_errors=True)
+
+  def test_search_soft_matches_pairwise(self) -> None:
+    candidates = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '-r'])
+    candidates.search()
+
+    pairwise = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '-r'])
+    search_pairwise(pairwise)
+
+    self.assertEqual(candidates.duplicates, pairwise.duplicates)
+
+  def test_search_duplicates_soft_jobs(self) -> None:
+    serial = DuplicateFinder(['-d', 'fixtures', '-t', 'soft'])
+    serial.search()
+
+    parallel = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '-j', '2'])
+    parallel.search()
+
+    self.assertEqual(parallel.duplicates, serial.duplicates)
+
+  def test_search_duplicates_soft_small_image_cache(self) -> None:
+    bounded = DuplicateFinder(['-d', 'fixtures', '-t', 'soft', '--image-cache', '0'])
+    bounded.search()
+
+    default = DuplicateFinder(['-d', 'fixtures', '-t', 'soft'])
+    default.search()
+
+    self.assertEqual(bounded.duplicates, default.duplicates)
+
+  def test_search_soft_compares_image_edges(self) -> None:
+    directory = tempfile.mkdtemp()
+    try:
+      image = cv.imread('fixtures/sample_1280x853.bmp')
+      cv.rectangle(image, (0, 200), (150, 650), (0, 0, 255), -1)
+      cv.line(image, (1130, 200), (1279, 650), (255, 255, 255), 40)
+      cv.line(image, (1279, 200), (1130, 650), (255, 255, 255), 40)
+      shutil.copy('fixtures/sample_1280x853.bmp', os.path.join(directory, 'a.bmp'))
+      cv.imwrite(os.path.join(directory, 'b.png'), image)
+
+      duplicateFinder = DuplicateFinder(['-d', directory, '-t', 'soft', '-s', '0.95', '--no-cache'])
+      duplicateFinder.search()
+
+      self.assertEqual(duplicateFinder.duplicates, {})
+    finally:
+      shutil.rmtree(directory, ignore_errors=True)
+
+  def test_worker_state_leaves_results(self) -> None:
+    finder = DuplicateFinder(['-d', 'fixtures', '-t', 'soft'])
+    finder.search()
+    self.assertTrue(finder.duplicates)
+
+    state = finder.__getstate__()
+    self.assertEqual(len(state['clusters']), 0)
+    self.assertEqual(state['similarities'], {})
+    self.assertEqual(state['hardLinks'], {})
+    self.assertEqual(state['headers'], {})
+
   @patch('builtins.input', lambda *args: 'y')
   def test_search_duplicates_delete(self) -> None:  
     duplicateFinder = DuplicateFinder(['-d', 'fixtures_copy', '-t', 'soft', '-f', 'best', '-i', '.bmp', '-b'])
@@ -106,4 +295,244 @@ class TestDuplicate(unittest.TestCase):
     duplicateFinder.main()
 
     self.assertTrue(os.path.exists('duplicated/sample_640x360.mp4'))
-    self.assertTrue(os.path.islink('duplicated/sample_640x360.mp4'))
\ No newline at end of file
+    self.assertTrue(os.path.islink('duplicated/sample_640x360.mp4'))
+
+
+class TestHardLinks(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+    self.original = os.path.join(self.directory, 'a.txt')
+    self.link = os.path.join(self.directory, 'b.txt')
+    self.copy = os.path.join(self.directory, 'c.txt')
+    shutil.copy('fixtures/test1.txt', self.original)
+    os.link(self.original, self.link)
+    shutil.copy('fixtures/test2.txt', self.copy)
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def test_hard_links_are_not_duplicates(self) -> None:
+    duplicateFinder = DuplicateFinder(['-d', self.directory, '--no-cache'])
+    duplicateFinder.search()
+
+    linked = duplicateFinder.get_all_duplicates()
+    self.assertEqual(len(linked), 2)
+    self.assertIn(self.copy, linked)
+    self.assertEqual(len(duplicateFinder.hardLinks), 1)
+    self.assertEqual(set(*duplicateFinder.hardLinks.values()) | set(duplicateFinder.hardLinks),
+                     {self.original, self.link})
+
+  def test_hardlink_action(self) -> None:
+    duplicateFinder = DuplicateFinder(['-d', self.directory, '--no-cache', '-a', 'hardlink'])
+    duplicateFinder.main()
+
+    self.assertEqual(os.stat(self.copy).st_ino, os.stat(self.original).st_ino)
+    self.assertEqual(sorted(os.listdir(self.directory)), ['a.txt', 'b.txt', 'c.txt'])
+
+  def test_failed_link_keeps_duplicate(self) -> None:
+    def fail(source: str, destination: str) -> None:
+      open(destination, 'w').close()
+      raise OSError('not supported')
+
+    self.assertRaises(OSError, actions.replace_with_link, self.original, self.copy, fail)
+
+    self.assertNotEqual(os.stat(self.copy).st_ino, os.stat(self.original).st_ino)
+    self.assertEqual(sorted(os.listdir(self.directory)), ['a.txt', 'b.txt', 'c.txt'])
+
+
+class TestActionPlan(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+    self.files = os.path.join(self.directory, 'files')
+    os.makedirs(os.path.join(self.files, 'nested'))
+    shutil.copy('fixtures/test1.txt', os.path.join(self.files, 'a.txt'))
+    shutil.copy('fixtures/test1.txt', os.path.join(self.files, 'b.txt'))
+    shutil.copy('fixtures/test1.txt', os.path.join(self.files, 'nested', 'b.txt'))
+    self.plan = os.path.join(self.directory, 'plan.jsonl')
+    self.output = os.path.join(self.directory, 'out')
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def test_plan_and_execute(self) -> None:
+    options = ['-d', self.files, '-r', '--no-cache', '-a', 'move', '-o', self.output]
+    with patch('builtins.input') as ask:
+      DuplicateFinder(options + ['--dry-run', '--plan', self.plan]).main()
+    ask.assert_not_called()
+    self.assertEqual(len(os.listdir(self.files)), 3)
+
+    steps = [json.loads(line) for line in open(self.plan)]
+    self.assertEqual(len(steps), 2)
+    # Duplicates with the same name are not moved over each other
+    self.assertEqual(len({step['target'] for step in steps}), 2)
+
+    DuplicateFinder(['--execute', self.plan]).main()
+    self.assertEqual(len(os.listdir(self.output)), 2)
+    with open(self.plan + '.journal') as f:
+      self.assertEqual(sorted(f.read().split()), ['0', '1'])
+
+    # Running the plan again skips the actions already done
+    DuplicateFinder(['--execute', self.plan]).main()
+    self.assertEqual(len(os.listdir(self.output)), 2)
+
+  def test_execute_from_another_directory(self) -> None:
+    # The plan is made with relative paths and executed from elsewhere
+    work = os.getcwd()
+    os.chdir(self.directory)
+    try:
+      DuplicateFinder(['-d', 'files', '-r', '--no-cache', '-a', 'move', '-o', 'out',
+                       '--dry-run', '--plan', 'plan.jsonl']).main()
+      steps = [json.loads(line) for line in open('plan.jsonl')]
+      self.assertTrue(all(os.path.isabs(step[key]) for step in steps
+                          for key in ('path', 'kept', 'target')))
+
+      os.makedirs('elsewhere')
+      os.chdir('elsewhere')
+      DuplicateFinder(['--execute', self.plan]).main()
+      self.assertFalse(os.path.exists('out'))
+    finally:
+      os.chdir(work)
+
+    self.assertEqual(len(os.listdir(self.output)), 2)
+    self.assertEqual(len(os.listdir(self.files)), 2)
+
+  def test_delete_confirms_before_acting(self) -> None:
+    answers = iter(['y', 'n'])
+    with patch('builtins.input', lambda *args: next(answers)):
+      DuplicateFinder(['-d', self.files, '-r', '--no-cache']).main()
+
+    remaining = [os.path.join(root, name) for root, _, names in os.walk(self.files) for name in names]
+    self.assertEqual(len(remaining), 2)
+
+
+class TestIncremental(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+    self.state = os.path.join(self.directory, 'state', 'state.json')
+    self.files = os.path.join(self.directory, 'files')
+    os.makedirs(self.files)
+    for name in ('a.txt', 'b.txt'):
+      shutil.copy('fixtures/test1.txt', os.path.join(self.files, name))
+    shutil.copy('fixtures/test3.txt', os.path.join(self.files, 'c.txt'))
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def search(self) -> DuplicateFinder:
+    duplicateFinder = DuplicateFinder(['-d', self.files, '--no-cache', '--incremental',
+                                       '--state', self.state])
+    duplicateFinder.search()
+    return duplicateFinder
+
+  def test_incremental_keeps_previous_duplicates(self) -> None:
+    first = self.search()
+    self.assertEqual(first.countDuplicates, 1)
+
+    shutil.copy('fixtures/test1.txt', os.path.join(self.files, 'd.txt'))
+    with patch.object(DuplicateFinder, 'search_hard', autospec=True,
+                      side_effect=DuplicateFinder.search_hard) as hard:
+      second = self.search()
+    searched = {file.path for file in hard.call_args.args[1]}
+
+    self.assertEqual(second.get_all_duplicates(), {os.path.join(self.files, name)
+                                                   for name in ('a.txt', 'b.txt', 'd.txt')})
+    self.assertEqual(len(searched), 2)
+    self.assertIn(os.path.join(self.files, 'd.txt'), searched)
+    self.assertNotIn(os.path.join(self.files, 'c.txt'), searched)
+
+  def test_changed_file_leaves_cluster(self) -> None:
+    self.search()
+
+    changed = os.path.join(self.files, 'b.txt')
+    shutil.copy('fixtures/test3.txt', changed)
+    os.utime(changed, ns=(1, 1))
+    second = self.search()
+
+    self.assertEqual(second.get_all_duplicates(), {changed, os.path.join(self.files, 'c.txt')})
+
+  def test_other_options_search_every_file(self) -> None:
+    self.search()
+
+    duplicateFinder = DuplicateFinder(['-d', self.files, '--no-cache', '--incremental',
+                                       '--state', self.state, '-i', '.txt'])
+    with patch.object(DuplicateFinder, 'search_hard', autospec=True) as hard:
+      duplicateFinder.search()
+    self.assertEqual(len(hard.call_args.args[1]), 3)
+    self.assertEqual(len(hard.call_args.args), 2)
+
+
+class TestCheckpoint(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+    self.checkpoint = os.path.join(self.directory, 'checkpoint.json')
+    self.files = os.path.join(self.directory, 'files')
+    os.makedirs(self.files)
+    for name in ('a.txt', 'b.txt'):
+      shutil.copy('fixtures/test1.txt', os.path.join(self.files, name))
+    for name in ('c.txt', 'd.txt'):
+      shutil.copy('fixtures/test3.txt', os.path.join(self.files, name))
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def finder(self, *options: str) -> DuplicateFinder:
+    return DuplicateFinder(['-d', self.files, '--no-cache', '--checkpoint', self.checkpoint,
+                            '--checkpoint-interval', '0', *options])
+
+  def test_resume_hard(self) -> None:
+    calls = []
+    def interrupted(file1: str, file2: str) -> bool:
+      calls.append(file1)
+      if len(calls) > 1:
+        raise KeyboardInterrupt
+      return True
+
+    with patch('duplicateFinder.validate_file_contents', side_effect=interrupted):
+      with self.assertRaises(KeyboardInterrupt):
+        self.finder().search()
+
+    with patch('duplicateFinder.validate_file_contents', return_value=True) as validate:
+      resumed = self.finder('--resume')
+      resumed.search()
+
+    # Only the group interrupted is compared again
+    self.assertEqual(validate.call_count, 1)
+    self.assertEqual(resumed.countDuplicates, 2)
+    self.assertEqual(resumed.clusters.clusterCount, 2)
+
+  def test_resume_changed_files_starts_over(self) -> None:
+    self.finder().search()
+    shutil.copy('fixtures/test1.txt', os.path.join(self.files, 'e.txt'))
+
+    with patch('duplicateFinder.validate_file_contents', return_value=True) as validate:
+      resumed = self.finder('--resume')
+      resumed.search()
+
+    self.assertEqual(validate.call_count, 3)
+    self.assertEqual(resumed.countDuplicates, 3)
+
+  def test_resume_soft(self) -> None:
+    checkpoint = os.path.join(self.directory, 'soft.json')
+    options = ['-d', 'fixtures', '-t', 'soft', '--no-cache', '--checkpoint', checkpoint]
+    first = DuplicateFinder(options)
+    first.search()
+
+    with open(checkpoint) as f:
+      saved = json.load(f)
+    self.assertTrue(saved['fingerprints']['image'])
+
+    # Finished fingerprints and pairs are not computed again
+    with patch.object(DuplicateFinder, 'image_fingerprint') as image, \
+         patch.object(DuplicateFinder, 'video_fingerprint') as video, \
+         patch.object(DuplicateFinder, 'compare_files') as compare, \
+         patch('duplicateFinder.batch_ssim') as ssim:
+      resumed = DuplicateFinder(options + ['--resume'])
+      resumed.search()
+
+    for mock in (image, video, compare, ssim):
+      mock.assert_not_called()
+    self.assertEqual(resumed.duplicates, first.duplicates)
+
+  def test_resume_requires_checkpoint(self) -> None:
+    with patch('sys.stderr', io.StringIO()), self.assertRaises(SystemExit):
+      DuplicateFinder(['-d', self.files, '--resume'])
@@ -1,9 +1,28 @@
 import unittest
 
-from include.fileByteCompare import validate_file_contents
+from include.fileByteCompare import validate_file_contents, hash_file_partial, hash_file
 
 
 class TestByteCompare(unittest.TestCase):
     def test_validate_file_contents(self):
         self.assertTrue(validate_file_contents('fixtures/test1.txt', 'fixtures/test2.txt'))
         self.assertFalse(validate_file_contents('fixtures/test1.txt', 'fixtures/test3.txt'))
+
+    def test_hash_file(self):
+        self.assertEqual(hash_file('fixtures/test1.txt'), hash_file('fixtures/test2.txt'))
+        self.assertNotEqual(hash_file('fixtures/test1.txt'), hash_file('fixtures/test3.txt'))
+        self.assertEqual(hash_file('fixtures/test1.txt', blockSize=4), hash_file('fixtures/test1.txt'))
+
+    def test_hash_file_partial(self):
+        self.assertEqual(hash_file_partial('fixtures/copy_sample.bmp'),
+                         hash_file_partial('fixtures/sample_640x426.bmp'))
+        self.assertNotEqual(hash_file_partial('fixtures/sample_640x426.bmp'),
+                            hash_file_partial('fixtures/sample_1280x853.bmp'))
+        self.assertEqual(hash_file_partial('fixtures/test1.txt', blockSize=4),
+                         hash_file_partial('fixtures/test2.txt', blockSize=4))
+
+    def test_validate_file_contents_blocks(self):
+        self.assertTrue(validate_file_contents('fixtures/test1.txt', 'fixtures/test2.txt', blockSize=3))
+        self.assertTrue(validate_file_contents('fixtures/copy_sample.bmp', 'fixtures/sample_640x426.bmp', blockSize=4096))
+        self.assertFalse(validate_file_contents('fixtures/sample_640x426.bmp', 'fixtures/sample_1280x853.bmp'))
+
@@ -1,4 +1,7 @@
 import unittest
+import os
+import shutil
+import tempfile
 
 import include.files as files
 
@@ -43,11 +46,62 @@ class TestFileUtils(unittest.TestCase):
       with self.subTest(file=file):
         self.assertIn(file, allFiles)
 
+  def test_scan_files_walk_order(self):
+    walked = [os.path.join(dirpath, f)
+              for (dirpath, dirnames, filenames) in os.walk('fixtures') for f in filenames]
+    self.assertEqual([entry.path for entry in files.scan_files('fixtures')], walked)
+
+  def test_scan_files_extensions(self):
+    included = [entry.name for entry in files.scan_files('fixtures', include=['.txt'])]
+    self.assertEqual(sorted(included), ['test1.txt', 'test2.txt', 'test3.txt'])
+
+    excluded = [entry.path for entry in files.scan_files('fixtures', exclude=['.txt', '.bmp'])]
+    self.assertIn('fixtures/images_sizes/R.jpg', excluded)
+    self.assertFalse(any(path.endswith(('.txt', '.bmp')) for path in excluded))
+
+  def test_scan_files_threads(self):
+    serial = sorted(entry.path for entry in files.scan_files(['fixtures/images_sizes', 'tests']))
+    parallel = [entry.path for entry in files.scan_files(['fixtures/images_sizes', 'tests'], threads=3)]
+    self.assertEqual(parallel, serial)
+    self.assertEqual(files.get_recursive_files('fixtures', threads=2),
+                     sorted(files.get_recursive_files('fixtures')))
+
+  def test_scan_files_entry_size(self):
+    entry = next(entry for entry in files.scan_files('fixtures') if entry.name == 'test1.txt')
+    self.assertEqual(files.return_file_size(entry), 13)
+
+  def test_reflink(self):
+    directory = tempfile.mkdtemp()
+    clone = os.path.join(directory, 'clone.txt')
+    try:
+      files.reflink('fixtures/test1.txt', clone)
+      with open(clone) as f1, open('fixtures/test1.txt') as f2:
+        self.assertEqual(f1.read(), f2.read())
+    except OSError:
+      # The filesystem cannot clone files, nothing must be left behind
+      self.assertFalse(os.path.exists(clone))
+    finally:
+      shutil.rmtree(directory, ignore_errors=True)
+
   def test_get_image_resolution(self):
     self.assertEqual(files.get_image_resolution('fixtures/594_900x900.jpg'), (900, 900))
     self.assertEqual(files.get_image_resolution('fixtures/sample_1280x853.bmp'), (853, 1280))
     self.assertEqual(files.get_image_resolution('fixtures/images_sizes/sample-images-05.jpeg'), (1351, 900))
 
+  def test_get_image_header_resolution(self):
+    for image in ['fixtures/594_900x900.jpg',
+                  'fixtures/sample_1280x853.bmp',
+                  'fixtures/images_sizes/sample-images-05.jpeg']:
+      with self.subTest(image=image):
+        self.assertEqual(files.get_image_header_resolution(image), files.get_image_resolution(image))
+
+  def test_get_video_metadata(self):
+    width, height, fps, duration = files.get_video_metadata('fixtures/sample_640x360.mp4')
+    self.assertEqual((width, height), (640, 360))
+    self.assertAlmostEqual(fps, 29.97, 2)
+    self.assertAlmostEqual(duration, 13.3467, 3)
+    self.assertRaises(ValueError, files.get_video_metadata, 'fixtures/test1.txt')
+
   def test_get_video_info(self):
     rSample640 = files.get_video_info('fixtures/sample_640x360.mp4')
     rSample960 = files.get_video_info('fixtures/sample_960x540.mp4')
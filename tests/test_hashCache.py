@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from include.hashCache import HashCache
+from include.fileByteCompare import hash_file_partial, hash_file
+
+
+class TestHashCache(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+    self.file = os.path.join(self.directory, 'file.txt')
+    shutil.copy('fixtures/test1.txt', self.file)
+    self.cache = HashCache(os.path.join(self.directory, 'cache', 'hashes.db'))
+
+  def tearDown(self) -> None:
+    self.cache.close()
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def test_hashes(self) -> None:
+    self.assertEqual(self.cache.partial_hash(self.file), hash_file_partial(self.file))
+    self.assertEqual(self.cache.full_hash(self.file), hash_file(self.file))
+    self.assertEqual(self.cache.misses, 2)
+
+  def test_hit_on_unchanged_file(self) -> None:
+    self.cache.full_hash(self.file)
+    self.cache.close()
+
+    self.cache = HashCache(self.cache.path)
+    self.assertEqual(self.cache.full_hash(self.file), hash_file(self.file))
+    self.assertEqual((self.cache.hits, self.cache.misses), (1, 0))
+
+  def test_miss_on_changed_file(self) -> None:
+    self.cache.full_hash(self.file)
+    with open(self.file, 'a') as f:
+      f.write('changed')
+    os.utime(self.file, ns=(0, 0))
+
+    self.assertEqual(self.cache.full_hash(self.file), hash_file(self.file))
+    self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+  def test_fingerprint(self) -> None:
+    fingerprint = np.array([1, 2 ** 63], dtype=np.uint64)
+    self.assertIsNone(self.cache.get_fingerprint(self.file, 'video'))
+    self.cache.set_fingerprint(self.file, 'video', fingerprint)
+
+    np.testing.assert_array_equal(self.cache.get_fingerprint(self.file, 'video'), fingerprint)
+    self.assertIsNone(self.cache.get_fingerprint(self.file, 'image'))
+
+    os.utime(self.file, ns=(0, 0))
+    self.assertIsNone(self.cache.get_fingerprint(self.file, 'video'))
+
+  def test_evict(self) -> None:
+    other = os.path.join(self.directory, 'other.txt')
+    shutil.copy('fixtures/test3.txt', other)
+    self.cache.full_hash(self.file)
+    self.cache.full_hash(other)
+    self.cache.set_fingerprint(other, 'image', np.zeros(1, dtype=np.uint64))
+    os.remove(other)
+
+    self.assertEqual(self.cache.evict(60, [self.directory]), 2)
+    time.sleep(0.01)
+    self.assertEqual(self.cache.evict(0), 1)
+
+  def test_evict_only_under_roots(self) -> None:
+    other = os.path.join(self.directory, 'other', 'other.txt')
+    os.makedirs(os.path.dirname(other))
+    shutil.copy('fixtures/test3.txt', other)
+    self.cache.full_hash(other)
+    os.remove(other)
+
+    # Missing files outside the roots or under unreachable roots are kept
+    self.assertEqual(self.cache.evict(60), 0)
+    self.assertEqual(self.cache.evict(60, [os.path.join(self.directory, 'cache')]), 0)
+    self.assertEqual(self.cache.evict(60, [os.path.join(self.directory, 'unmounted')]), 0)
+    self.assertEqual(self.cache.evict(60, [os.path.dirname(other)]), 1)
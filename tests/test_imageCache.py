@@ -0,0 +1,64 @@
+import unittest
+
+import cv2 as cv
+import numpy as np
+
+from include.imageCache import ImageCache, read_image_reduced
+
+
+class TestImageCache(unittest.TestCase):
+  def test_read_once(self):
+    cache = ImageCache()
+    first = cache.read('fixtures/sample_640x426.bmp')
+    second = cache.read('fixtures/sample_640x426.bmp')
+
+    self.assertIs(first, second)
+    self.assertFalse(first.flags.writeable)
+    self.assertEqual((cache.hits, cache.misses), (1, 1))
+    self.assertEqual(cache.size, first.nbytes)
+
+  def test_flags(self):
+    cache = ImageCache()
+    color = cache.read('fixtures/sample_640x426.bmp')
+    gray = cache.read('fixtures/sample_640x426.bmp', cv.IMREAD_GRAYSCALE)
+
+    self.assertEqual(color.shape, (426, 640, 3))
+    self.assertEqual(gray.shape, (426, 640))
+    self.assertEqual(cache.misses, 2)
+
+  def test_memory_budget(self):
+    cache = ImageCache(maxBytes=426 * 640 * 3)
+    cache.read('fixtures/sample_640x426.bmp')
+    cache.read('fixtures/copy_sample.bmp')
+
+    self.assertEqual(cache.size, 426 * 640 * 3)
+    cache.read('fixtures/sample_640x426.bmp')
+    self.assertEqual(cache.misses, 3)
+
+    cache.read('fixtures/sample_1280x853.bmp')
+    self.assertEqual(cache.size, 426 * 640 * 3)
+
+  def test_get_put(self):
+    cache = ImageCache(maxBytes=100)
+    self.assertIsNone(cache.get(('a', 'thumbnail', 10)))
+
+    cache.put(('a', 'thumbnail', 10), np.zeros((10, 10), dtype=np.uint8))
+    self.assertEqual(cache.get(('a', 'thumbnail', 10)).shape, (10, 10))
+    self.assertEqual(cache.hits, 1)
+
+    cache.put(('b', 'thumbnail', 10), np.zeros((10, 10), dtype=np.uint8))
+    self.assertIsNone(cache.get(('a', 'thumbnail', 10)))
+    self.assertEqual(cache.size, 100)
+
+  def test_unreadable(self):
+    cache = ImageCache()
+    self.assertIsNone(cache.read('fixtures/test1.txt'))
+    self.assertEqual(cache.size, 0)
+
+  def test_read_reduced(self):
+    image = read_image_reduced('fixtures/594_900x900.jpg', 200)
+    self.assertEqual(image.shape, (225, 225))
+
+    image = read_image_reduced('fixtures/594_900x900.jpg', 500, grayscale=False)
+    self.assertEqual(image.shape, (900, 900, 3))
+    self.assertIsNone(read_image_reduced('fixtures/test1.txt', 100))
@@ -50,6 +50,17 @@ class TestImageCompare(unittest.TestCase):
       'fixtures/images_sizes/R.jpg').image_similarity()
     self.assertFalse(result[0])
 
+  def test_compare_size(self):
+    comparison = ImageCompare(
+      'fixtures/sample_640x426.bmp',
+      'fixtures/sample_1280x853.bmp',
+      compare_size=128)
+    result = comparison.image_similarity()
+
+    self.assertTrue(result[0])
+    self.assertEqual(min(comparison.cv_base_image.shape), 128)
+    self.assertEqual(comparison.cv_base_image.shape, comparison.cv_compare_image.shape)
+
   def test_show_images(self):
     result = ImageCompare(
       'fixtures/sample_640x426.bmp',
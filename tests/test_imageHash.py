@@ -0,0 +1,61 @@
+import unittest
+
+import cv2 as cv
+import numpy as np
+
+from include.batchSimilarity import thumbnail
+from include.imageCache import imageCache
+from include.imageHash import dhash, hamming, hash_candidates
+
+
+class TestImageHash(unittest.TestCase):
+  def test_dhash_resized_copy(self):
+    # The larger copy is decoded at a reduced resolution, which may flip a bit
+    distance = hamming(dhash('fixtures/sample_640x426.bmp'), dhash('fixtures/sample_1280x853.bmp'))
+    self.assertLessEqual(distance, 2)
+
+  def test_dhash_different(self):
+    distance = hamming(dhash('fixtures/sample_640x426.bmp'), dhash('fixtures/594_900x900.jpg'))
+    self.assertGreater(distance, 10)
+
+  def test_dhash_array(self):
+    image = cv.imread('fixtures/594_900x900.jpg')
+    self.assertEqual(dhash(image), dhash('fixtures/594_900x900.jpg'))
+    self.assertLess(dhash(image, hashSize=4), 1 << 16)
+
+  def test_dhash_shares_thumbnail_decode(self):
+    imageCache.clear()
+    dhash('fixtures/sample_1280x853.bmp')
+    misses = imageCache.misses
+    thumbnail('fixtures/sample_1280x853.bmp', 128)
+    self.assertEqual(imageCache.misses, misses)
+
+  def test_dhash_unreadable(self):
+    self.assertRaises(ValueError, dhash, 'fixtures/test1.txt')
+
+  def test_hamming(self):
+    self.assertEqual(hamming(0b1011, 0b0001), 2)
+    self.assertEqual(hamming(5, 5), 0)
+
+  def test_hash_candidates(self):
+    hashes = {0: 0b0000, 1: 0b0001, 2: 0b0011, 3: 0b1111, 4: 0b0001}
+    self.assertEqual(list(hash_candidates(hashes, 0)), [(1, 4)])
+    self.assertEqual(list(hash_candidates(hashes, 1)), [(0, 1), (0, 4), (1, 2), (1, 4), (2, 4)])
+    self.assertEqual(len(list(hash_candidates(hashes, 4))), 10)
+    self.assertEqual(list(hash_candidates({}, 10)), [])
+
+  def test_hash_candidates_matches_brute_force(self):
+    rng = np.random.default_rng(0)
+    base = [int(value) for value in rng.integers(0, 1 << 63, 50)]
+    hashes = {}
+    for index in range(500):
+      # Copies of a few hashes with some bits flipped, and unrelated hashes
+      hash = base[index % 50] if index % 2 else int(rng.integers(0, 1 << 63))
+      for bit in rng.choice(64, int(rng.integers(0, 14)), replace=False):
+        hash ^= 1 << int(bit)
+      hashes[index] = hash
+
+    for distance in (0, 5, 10, 12, 20):
+      expected = [(i, j) for i in hashes for j in hashes
+                  if i < j and hamming(hashes[i], hashes[j]) <= distance]
+      self.assertEqual(sorted(hash_candidates(hashes, distance)), expected)
@@ -0,0 +1,55 @@
+import threading
+import unittest
+
+from include.pipeline import Pipeline
+
+
+class TestPipeline(unittest.TestCase):
+  def test_stages(self):
+    seen = []
+    pipeline = (Pipeline(range(10), queueSize=2)
+                .stage(lambda n: [n] * (n % 3), threads=3)
+                .stage(lambda n: seen.append(n) or [n * 10], flush=lambda: [-1]))
+
+    results = list(pipeline)
+
+    self.assertEqual(results[-1], -1)
+    self.assertCountEqual(results[:-1], [n * 10 for n in range(10) for _ in range(n % 3)])
+    self.assertCountEqual(seen, [n for n in range(10) for _ in range(n % 3)])
+
+  def test_single_thread_keeps_order(self):
+    results = list(Pipeline(range(100), queueSize=4).stage(lambda n: [n + 1]))
+    self.assertEqual(results, list(range(1, 101)))
+
+  def test_bounded(self):
+    fed = []
+    release = threading.Event()
+
+    def source():
+      for n in range(100):
+        fed.append(n)
+        yield n
+
+    def slow(n):
+      release.wait()
+      return [n]
+
+    pipeline = iter(Pipeline(source(), queueSize=2).stage(slow))
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(pipeline))
+    thread.start()
+    release.wait(0.5)
+    # One item in the stage plus two queued, and one waiting to be put
+    self.assertLessEqual(len(fed), 4)
+    release.set()
+    thread.join()
+    self.assertEqual(results, list(range(100)))
+
+  def test_error(self):
+    def fail(n):
+      if n == 5:
+        raise ValueError('failed')
+      return [n]
+
+    with self.assertRaises(ValueError):
+      list(Pipeline(range(1000)).stage(fail, threads=2))
@@ -0,0 +1,25 @@
+import unittest
+
+from include.prefilter import compatible_items, within_tolerances
+
+
+class TestPrefilter(unittest.TestCase):
+  def test_compatible_items(self):
+    items = [(0, (1.0,)), (1, (1.9,)), (2, (2.1,)), (3, (5.0,)), (4, (0.95,))]
+    self.assertEqual(compatible_items(items, (1,)), {0, 1, 2, 4})
+
+  def test_compatible_items_neighbour_bucket(self):
+    self.assertEqual(compatible_items([(3, (0.99,)), (1, (1.01,))], (0.05,)), {1, 3})
+    self.assertEqual(compatible_items([(3, (0.90,)), (1, (1.01,))], (0.05,)), set())
+
+  def test_compatible_items_dimensions(self):
+    items = [(0, (1.0, 10.0)), (1, (1.0, 20.0)), (2, (1.02, 10.5))]
+    self.assertEqual(compatible_items(items, (0.05, 1)), {0, 2})
+
+  def test_compatible_items_empty(self):
+    self.assertEqual(compatible_items([], (1,)), set())
+    self.assertEqual(compatible_items([(0, (1.0,))], (1,)), set())
+
+  def test_within_tolerances(self):
+    self.assertTrue(within_tolerances((1.0, 10.0), (1.02, 10.5), (0.05, 1)))
+    self.assertFalse(within_tolerances((1.0, 10.0), (1.0, 20.0), (0.05, 1)))
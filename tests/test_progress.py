@@ -0,0 +1,49 @@
+import io
+import unittest
+
+from include.progress import Progress
+from include.stats import Stats
+
+
+class TestProgress(unittest.TestCase):
+  def setUp(self):
+    self.stats = Stats()
+    self.stats.enabled = True
+
+  def test_line(self):
+    progress = Progress(self.stats, stream=io.StringIO())
+    self.stats.count('files enumerated', 10)
+    self.stats.count('bytes read', 2e6)
+    line = progress.line()
+    self.assertIn('files 10', line)
+    self.assertIn('read 2.0 MB', line)
+    self.assertNotIn('pairs', line)
+
+    self.stats.count('pairs to compare', 8)
+    progress.line()
+    self.stats.count('pairs compared', 2)
+    line = progress.line()
+    self.assertIn('pairs 2/8', line)
+    self.assertIn('25.0%', line)
+    self.assertIn('ETA', line)
+
+    self.stats.count('pairs compared', 6)
+    line = progress.line()
+    self.assertIn('100.0%', line)
+    self.assertNotIn('ETA', line)
+
+  def test_rewrites_line(self):
+    stream = io.StringIO()
+    with Progress(self.stats, interval=0.01, stream=stream):
+      self.stats.count('files enumerated', 1000)
+
+    output = stream.getvalue()
+    self.assertTrue(output.startswith('\r'))
+    self.assertTrue(output.endswith('\n'))
+    self.assertEqual(output.count('\n'), 1)
+    self.assertIn('files 1,000', output.splitlines()[-1])
+
+  def test_stop_without_start(self):
+    stream = io.StringIO()
+    Progress(self.stats, stream=stream).stop()
+    self.assertEqual(stream.getvalue(), '')
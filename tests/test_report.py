@@ -0,0 +1,54 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from include.report import ClusterReport
+
+
+class TestReport(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def test_jsonl(self):
+    path = os.path.join(self.directory, 'nested', 'report.jsonl')
+    with ClusterReport(path) as report:
+      report.write(('a', 10), [('b', 10, 1.0), ('c', None, None)])
+      # Each cluster is readable before the report is closed
+      with open(path) as f:
+        self.assertEqual(len(f.readlines()), 1)
+      report.write(('d', 5), [('e', 5, 0.9)])
+
+    with open(path) as f:
+      clusters = [json.loads(line) for line in f]
+
+    self.assertEqual(clusters[0], {
+      'cluster': 1,
+      'kept': {'path': 'a', 'size': 10},
+      'duplicates': [{'path': 'b', 'size': 10, 'similarity': 1.0},
+                     {'path': 'c', 'size': None, 'similarity': None}],
+      'reclaimable': 10
+    })
+    self.assertEqual(clusters[1]['cluster'], 2)
+    self.assertEqual(clusters[1]['reclaimable'], 5)
+
+  def test_csv(self):
+    path = os.path.join(self.directory, 'report.csv')
+    with ClusterReport(path, 'csv') as report:
+      report.write(('a', 10), [('b', 10, 1.0), ('c', 10, 0.95)])
+
+    with open(path, newline='') as f:
+      rows = list(csv.reader(f))
+
+    self.assertEqual(rows, [ClusterReport.columns,
+                            ['1', 'a', '10', 'b', '10', '1.0'],
+                            ['1', 'a', '10', 'c', '10', '0.95']])
+
+  def test_unknown_format(self):
+    with self.assertRaises(ValueError):
+      ClusterReport(os.path.join(self.directory, 'report.xml'), 'xml')
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from include.state import load_state, save_state, file_inventory, unchanged_files
+
+
+class TestState(unittest.TestCase):
+  def setUp(self) -> None:
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self) -> None:
+    shutil.rmtree(self.directory, ignore_errors=True)
+
+  def test_save_and_load(self):
+    path = os.path.join(self.directory, 'nested', 'state.json')
+    save_state(path, {'clusters': [['a', 'b']]})
+
+    self.assertEqual(load_state(path), {'clusters': [['a', 'b']]})
+    self.assertEqual(os.listdir(os.path.dirname(path)), ['state.json'])
+
+  def test_missing_or_broken_state(self):
+    path = os.path.join(self.directory, 'state.json')
+    self.assertIsNone(load_state(path))
+
+    with open(path, 'w') as f:
+      f.write('{')
+    self.assertIsNone(load_state(path))
+
+  def test_unchanged_files(self):
+    path = os.path.join(self.directory, 'file.txt')
+    shutil.copy('fixtures/test1.txt', path)
+    with os.scandir(self.directory) as entries:
+      previous = file_inventory(entries)
+
+    self.assertEqual(unchanged_files(previous, previous), {path})
+
+    os.utime(path, ns=(1, 1))
+    with os.scandir(self.directory) as entries:
+      current = file_inventory(entries)
+    self.assertEqual(unchanged_files(previous, current), set())
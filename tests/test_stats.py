@@ -0,0 +1,44 @@
+import unittest
+
+from include.stats import Stats
+
+
+class TestStats(unittest.TestCase):
+  def test_disabled_records_nothing(self):
+    stats = Stats()
+    stats.count('files')
+    with stats.timer('search'):
+      pass
+
+    self.assertEqual(stats.report(), {'counters': {}, 'timings': {}})
+
+  def test_counters_and_timings(self):
+    stats = Stats()
+    stats.enabled = True
+    stats.count('files')
+    stats.count('files', 2)
+    self.assertEqual(list(stats.timed('walk', range(3))), [0, 1, 2])
+    stats.record('decode', 0.001)
+
+    report = stats.report()
+    self.assertEqual(report['counters'], {'files': 3})
+    self.assertEqual(report['timings']['walk']['count'], 3)
+    self.assertEqual(report['timings']['decode']['histogram'], {'1024': 1})
+    self.assertIn('files', stats.summary())
+    self.assertIn('decode', stats.summary())
+
+  def test_merge(self):
+    worker = Stats()
+    worker.enabled = True
+    worker.count('pairs', 4)
+    worker.record('ssim', 0.5)
+
+    stats = Stats()
+    stats.enabled = True
+    stats.count('pairs')
+    stats.merge(worker.collect())
+    stats.merge(worker.collect())
+
+    self.assertEqual(stats.counters, {'pairs': 5})
+    self.assertEqual(stats.timings['ssim']['count'], 1)
+    self.assertEqual(stats.timings['ssim']['max'], 0.5)
@@ -1,7 +1,10 @@
 import unittest
 import sys
 
-from include.videoCompare import VideoCompare
+import numpy as np
+
+from include.videoCompare import (VideoCompare, FrameError, video_fingerprint, fingerprint_distance,
+                                  fingerprint_candidates)
 
 
 class TestVideoCompare(unittest.TestCase):
@@ -24,6 +27,13 @@ class TestVideoCompare(unittest.TestCase):
   def test_video_compare_hard_different(self):
     self.assertFalse(self.different.compare_videos_hard())
 
+  def test_video_compare_pooled(self):
+    for _ in range(2):
+      with VideoCompare('fixtures/sample_640x360.mp4',
+                        'fixtures/sample_640x360.mp4') as videoCompare:
+        self.assertTrue(videoCompare.compare_videos_hard())
+    self.assertIsNone(videoCompare.video1)
+
   def test_video_compare_soft_equal(self):
     result = self.equal.compare_videos_soft()
     self.assertTrue(result[0])
@@ -56,6 +66,18 @@ class TestVideoCompare(unittest.TestCase):
     output = sys.stdout.getvalue().strip()
     self.assertEqual(output, message)
 
+  def test_video_compare_soft_decode(self):
+    for decode in ('seek', 'sequential'):
+      with self.subTest(decode=decode):
+        similar = VideoCompare('fixtures/sample_640x360.mp4', 'fixtures/sample_960x540.mp4',
+                               decode=decode).compare_videos_soft()
+        self.assertTrue(similar[0])
+        self.assertGreaterEqual(similar[1], 0.85)
+
+        equal = VideoCompare('fixtures/sample_640x360.mp4', 'fixtures/sample_640x360.mp4',
+                             decode=decode).compare_videos_soft(scale=2)
+        self.assertEqual(equal[1], 1.0)
+
   def test_video_compare_soft_scale(self):
     result = self.equal.compare_videos_soft(scale=2)
     self.assertTrue(result[0])
@@ -65,4 +87,46 @@ class TestVideoCompare(unittest.TestCase):
     self.assertRaises(ValueError, self.equal.compare_videos_soft, scale=20)
 
   def test_video_compare_soft_scale_raise_minor(self):
-    self.assertRaises(ValueError, self.equal.compare_videos_soft, scale=0.0001)
\ No newline at end of file
+    self.assertRaises(ValueError, self.equal.compare_videos_soft, scale=0.0001)
+
+class TestVideoFingerprint(unittest.TestCase):
+  def test_video_fingerprint(self):
+    fingerprint = video_fingerprint('fixtures/sample_640x360.mp4', samples=8)
+    self.assertEqual(fingerprint.shape, (8,))
+    self.assertEqual(fingerprint_distance(fingerprint, fingerprint), 0)
+
+  def test_fingerprint_similar(self):
+    fingerprint1 = video_fingerprint('fixtures/sample_640x360.mp4')
+    fingerprint2 = video_fingerprint('fixtures/sample_960x540.mp4')
+    self.assertLess(fingerprint_distance(fingerprint1, fingerprint2), 2)
+
+  def test_fingerprint_decode(self):
+    seek = video_fingerprint('fixtures/sample_640x360.mp4', decode='seek')
+    sequential = video_fingerprint('fixtures/sample_640x360.mp4', decode='sequential')
+    self.assertLess(fingerprint_distance(seek, sequential), 2)
+
+  def test_fingerprint_unreadable(self):
+    self.assertRaises(FrameError, video_fingerprint, 'fixtures/test1.txt')
+
+  def test_fingerprint_candidates(self):
+    rng = np.random.default_rng(0)
+    fingerprints = {i: rng.integers(0, 2 ** 63, 16, dtype=np.uint64) for i in range(300)}
+    for i in range(0, 300, 10):
+      # Close copies: a few bits flipped on every frame, all bits of some
+      # frames flipped, or fewer frames
+      fingerprints[i + 1] = fingerprints[i] ^ np.uint64(0b1011011)
+      fingerprints[i + 2] = fingerprints[i].copy()
+      fingerprints[i + 2][:2] = ~fingerprints[i][:2]
+      fingerprints[i + 3] = fingerprints[i][:5].copy()
+
+    for distance in (4, 10):
+      expected = {(i, j) for i in fingerprints for j in fingerprints
+                  if i < j and fingerprint_distance(fingerprints[i], fingerprints[j]) <= distance}
+      found = list(fingerprint_candidates(fingerprints, distance))
+      self.assertEqual(len(found), len(set(found)))
+      self.assertLessEqual(expected, set(found))
+      self.assertLess(len(found), 300 * 299 // 2 // 100)
+
+  def test_fingerprint_candidates_large_distance(self):
+    fingerprints = {i: np.array([i], dtype=np.uint64) for i in range(4)}
+    self.assertEqual(len(list(fingerprint_candidates(fingerprints, 12))), 6)